@@ -1,9 +1,15 @@
+import io
+import os
+import json
+import random
+import zipfile
 import aiohttp
 import asyncio
 import requests
-from typing import List, Union, Dict, Any
+from contextlib import ExitStack
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple, Union, Dict, Any
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from tqdm import tqdm
 from tqdm.asyncio import tqdm as atqdm
 import logging
@@ -14,6 +20,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Responses worth retrying: rate limited, or the server (or a proxy) failing for now
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 
 class ServerType(str, Enum):
     simple = "simple"
@@ -26,19 +35,48 @@ class HealthResponse(BaseModel):
     workers: int = None
 
 
+class ImageMode(str, Enum):
+    inline = "inline"  # base64 strings in the JSON
+    reference = "reference"  # references to GET /images/{sha256}
+    zip = "zip"  # ZIP bundle of the JSON and the image files
+
+
 class ConversionResponse(BaseModel):
     status: str
     result: Dict[str, Any] = None
+    task_id: str = None
+    error: str = None
 
 
 class CeleryTaskResponse(BaseModel):
     task_id: str
     status: str
+    estimated_seconds: float = None
+    estimated_completion: float = None
 
 
 class BatchConversionResponse(BaseModel):
     task_id: str
     status: str
+    estimated_seconds: float = None
+    estimated_completion: float = None
+
+
+class SimpleBatchConversionResponse(BaseModel):
+    status: str
+    results: List[Dict[str, Any]]
+
+
+class BatchResultResponse(BaseModel):
+    task_id: str
+    status: str
+    results: List[Dict[str, Any]] = None
+    completed: int = None
+    total: int = None
+    successful: int = None
+    failed: int = None
+    next_cursor: int = None
+    has_more: bool = None
 
 
 class MarkerAPIClient:
@@ -97,136 +135,451 @@ class MarkerAPIClient:
     def _batch_convert_endpoint(self):
         return "/batch_convert"
 
+    @staticmethod
+    def _image_params(image_mode: Union[ImageMode, str]) -> Dict[str, str]:
+        image_mode = ImageMode(image_mode)
+        return {} if image_mode == ImageMode.inline else {"image_mode": image_mode.value}
+
+    @staticmethod
+    def _parse_zip_bundle(content: bytes) -> Dict[str, Any]:
+        """
+        Read a ZIP bundle into the JSON payload, with each result's `images`
+        filled with raw image bytes taken from the archive.
+        """
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            names = archive.namelist()
+            single = "result.json" in names
+            payload = json.loads(archive.read("result.json" if single else "results.json"))
+            results = [payload] if single else payload
+            for result in results:
+                result["images"] = {
+                    name: archive.read(ref["url"])
+                    for name, ref in (result.get("image_refs") or {}).items()
+                }
+        return payload
+
+    def _image_url(self, ref: Union[Dict[str, Any], str]) -> str:
+        if isinstance(ref, dict):
+            return f"{self.base_url}{ref['url']}"
+        return f"{self.base_url}/images/{ref}"
+
+    def fetch_image(self, ref: Union[Dict[str, Any], str]) -> bytes:
+        """
+        Download one image of a result converted with image_mode="reference".
+
+        Args:
+            ref: An entry of `image_refs`, or the image's sha256.
+        """
+        response = self.session.get(self._image_url(ref))
+        response.raise_for_status()
+        return response.content
+
+    async def afetch_image(self, ref: Union[Dict[str, Any], str]) -> bytes:
+        async with self.async_session.get(self._image_url(ref)) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    def fetch_images(self, result: Dict[str, Any]) -> Dict[str, bytes]:
+        """
+        Download every referenced image of a result, de-duplicated by content hash.
+        """
+        refs = result.get("image_refs") or {}
+        blobs = {}
+        for ref in refs.values():
+            if ref["sha256"] not in blobs:
+                blobs[ref["sha256"]] = self.fetch_image(ref)
+        return {name: blobs[ref["sha256"]] for name, ref in refs.items()}
+
+    async def afetch_images(self, result: Dict[str, Any]) -> Dict[str, bytes]:
+        refs = result.get("image_refs") or {}
+        unique = {ref["sha256"]: ref for ref in refs.values()}
+        data = await asyncio.gather(*(self.afetch_image(ref) for ref in unique.values()))
+        blobs = dict(zip(unique.keys(), data))
+        return {name: blobs[ref["sha256"]] for name, ref in refs.items()}
+
     def load_data(
-        self, file_paths: Union[str, List[str]], show_progress: bool = False
-    ) -> Union[ConversionResponse, BatchConversionResponse]:
+        self,
+        file_paths: Union[str, List[str]],
+        show_progress: bool = False,
+        image_mode: Union[ImageMode, str] = ImageMode.inline,
+    ) -> Union[ConversionResponse, BatchConversionResponse, SimpleBatchConversionResponse]:
         if isinstance(file_paths, str):
             logger.info(f"Converting single file: {file_paths}")
-            return self._convert_single(file_paths)
+            return self._convert_single(file_paths, image_mode)
         elif isinstance(file_paths, list):
             logger.info(f"Converting batch of {len(file_paths)} files")
-            return self._convert_batch(file_paths, show_progress)
+            return self._convert_batch(file_paths, show_progress, image_mode)
         else:
             raise ValueError("file_paths must be a string or a list of strings")
 
-    def _convert_single(self, file_path: str) -> ConversionResponse:
+    def _convert_single(
+        self, file_path: str, image_mode: Union[ImageMode, str] = ImageMode.inline
+    ) -> ConversionResponse:
         with open(file_path, "rb") as file:
             files = {"pdf_file": file}
             logger.info(f"Sending request to convert {file_path}")
             response = self.session.post(
-                f"{self.base_url}{self._convert_endpoint()}", files=files
+                f"{self.base_url}{self._convert_endpoint()}",
+                files=files,
+                params=self._image_params(image_mode),
             )
         response.raise_for_status()
         logger.info(f"Successfully converted {file_path}")
+        if response.headers.get("content-type", "").startswith("application/zip"):
+            return ConversionResponse(
+                status="Success", result=self._parse_zip_bundle(response.content)
+            )
         return ConversionResponse(**response.json())
 
+    def _batch_image_params(self, image_mode: Union[ImageMode, str]) -> Dict[str, str]:
+        # The distributed server applies image_mode when results are fetched, not on submission
+        params = self._image_params(image_mode)
+        if params and self.server_type == ServerType.distributed:
+            raise ValueError("image_mode for batches is only available for simple server type")
+        return params
+
+    def _batch_response(
+        self, payload: Any
+    ) -> Union[BatchConversionResponse, SimpleBatchConversionResponse]:
+        if isinstance(payload, list):
+            # Results unpacked from a ZIP bundle
+            return SimpleBatchConversionResponse(status="Success", results=payload)
+        if "task_id" in payload:
+            return BatchConversionResponse(**payload)
+        return SimpleBatchConversionResponse(**payload)
+
     def _convert_batch(
-        self, file_paths: List[str], show_progress: bool
-    ) -> BatchConversionResponse:
-        files = []
-        iterable = tqdm(file_paths, desc="Preparing files", disable=not show_progress)
-        for file_path in iterable:
-            files.append(("pdf_files", open(file_path, "rb")))
-            logger.info(f"Prepared file: {file_path}")
-
-        logger.info("Sending batch conversion request")
-        response = self.session.post(
-            f"{self.base_url}{self._batch_convert_endpoint()}", files=files
-        )
+        self,
+        file_paths: List[str],
+        show_progress: bool,
+        image_mode: Union[ImageMode, str] = ImageMode.inline,
+    ) -> Union[BatchConversionResponse, SimpleBatchConversionResponse]:
+        params = self._batch_image_params(image_mode)
+        with ExitStack() as stack:
+            files = []
+            iterable = tqdm(file_paths, desc="Preparing files", disable=not show_progress)
+            for file_path in iterable:
+                files.append(("pdf_files", stack.enter_context(open(file_path, "rb"))))
+                logger.info(f"Prepared file: {file_path}")
+
+            logger.info("Sending batch conversion request")
+            response = self.session.post(
+                f"{self.base_url}{self._batch_convert_endpoint()}",
+                files=files,
+                params=params,
+            )
         response.raise_for_status()
         logger.info("Batch conversion request successful")
-        return BatchConversionResponse(**response.json())
+        if response.headers.get("content-type", "").startswith("application/zip"):
+            return self._batch_response(self._parse_zip_bundle(response.content))
+        return self._batch_response(response.json())
 
     async def aload_data(
-        self, file_paths: Union[str, List[str]], show_progress: bool = False
-    ) -> Union[ConversionResponse, BatchConversionResponse]:
+        self,
+        file_paths: Union[str, List[str]],
+        show_progress: bool = False,
+        image_mode: Union[ImageMode, str] = ImageMode.inline,
+    ) -> Union[ConversionResponse, BatchConversionResponse, SimpleBatchConversionResponse]:
         if isinstance(file_paths, str):
             logger.info(f"Converting single file asynchronously: {file_paths}")
-            return await self._aconvert_single(file_paths)
+            return await self._aconvert_single(file_paths, image_mode)
         elif isinstance(file_paths, list):
             logger.info(f"Converting batch of {len(file_paths)} files asynchronously")
-            return await self._aconvert_batch(file_paths, show_progress)
+            return await self._aconvert_batch(file_paths, show_progress, image_mode)
         else:
             raise ValueError("file_paths must be a string or a list of strings")
 
-    async def _aconvert_single(self, file_path: str) -> ConversionResponse:
-        data = aiohttp.FormData()
-        data.add_field("pdf_file", open(file_path, "rb"))
-        logger.info(f"Sending async request to convert {file_path}")
-        async with self.async_session.post(
-            f"{self.base_url}{self._convert_endpoint()}", data=data
-        ) as response:
-            response.raise_for_status()
-            logger.info(f"Successfully converted {file_path} asynchronously")
-            return ConversionResponse(**(await response.json()))
+    async def _aconvert_single(
+        self, file_path: str, image_mode: Union[ImageMode, str] = ImageMode.inline
+    ) -> ConversionResponse:
+        with open(file_path, "rb") as file:
+            data = aiohttp.FormData()
+            data.add_field("pdf_file", file, filename=os.path.basename(file_path))
+            logger.info(f"Sending async request to convert {file_path}")
+            async with self.async_session.post(
+                f"{self.base_url}{self._convert_endpoint()}",
+                data=data,
+                params=self._image_params(image_mode),
+            ) as response:
+                response.raise_for_status()
+                logger.info(f"Successfully converted {file_path} asynchronously")
+                if response.content_type == "application/zip":
+                    return ConversionResponse(
+                        status="Success",
+                        result=self._parse_zip_bundle(await response.read()),
+                    )
+                return ConversionResponse(**(await response.json()))
 
     async def _aconvert_batch(
-        self, file_paths: List[str], show_progress: bool
-    ) -> BatchConversionResponse:
-        data = aiohttp.FormData()
-        async for file_path in atqdm(
-            file_paths, desc="Preparing files", disable=not show_progress
-        ):
-            data.add_field("pdf_files", open(file_path, "rb"))
-            logger.info(f"Prepared file: {file_path}")
-
-        logger.info("Sending async batch conversion request")
-        async with self.async_session.post(
-            f"{self.base_url}{self._batch_convert_endpoint()}", data=data
-        ) as response:
-            response.raise_for_status()
-            logger.info("Async batch conversion request successful")
-            return BatchConversionResponse(**(await response.json()))
-
-    def get_result(self, task_id: str) -> ConversionResponse:
+        self,
+        file_paths: List[str],
+        show_progress: bool,
+        image_mode: Union[ImageMode, str] = ImageMode.inline,
+    ) -> Union[BatchConversionResponse, SimpleBatchConversionResponse]:
+        params = self._batch_image_params(image_mode)
+        with ExitStack() as stack:
+            data = aiohttp.FormData()
+            async for file_path in atqdm(
+                file_paths, desc="Preparing files", disable=not show_progress
+            ):
+                file = stack.enter_context(open(file_path, "rb"))
+                data.add_field("pdf_files", file, filename=os.path.basename(file_path))
+                logger.info(f"Prepared file: {file_path}")
+
+            logger.info("Sending async batch conversion request")
+            async with self.async_session.post(
+                f"{self.base_url}{self._batch_convert_endpoint()}",
+                data=data,
+                params=params,
+            ) as response:
+                response.raise_for_status()
+                logger.info("Async batch conversion request successful")
+                if response.content_type == "application/zip":
+                    return self._batch_response(
+                        self._parse_zip_bundle(await response.read())
+                    )
+                return self._batch_response(await response.json())
+
+    @staticmethod
+    def _retry_delay(attempt: int, error: Exception) -> float:
+        # Honour Retry-After when the server sends one, else back off exponentially with jitter
+        headers = getattr(error, "headers", None) or {}
+        try:
+            return float(headers["Retry-After"])
+        except (KeyError, TypeError, ValueError):
+            return min(30.0, 0.5 * 2**attempt) * random.uniform(0.5, 1.0)
+
+    async def _awith_retries(
+        self, request: Callable[[], Awaitable[Any]], max_retries: int
+    ) -> Any:
+        """
+        Await `request()`, calling it again after 429/5xx responses and connection errors.
+        """
+        for attempt in range(max_retries + 1):
+            try:
+                return await request()
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RETRY_STATUSES or attempt == max_retries:
+                    raise
+                error = e
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == max_retries:
+                    raise
+                error = e
+            delay = self._retry_delay(attempt, error)
+            logger.warning(f"Request failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _asubmit(self, file_path: str) -> CeleryTaskResponse:
+        # The upload is streamed from disk; the file is reopened on every retry
+        with open(file_path, "rb") as file:
+            data = aiohttp.FormData()
+            data.add_field("pdf_file", file, filename=os.path.basename(file_path))
+            async with self.async_session.post(
+                f"{self.base_url}/celery/convert", data=data
+            ) as response:
+                response.raise_for_status()
+                return CeleryTaskResponse(**(await response.json()))
+
+    async def _await_result(
+        self,
+        task: CeleryTaskResponse,
+        image_mode: Union[ImageMode, str],
+        max_retries: int,
+        poll_interval: float,
+        max_poll_interval: float,
+    ) -> ConversionResponse:
+        # Sleep through the server's estimate first, then poll less and less often
+        delay = min(max(task.estimated_seconds or poll_interval, poll_interval), max_poll_interval)
+        while True:
+            await asyncio.sleep(delay)
+            response = await self._awith_retries(
+                lambda: self.aget_result(task.task_id, image_mode), max_retries
+            )
+            if response.status != "Processing":
+                response.task_id = task.task_id
+                return response
+            delay = min(delay * 1.5, max_poll_interval)
+
+    async def _aconvert_file(
+        self,
+        file_path: str,
+        image_mode: Union[ImageMode, str],
+        max_retries: int,
+        poll_interval: float,
+        max_poll_interval: float,
+    ) -> Tuple[str, ConversionResponse]:
+        try:
+            if self.server_type == ServerType.simple:
+                # The simple server converts within the request and answers with the result
+                response = await self._awith_retries(
+                    lambda: self._aconvert_single(file_path, image_mode), max_retries
+                )
+            else:
+                task = await self._awith_retries(lambda: self._asubmit(file_path), max_retries)
+                response = await self._await_result(
+                    task, image_mode, max_retries, poll_interval, max_poll_interval
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logger.error(f"Failed to convert {file_path}: {str(e)}")
+            response = ConversionResponse(status="Error", error=str(e))
+        except (ValidationError, json.JSONDecodeError, zipfile.BadZipFile) as e:
+            # One malformed response must not end the whole run
+            logger.error(f"Unexpected response converting {file_path}: {str(e)}")
+            response = ConversionResponse(status="Error", error=f"Unexpected response: {str(e)}")
+        return file_path, response
+
+    async def aconvert_many(
+        self,
+        file_paths: Iterable[str],
+        concurrency: int = 4,
+        image_mode: Union[ImageMode, str] = ImageMode.inline,
+        max_retries: int = 5,
+        poll_interval: float = 1.0,
+        max_poll_interval: float = 30.0,
+    ) -> AsyncIterator[Tuple[str, ConversionResponse]]:
+        """
+        Convert many files, yielding (file_path, ConversionResponse) as each one finishes.
+
+        At most `concurrency` files are in progress at a time (uploading,
+        queued or converting), and `file_paths` is only read as slots free up,
+        so it can be a lazy iterable over a huge directory. Each upload is
+        streamed from disk over the client's pooled session. Requests answered
+        with 429/5xx, or failing to connect, are retried with exponential
+        backoff up to `max_retries` times.
+
+        On a distributed server, results are polled starting after the
+        server's estimated completion time, then every `poll_interval`
+        seconds growing to `max_poll_interval`. A simple server returns the
+        result with the upload. Files that could not be converted (including
+        conversions that failed on the server, which are not retried) are
+        yielded with status "Error" and the reason in `error`.
+
+        Usage:
+            async with MarkerAPIClient(url) as client:
+                async for path, response in client.aconvert_many(paths, concurrency=8):
+                    ...
+        """
+        paths = iter(file_paths)
+        pending = set()
+        try:
+            while True:
+                while len(pending) < concurrency:
+                    file_path = next(paths, None)
+                    if file_path is None:
+                        break
+                    pending.add(
+                        asyncio.ensure_future(
+                            self._aconvert_file(
+                                file_path, image_mode, max_retries, poll_interval, max_poll_interval
+                            )
+                        )
+                    )
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    yield finished.result()
+        finally:
+            # The caller stopped early; conversions already submitted keep running on the server
+            for task in pending:
+                task.cancel()
+
+    def get_result(
+        self, task_id: str, image_mode: Union[ImageMode, str] = ImageMode.inline
+    ) -> ConversionResponse:
         if self.server_type != ServerType.distributed:
             raise ValueError("get_result is only available for distributed server type")
         logger.info(f"Getting result for task {task_id}")
-        response = self.session.get(f"{self.base_url}/celery/result/{task_id}")
+        response = self.session.get(
+            f"{self.base_url}/celery/result/{task_id}",
+            params=self._image_params(image_mode),
+        )
         response.raise_for_status()
         logger.info(f"Successfully retrieved result for task {task_id}")
+        if response.headers.get("content-type", "").startswith("application/zip"):
+            return ConversionResponse(
+                status="Success", result=self._parse_zip_bundle(response.content)
+            )
         return ConversionResponse(**response.json())
 
-    async def aget_result(self, task_id: str) -> ConversionResponse:
+    async def aget_result(
+        self, task_id: str, image_mode: Union[ImageMode, str] = ImageMode.inline
+    ) -> ConversionResponse:
         if self.server_type != ServerType.distributed:
             raise ValueError(
                 "aget_result is only available for distributed server type"
             )
         logger.info(f"Getting result asynchronously for task {task_id}")
         async with self.async_session.get(
-            f"{self.base_url}/celery/result/{task_id}"
+            f"{self.base_url}/celery/result/{task_id}",
+            params=self._image_params(image_mode),
         ) as response:
             response.raise_for_status()
             logger.info(
                 f"Successfully retrieved result asynchronously for task {task_id}"
             )
+            if response.content_type == "application/zip":
+                return ConversionResponse(
+                    status="Success",
+                    result=self._parse_zip_bundle(await response.read()),
+                )
             return ConversionResponse(**(await response.json()))
 
-    def get_batch_result(self, task_id: str) -> BatchConversionResponse:
+    @staticmethod
+    def _batch_page_params(
+        cursor: Optional[int], since: Optional[float], limit: Optional[int]
+    ) -> Dict[str, str]:
+        params = {"cursor": cursor, "since": since, "limit": limit}
+        return {name: str(value) for name, value in params.items() if value is not None}
+
+    def get_batch_result(
+        self,
+        task_id: str,
+        cursor: Optional[int] = None,
+        since: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> BatchResultResponse:
+        """
+        Fetch the completed documents of a batch, also while it is still running.
+
+        Pass the `next_cursor` of the previous response as `cursor` to get only
+        the documents completed since then.
+        """
         if self.server_type != ServerType.distributed:
             raise ValueError(
                 "get_batch_result is only available for distributed server type"
             )
         logger.info(f"Getting batch result for task {task_id}")
-        response = self.session.get(f"{self.base_url}/batch_convert/result/{task_id}")
+        response = self.session.get(
+            f"{self.base_url}/batch_convert/result/{task_id}",
+            params=self._batch_page_params(cursor, since, limit),
+        )
         response.raise_for_status()
         logger.info(f"Successfully retrieved batch result for task {task_id}")
-        return BatchConversionResponse(**response.json())
-
-    async def aget_batch_result(self, task_id: str) -> BatchConversionResponse:
+        return BatchResultResponse(**response.json())
+
+    async def aget_batch_result(
+        self,
+        task_id: str,
+        cursor: Optional[int] = None,
+        since: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> BatchResultResponse:
         if self.server_type != ServerType.distributed:
             raise ValueError(
                 "aget_batch_result is only available for distributed server type"
             )
         logger.info(f"Getting batch result asynchronously for task {task_id}")
         async with self.async_session.get(
-            f"{self.base_url}/batch_convert/result/{task_id}"
+            f"{self.base_url}/batch_convert/result/{task_id}",
+            params=self._batch_page_params(cursor, since, limit),
         ) as response:
             response.raise_for_status()
             logger.info(
                 f"Successfully retrieved batch result asynchronously for task {task_id}"
             )
-            return BatchConversionResponse(**(await response.json()))
+            return BatchResultResponse(**(await response.json()))
 
 
 # Example usage:
@@ -244,6 +597,12 @@ async def main():
         )
         print(async_batch_result)
 
+        # Many files, a few at a time, each yielded as soon as it is converted
+        async for file_path, response in client.aconvert_many(
+            ["./file1.pdf", "./file2.pdf", "./file3.pdf"], concurrency=2
+        ):
+            print(file_path, response.status)
+
 
 if __name__ == "__main__":
     asyncio.run(main())
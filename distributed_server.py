@@ -1,9 +1,10 @@
 import argparse
 import uvicorn
 import logging
-from fastapi import FastAPI, UploadFile, File,Body
+from fastapi import Depends, FastAPI, Request, Body, Query
 from celery.exceptions import TimeoutError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from marker_api.celery_worker import celery_app
 from marker_api.utils import print_markerapi_text_art
 from marker.logger import configure_logging
@@ -13,26 +14,61 @@ from marker_api.celery_routes import (
     celery_convert_pdf_concurrent_await,
     celery_batch_convert,
     celery_batch_result,
+    cancel_batch,
+    cancel_conversion,
 )
-import gradio as gr
-from marker_api.demo import demo_ui
+from marker_api.bulk import (
+    bulk_runner,
+    cancel_bulk_job,
+    create_bulk_job,
+    get_bulk_job,
+    list_bulk_files,
+    list_bulk_jobs,
+    pause_bulk_job,
+    resume_bulk_job,
+)
+from marker_api.image_store import image_response
+from marker_api.uploads import multipart_body
+from marker_api.startup import FAST_START, mount_demo_ui
+from marker_api.monitor import cluster_monitor
+from marker_api.waiter import task_waiter
+from contextlib import asynccontextmanager
 from marker_api.model.schema import (
     BatchConversionResponse,
     BatchResultResponse,
+    BulkFilesResponse,
+    BulkJobRequest,
+    BulkJobResponse,
+    CancelResponse,
     CeleryResultResponse,
     CeleryTaskResponse,
     ConversionResponse,
     HealthResponse,
+    ImageMode,
+    ImageOptions,
+    ReadyResponse,
     ServerType,
 )
-from typing import List
+from typing import List, Optional
 
 # Initialize logging
 configure_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cluster_monitor.start()
+    # Bulk jobs left running by a previous (or crashed) API process carry on here,
+    # as soon as their lease allows
+    bulk_runner.watch()
+    yield
+    bulk_runner.stop()
+    cluster_monitor.stop()
+    await task_waiter.stop()
+
+
 # Global variable to hold model list
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 logger.info("Configuring CORS middleware")
 app.add_middleware(
@@ -49,10 +85,13 @@ def server():
     """
     Root endpoint to check server status.
 
+    Answers from the cluster monitor's last snapshot, so probes never
+    broadcast to the workers.
+
     Returns:
     HealthResponse: A welcome message, server type, and number of workers (if distributed).
     """
-    worker_count = len(celery_app.control.inspect().stats() or {})
+    worker_count = cluster_monitor.snapshot.get("workers", 0)
     server_type = ServerType.distributed if worker_count > 0 else ServerType.simple
     return HealthResponse(
         message="Welcome to Marker-api",
@@ -61,6 +100,39 @@ def server():
     )
 
 
+@app.get("/ready", response_model=ReadyResponse)
+def ready():
+    """
+    Readiness probe: 200 once the broker is reachable and at least one worker
+    answered the cluster monitor's last refresh.
+    """
+    snapshot = cluster_monitor.snapshot
+    workers = snapshot.get("workers", 0)
+    if snapshot.get("error"):
+        status = "failed"
+    else:
+        status = "ready" if snapshot.get("broker_ok") and workers else "pending"
+    progress = ReadyResponse(
+        ready=status == "ready",
+        status=status,
+        workers=workers,
+        error=snapshot.get("error"),
+    )
+    if not progress.ready:
+        return JSONResponse(status_code=503, content=progress.model_dump())
+    return progress
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Cluster metrics in the Prometheus text format, for Prometheus, KEDA or an HPA adapter.
+    """
+    return PlainTextResponse(
+        cluster_monitor.render_metrics(), media_type="text/plain; version=0.0.4"
+    )
+
+
 def is_celery_alive() -> bool:
     logger.debug("Checking if Celery is alive")
     try:
@@ -79,30 +151,130 @@ def setup_routes(app: FastAPI, celery_live: bool):
         logger.info("Adding Celery routes")
 
         @app.post("/convert", response_model=ConversionResponse)
-        async def convert_pdf(pdf_filename: str = Body(..., embed=True)):
+        async def convert_pdf(request: Request, pdf_filename: str = Body(..., embed=True)):
             print("pdf_filename : ", pdf_filename, flush=True)
-            return await celery_convert_pdf_concurrent_await(pdf_filename)
+            # Disconnecting cancels the conversion unless another request shares it
+            return await celery_convert_pdf_concurrent_await(pdf_filename, request)
 
-        @app.post("/celery/convert", response_model=CeleryTaskResponse)
-        async def celery_convert(pdf_file: UploadFile = File(...)):
-            return await celery_convert_pdf(pdf_file)
+        @app.post(
+            "/celery/convert",
+            response_model=CeleryTaskResponse,
+            openapi_extra=multipart_body("pdf_file"),
+        )
+        async def celery_convert(
+            request: Request,
+            image_options: ImageOptions = Depends(),
+            shard_pages: Optional[int] = None,
+            priority: Optional[int] = Query(None, ge=0, le=9),
+        ):
+            return await celery_convert_pdf(request, image_options, shard_pages, priority)
 
         @app.get("/celery/result/{task_id}", response_model=CeleryResultResponse)
-        async def get_celery_result(task_id: str):
-            return await celery_result(task_id)
+        async def get_celery_result(
+            task_id: str, image_mode: ImageMode = ImageMode.inline
+        ):
+            return await celery_result(task_id, image_mode)
+
+        @app.delete("/celery/task/{task_id}", response_model=CancelResponse)
+        async def cancel_celery_task(task_id: str, terminate: bool = False):
+            """
+            Cancel a conversion: dropped if still queued, stopped at the next
+            document or shard boundary if running. `terminate` kills the worker
+            process running it instead (prefork pool only). A conversion that
+            another awaiting request shares (an identical submission, see
+            MARKER_SINGLE_FLIGHT) keeps running and the status is Shared.
+            """
+            return await cancel_conversion(task_id, terminate)
+
+        @app.get("/images/{sha256}")
+        def get_image(sha256: str):
+            return image_response(sha256)
+
+        @app.post(
+            "/batch_convert",
+            response_model=BatchConversionResponse,
+            openapi_extra=multipart_body("pdf_files", multiple=True),
+        )
+        async def batch_convert(
+            request: Request,
+            image_options: ImageOptions = Depends(),
+            priority: Optional[int] = Query(None, ge=0, le=9),
+        ):
+            return await celery_batch_convert(request, image_options, priority)
 
-        @app.post("/batch_convert", response_model=BatchConversionResponse)
-        async def batch_convert(pdf_files: List[UploadFile] = File(...)):
-            return await celery_batch_convert(pdf_files)
+        @app.delete("/batch_convert/{task_id}", response_model=CancelResponse)
+        async def cancel_batch_convert(task_id: str, terminate: bool = False):
+            """
+            Cancel the unfinished documents of a batch; completed results stay available.
+
+            Documents that another awaiting request shares keep running (counted in `shared`).
+            """
+            return await cancel_batch(task_id, terminate)
 
         @app.get("/batch_convert/result/{task_id}", response_model=BatchResultResponse)
-        async def get_batch_result(task_id: str):
-            return await celery_batch_result(task_id)
+        async def get_batch_result(
+            task_id: str,
+            cursor: Optional[int] = Query(None, ge=0),
+            since: Optional[float] = None,
+            limit: Optional[int] = Query(None, ge=1, le=1000),
+        ):
+            """
+            Documents of a batch in the order they completed, available as soon as each finishes.
+
+            Without paging arguments all completed documents are returned in
+            batch order. With `cursor` (the `next_cursor` of the previous
+            response), `since` (Unix time) and/or `limit`, only the next page
+            of newly completed documents is returned.
+            """
+            return await celery_batch_result(task_id, cursor, since, limit)
+
+        @app.post("/bulk/jobs", response_model=BulkJobResponse)
+        def bulk_create(request: BulkJobRequest):
+            """
+            Convert every PDF of a server-side directory or manifest, writing the results to disk.
+
+            Files are enumerated lazily and at most `max_in_flight` conversions
+            are queued at once. Progress is kept in SQLite, so a job interrupted
+            by a restart resumes without converting finished files again.
+            """
+            return create_bulk_job(request)
+
+        @app.get("/bulk/jobs", response_model=List[BulkJobResponse])
+        def bulk_list():
+            return list_bulk_jobs()
+
+        @app.get("/bulk/jobs/{job_id}", response_model=BulkJobResponse)
+        def bulk_get(job_id: str):
+            """
+            Progress of a bulk job: file counts by state and throughput, overall and recent.
+            """
+            return get_bulk_job(job_id)
+
+        @app.get("/bulk/jobs/{job_id}/files", response_model=BulkFilesResponse)
+        def bulk_files(
+            job_id: str,
+            state: str = Query("failed", pattern="^(pending|queued|done|failed)$"),
+            limit: int = Query(100, ge=1, le=1000),
+            offset: int = Query(0, ge=0),
+        ):
+            return list_bulk_files(job_id, state, limit, offset)
+
+        @app.post("/bulk/jobs/{job_id}/pause", response_model=BulkJobResponse)
+        def bulk_pause(job_id: str):
+            return pause_bulk_job(job_id)
+
+        @app.post("/bulk/jobs/{job_id}/resume", response_model=BulkJobResponse)
+        def bulk_resume(job_id: str):
+            return resume_bulk_job(job_id)
+
+        @app.delete("/bulk/jobs/{job_id}", response_model=BulkJobResponse)
+        def bulk_cancel(job_id: str, terminate: bool = False):
+            return cancel_bulk_job(job_id, terminate)
 
         logger.info("Adding real-time conversion route")
     else:
         logger.warning("Celery routes not added as Celery is not alive")
-    app = gr.mount_gradio_app(app, demo_ui, path="")
+    mount_demo_ui(app)
 
 
 def parse_args():
@@ -121,7 +293,8 @@ if __name__ == "__main__":
     args = parse_args()
     print_markerapi_text_art()
     logger.info(f"Starting FastAPI app on {args.host}:{args.port}")
-    celery_alive = is_celery_alive()
+    # In fast-start mode /ready reports worker availability instead of blocking here
+    celery_alive = FAST_START or is_celery_alive()
     setup_routes(app, celery_alive)
     try:
         uvicorn.run(app, host=args.host, port=args.port)
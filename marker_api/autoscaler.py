@@ -0,0 +1,131 @@
+import os
+import math
+import logging
+from typing import List, Optional
+from celery.worker import state
+from celery.worker.autoscale import Autoscaler
+from marker_api.utils import (
+    DeviceType,
+    get_gpu_process_memory,
+    get_process_private_memory,
+    get_ram_available,
+)
+
+logger = logging.getLogger(__name__)
+
+# How fast a measured peak footprint is forgotten, per scaling check
+FOOTPRINT_DECAY = 0.995
+
+
+class MemoryAwareAutoscaler(Autoscaler):
+    """
+    Celery autoscaler that sizes the prefork pool by free memory as well as demand.
+
+    Celery's own autoscaler grows the pool to the number of reserved tasks,
+    up to the --autoscale maximum, whether or not the node can hold them. This
+    one also caps the pool at the number of conversions that fit: free RAM
+    (or VRAM on GPU, as reported by get_ram_available) minus a reserve and
+    minus what idle processes will still grow by, divided by the footprint of
+    one conversion.
+
+    The footprint starts at MARKER_RAM_PER_TASK_MB and follows the private
+    memory (or VRAM) of the busiest pool process while tasks run, so model
+    weights shared with the main process are not counted. Peaks are adopted
+    at once and forgotten slowly, never below MARKER_AUTOSCALE_MIN_TASK_MB. When memory runs short the pool shrinks
+    right away instead of waiting for the keepalive; every decision is logged.
+
+    Enabled with `celery worker --autoscale=MAX,MIN`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.per_task_mb = float(os.environ.get("MARKER_RAM_PER_TASK_MB", 4500))
+        self.min_task_mb = float(os.environ.get("MARKER_AUTOSCALE_MIN_TASK_MB", 1024))
+        self.reserve_mb = int(os.environ.get("MARKER_AUTOSCALE_RESERVE_MB", 1024))
+        self.device = None
+        self.free_mb = 0
+        self.memory_limit = None
+        self._last_decision = None
+
+    def _pool_pids(self) -> List[int]:
+        workers = getattr(getattr(self.pool, "_pool", None), "_pool", None) or []
+        return [worker.pid for worker in workers if worker.pid]
+
+    @staticmethod
+    def _busy_pids() -> set:
+        return {request.worker_pid for request in list(state.active_requests) if request.worker_pid}
+
+    def _memory_by_pid(self, pids: List[int]) -> dict:
+        if self.device == DeviceType.GPU:
+            usage = get_gpu_process_memory()
+            return {pid: usage.get(pid, 0) / 1024**2 for pid in pids}
+        return {pid: get_process_private_memory(pid) / 1024**2 for pid in pids}
+
+    def measure(self) -> Optional[int]:
+        """
+        Update the per-task footprint and return how many processes memory allows.
+
+        Returns None when free memory cannot be read, in which case only
+        demand and the --autoscale bounds apply.
+        """
+        try:
+            self.device, self.free_mb = get_ram_available()
+        except Exception as e:
+            logger.warning(f"Autoscaler could not read free memory: {str(e)}")
+            return None
+
+        pids = self._pool_pids()
+        busy = self._busy_pids()
+        memory = self._memory_by_pid(pids)
+        peak = max((memory.get(pid, 0) for pid in busy), default=0)
+        if peak > 0:
+            self.per_task_mb = max(peak, self.per_task_mb * FOOTPRINT_DECAY, self.min_task_mb)
+
+        # Idle processes will grow to a full footprint once they get a task
+        growth_mb = sum(
+            max(0.0, self.per_task_mb - memory.get(pid, 0)) for pid in pids if pid not in busy
+        )
+        headroom_mb = self.free_mb - self.reserve_mb - growth_mb
+        return len(pids) + math.floor(headroom_mb / self.per_task_mb)
+
+    def _log_decision(self, procs: int, target: int, reason: str):
+        decision = (procs, target, self.memory_limit)
+        if decision == self._last_decision:
+            return
+        self._last_decision = decision
+        logger.info(
+            f"Autoscaler: {procs} -> {target} processes ({reason}; "
+            f"{self.qty} tasks reserved, {self.free_mb} MB free on "
+            f"{self.device.value if self.device else 'unknown device'}, "
+            f"{self.per_task_mb:.0f} MB per task, memory allows {self.memory_limit})"
+        )
+
+    def _maybe_scale(self, req=None):
+        procs = self.processes
+        limit = self.measure()
+        ceiling = self.max_concurrency
+        if limit is not None:
+            self.memory_limit = max(limit, self.min_concurrency)
+            ceiling = min(ceiling, self.memory_limit)
+
+        if procs > ceiling:
+            # Out of memory headroom: shrink now, do not wait for the keepalive
+            self._log_decision(procs, ceiling, "memory pressure")
+            self._shrink(procs - ceiling)
+            return True
+
+        target = min(self.qty, ceiling)
+        if target > procs:
+            self._log_decision(procs, target, "demand")
+            self.scale_up(target - procs)
+            return True
+
+        target = max(min(self.qty, ceiling), self.min_concurrency)
+        if target < procs:
+            self._log_decision(procs, target, "idle")
+            self.scale_down(procs - target)
+            return True
+
+        if self.qty > ceiling:
+            self._log_decision(procs, procs, "capped by memory")
+        return None
@@ -0,0 +1,185 @@
+import os
+import time
+import logging
+import threading
+from typing import Callable, List, Optional
+import torch
+from marker_api.startup import env_flag
+
+logger = logging.getLogger(__name__)
+
+# Positions in marker's model list [texify, layout, order, edit, detection, ocr]
+LAYOUT_MODEL_INDEX = 1
+DETECTION_MODEL_INDEX = 4
+
+
+class _PendingCall:
+    __slots__ = ("pixel_values", "done", "output", "error")
+
+    def __init__(self, pixel_values):
+        self.pixel_values = pixel_values
+        self.done = False
+        self.output = None
+        self.error = None
+
+    @property
+    def rows(self) -> int:
+        return self.pixel_values.shape[0]
+
+    def batch_key(self):
+        # Only inputs of the same page size, dtype and device can share a forward pass
+        return tuple(self.pixel_values.shape[1:]), self.pixel_values.dtype, self.pixel_values.device
+
+
+class MicroBatchedModel:
+    """
+    Stand-in for a surya detection/layout model that merges the forward passes
+    of concurrent conversions into shared batches.
+
+    surya calls `model(pixel_values=batch)` once per batch of page splits. Here
+    each call is queued; the first waiting caller becomes the leader, waits up
+    to max_wait_ms for calls from other conversions (only while more than one
+    conversion is running), runs one forward pass over at most max_batch_size
+    rows, and hands every caller the slice of the logits for its own rows.
+    Everything else (config, dtype, device, processor) is the wrapped model's.
+
+    Args:
+    model: The surya model to wrap.
+    max_batch_size (int): Maximum rows in a merged forward pass.
+    max_wait_ms (float): Longest a leader waits for other callers to join.
+    concurrency (callable): Returns how many conversions are in flight.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_batch_size: int,
+        max_wait_ms: float,
+        concurrency: Optional[Callable[[], int]] = None,
+    ):
+        self._model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.concurrency = concurrency or (lambda: 1)
+        self._cond = threading.Condition()
+        self._queue: List[_PendingCall] = []
+        self._leading = False
+        self.forward_passes = 0
+        self.merged_calls = 0
+
+    def __getattr__(self, name):
+        if name == "_model":
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+    def __call__(self, *args, pixel_values=None, **kwargs):
+        if args or kwargs or pixel_values is None:
+            return self._model(*args, pixel_values=pixel_values, **kwargs)
+
+        call = _PendingCall(pixel_values)
+        with self._cond:
+            self._queue.append(call)
+            self._cond.notify_all()
+        while True:
+            with self._cond:
+                while not call.done and self._leading:
+                    self._cond.wait()
+                if call.done:
+                    break
+                self._leading = True
+            try:
+                self._lead()
+            finally:
+                with self._cond:
+                    self._leading = False
+                    self._cond.notify_all()
+
+        if call.error is not None:
+            raise call.error
+        return call.output
+
+    def _queued_rows(self) -> int:
+        return sum(call.rows for call in self._queue)
+
+    def _take_batch(self) -> List[_PendingCall]:
+        # FIFO, compatible shapes only, never more than max_batch_size rows (unless one call alone is bigger)
+        key = self._queue[0].batch_key()
+        batch = []
+        rows = 0
+        for call in list(self._queue):
+            if call.batch_key() != key:
+                continue
+            if batch and rows + call.rows > self.max_batch_size:
+                break
+            batch.append(call)
+            rows += call.rows
+            self._queue.remove(call)
+        return batch
+
+    def _lead(self):
+        wait = self.max_wait if self.concurrency() > 1 else 0
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while self._queued_rows() < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._take_batch()
+
+        try:
+            if len(batch) == 1:
+                batch[0].output = self._model(pixel_values=batch[0].pixel_values)
+            else:
+                self._forward_merged(batch)
+        except Exception as e:
+            for call in batch:
+                call.error = e
+        self.forward_passes += 1
+        self.merged_calls += len(batch)
+        with self._cond:
+            for call in batch:
+                call.done = True
+
+    def _forward_merged(self, batch: List[_PendingCall]):
+        merged = torch.cat([call.pixel_values for call in batch], dim=0)
+        output = self._model(pixel_values=merged)
+        logger.debug(f"Merged {len(batch)} calls into one batch of {merged.shape[0]} rows")
+        start = 0
+        for call in batch:
+            call.output = output.__class__(logits=output.logits[start : start + call.rows])
+            start += call.rows
+
+    def stats(self) -> dict:
+        return {
+            "forward_passes": self.forward_passes,
+            "calls": self.merged_calls,
+            "avg_calls_per_pass": (
+                self.merged_calls / self.forward_passes if self.forward_passes else 0.0
+            ),
+        }
+
+
+def enable_micro_batching(
+    model_list: list, concurrency: Optional[Callable[[], int]] = None
+) -> list:
+    """
+    Wrap the detection and layout models of a marker model list in MicroBatchedModel.
+
+    Configured with MARKER_MICROBATCH (on by default), MARKER_MICROBATCH_MAX_SIZE
+    and MARKER_MICROBATCH_WAIT_MS. Returns the list unchanged when disabled.
+    """
+    if not env_flag("MARKER_MICROBATCH", True):
+        return model_list
+    max_batch_size = int(os.environ.get("MARKER_MICROBATCH_MAX_SIZE", 32))
+    max_wait_ms = float(os.environ.get("MARKER_MICROBATCH_WAIT_MS", 10))
+    model_list = list(model_list)
+    for index in (LAYOUT_MODEL_INDEX, DETECTION_MODEL_INDEX):
+        if model_list[index] is not None:
+            model_list[index] = MicroBatchedModel(
+                model_list[index], max_batch_size, max_wait_ms, concurrency
+            )
+    logger.info(
+        f"Micro-batching detection and layout: up to {max_batch_size} rows, {max_wait_ms}ms wait"
+    )
+    return model_list
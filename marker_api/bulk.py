@@ -0,0 +1,658 @@
+import os
+import json
+import time
+import uuid
+import base64
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from celery.states import SUCCESS, REVOKED
+from fastapi import HTTPException
+from marker_api.cache import sha256_file
+from marker_api.cancellation import cancel_tasks
+from marker_api.celery_routes import (
+    cancel_unshared,
+    collect_task_metas,
+    conversion_key,
+    image_options_payload,
+    submit_conversion,
+)
+from marker_api.claim_check import claim_check_store, load_result, release_payload
+from marker_api.model.schema import BulkJobRequest
+from marker_api.monitor import cluster_monitor
+from marker_api.sharding import plan_document
+from marker_api.throughput import MIN_TIME_LIMIT, wait_timeout
+
+logger = logging.getLogger(__name__)
+
+# SQLite database holding every bulk job and the state of each of its files
+BULK_DB = os.environ.get("MARKER_BULK_DB", "bulk_jobs.sqlite3")
+# Sources and output directories must be inside this directory; bulk jobs are disabled without it
+BULK_ROOT = os.environ.get("MARKER_BULK_ROOT")
+# Where results go when a job names no output directory (one subdirectory per job)
+BULK_OUTPUT_DIR = os.environ.get("MARKER_BULK_OUTPUT_DIR", "bulk_output")
+# Conversions a job keeps queued or running at once, unless the job sets its own
+BULK_MAX_IN_FLIGHT = int(os.environ.get("MARKER_BULK_MAX_IN_FLIGHT", 32))
+# Seconds between two rounds of polling results and queueing more files
+BULK_POLL_INTERVAL = float(os.environ.get("MARKER_BULK_POLL_INTERVAL", 2.0))
+# A job whose runner has not checked in for this long is taken over by another API process
+BULK_LEASE_SECONDS = int(os.environ.get("MARKER_BULK_LEASE_SECONDS", 60))
+# Times a file is queued again after its task was lost, before it counts as failed
+BULK_MAX_ATTEMPTS = 3
+# Window of the recent throughput reported for a job
+RECENT_WINDOW = 300
+
+RUNNING, PAUSED, COMPLETED, CANCELLED = "running", "paused", "completed", "cancelled"
+# File states: pending (to be queued), queued (task submitted), done, failed
+PENDING, QUEUED, DONE, FAILED = "pending", "queued", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    source_type TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    enumerated INTEGER NOT NULL DEFAULT 0,
+    exhausted INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    active_seconds REAL NOT NULL DEFAULT 0,
+    owner TEXT,
+    heartbeat_at REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    task_id TEXT,
+    pages INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    queued_at REAL,
+    finished_at REAL,
+    PRIMARY KEY (job_id, path)
+);
+CREATE INDEX IF NOT EXISTS files_by_state ON files (job_id, state);
+CREATE INDEX IF NOT EXISTS files_by_finish ON files (job_id, finished_at);
+"""
+
+
+def within_root(path: str) -> bool:
+    """
+    Whether a path is inside MARKER_BULK_ROOT; nothing is when it is unset.
+    """
+    if not BULK_ROOT:
+        return False
+    root = os.path.realpath(BULK_ROOT)
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+
+def resolve_path(path: str) -> str:
+    """
+    Absolute form of a client-supplied path, rejected (400) when outside MARKER_BULK_ROOT.
+
+    Without MARKER_BULK_ROOT bulk jobs are disabled (403): they would let any
+    client read and write anywhere the server can.
+    """
+    if not BULK_ROOT:
+        raise HTTPException(status_code=403, detail="Bulk jobs are disabled until MARKER_BULK_ROOT is set")
+    if not within_root(path):
+        raise HTTPException(status_code=400, detail=f"{path} is outside MARKER_BULK_ROOT")
+    return os.path.realpath(path)
+
+
+def enumerate_source(source: str, source_type: str, recursive: bool = True) -> Iterator[str]:
+    """
+    Yield the PDFs of a job lazily, in the same order on every run.
+
+    A directory is walked one directory at a time in sorted order; a manifest
+    is read line by line (one path per line, relative to the manifest's
+    directory unless absolute; blank lines and # comments are skipped).
+    """
+    if source_type == "manifest":
+        base = os.path.dirname(source)
+        with open(source, encoding="utf-8") as manifest:
+            for line in manifest:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield os.path.join(base, line)
+        return
+    for directory, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        if not recursive:
+            dirnames.clear()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".pdf"):
+                yield os.path.join(directory, filename)
+
+
+def write_output(output_dir: str, relative_path: str, result: Dict[str, Any]) -> str:
+    """
+    Save a conversion like marker's own CLI: <name>/<name>.md, <name>_meta.json and the images.
+    """
+    name = os.path.splitext(os.path.basename(relative_path))[0]
+    folder = os.path.join(output_dir, os.path.splitext(relative_path)[0])
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, f"{name}.md"), "w", encoding="utf-8") as f:
+        f.write(result.get("markdown") or "")
+    with open(os.path.join(folder, f"{name}_meta.json"), "w", encoding="utf-8") as f:
+        json.dump(result.get("metadata") or {}, f, indent=4)
+    for image_name, data in (result.get("images") or {}).items():
+        with open(os.path.join(folder, image_name), "wb") as f:
+            f.write(base64.b64decode(data))
+    return folder
+
+
+class BulkJobStore:
+    """
+    Durable state of bulk jobs in SQLite: one row per job and per enumerated file.
+
+    Every call opens its own connection, so the store is shared freely between
+    the request handlers and the job runner threads.
+
+    Args:
+    path (str): The SQLite database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with self._lock:
+                if not self._initialized:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.executescript(SCHEMA)
+                    self._initialized = True
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create_job(self, job_id: str, source: str, source_type: str, output_dir: str, options: Dict[str, Any]):
+        with self.connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, source, source_type, output_dir, options, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, source, source_type, output_dir, json.dumps(options), RUNNING, time.time()),
+            )
+
+    def get_job(self, job_id: str) -> Optional[sqlite3.Row]:
+        with self.connect() as db:
+            return db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def list_jobs(self) -> List[sqlite3.Row]:
+        with self.connect() as db:
+            return db.execute("SELECT * FROM jobs ORDER BY created_at DESC").fetchall()
+
+    def set_status(self, job_id: str, status: str):
+        finished_at = time.time() if status in (COMPLETED, CANCELLED) else None
+        with self.connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?",
+                (status, finished_at, job_id),
+            )
+
+    def acquire(self, job_id: str, owner: str) -> bool:
+        """
+        Take the lease of a running job, unless a live runner elsewhere holds it.
+        """
+        now = time.time()
+        with self.connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET owner = ?, heartbeat_at = ? WHERE id = ? AND status = ?"
+                " AND (owner IS NULL OR owner = ? OR heartbeat_at < ?)",
+                (owner, now, job_id, RUNNING, owner, now - BULK_LEASE_SECONDS),
+            )
+            return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: str, owner: str, active_seconds: float) -> Optional[str]:
+        """
+        Renew the lease and add running time; returns the job status, None if the lease was lost.
+        """
+        with self.connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET heartbeat_at = ?, active_seconds = active_seconds + ?"
+                " WHERE id = ? AND owner = ?",
+                (time.time(), active_seconds, job_id, owner),
+            )
+            if cursor.rowcount != 1:
+                return None
+            return db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()["status"]
+
+    def release(self, job_id: str, owner: str):
+        with self.connect() as db:
+            db.execute(
+                "UPDATE jobs SET owner = NULL, heartbeat_at = NULL WHERE id = ? AND owner = ?",
+                (job_id, owner),
+            )
+
+    def add_files(self, job_id: str, paths: List[Tuple[int, str]], enumerated: int, exhausted: bool):
+        # Re-enumerating after a restart may yield files already recorded; they are ignored
+        with self.connect() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO files (job_id, seq, path, state) VALUES (?, ?, ?, ?)",
+                [(job_id, seq, path, PENDING) for seq, path in paths],
+            )
+            db.execute(
+                "UPDATE jobs SET enumerated = ?, exhausted = ? WHERE id = ?",
+                (enumerated, int(exhausted), job_id),
+            )
+
+    def files(self, job_id: str, state: str, limit: int = -1, offset: int = 0) -> List[sqlite3.Row]:
+        with self.connect() as db:
+            return db.execute(
+                "SELECT * FROM files WHERE job_id = ? AND state = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (job_id, state, limit, offset),
+            ).fetchall()
+
+    def count(self, job_id: str, state: str) -> int:
+        with self.connect() as db:
+            return db.execute(
+                "SELECT COUNT(*) FROM files WHERE job_id = ? AND state = ?", (job_id, state)
+            ).fetchone()[0]
+
+    def update_file(self, job_id: str, path: str, **fields):
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with self.connect() as db:
+            db.execute(
+                f"UPDATE files SET {columns} WHERE job_id = ? AND path = ?",
+                (*fields.values(), job_id, path),
+            )
+
+    def progress(self, job_id: str) -> Dict[str, Any]:
+        """
+        File counts by state, plus overall and recent throughput of finished files.
+        """
+        with self.connect() as db:
+            counts = dict(
+                db.execute(
+                    "SELECT state, COUNT(*) FROM files WHERE job_id = ? GROUP BY state", (job_id,)
+                ).fetchall()
+            )
+            pages_done = db.execute(
+                "SELECT COALESCE(SUM(pages), 0) FROM files WHERE job_id = ? AND state = ?",
+                (job_id, DONE),
+            ).fetchone()[0]
+            recent_files, recent_pages = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pages), 0) FROM files"
+                " WHERE job_id = ? AND state = ? AND finished_at >= ?",
+                (job_id, DONE, time.time() - RECENT_WINDOW),
+            ).fetchone()
+        return {
+            "counts": {state: counts.get(state, 0) for state in (PENDING, QUEUED, DONE, FAILED)},
+            "pages_done": pages_done,
+            "recent_files_per_second": recent_files / RECENT_WINDOW,
+            "recent_pages_per_second": recent_pages / RECENT_WINDOW,
+        }
+
+
+class BulkJobRunner:
+    """
+    Drives running bulk jobs from background threads of the API process.
+
+    Each round a job's thread records the files whose conversions finished
+    (writing their output and marking them done or failed), then tops the job
+    back up to `max_in_flight` queued conversions: first files left pending,
+    then the next files from the lazily enumerated source. The enumeration
+    position is saved with the new files, so a job resumed after a restart
+    continues where it stopped and never converts a finished file again.
+
+    A job is held by one API process at a time through a lease renewed every
+    round. A supervisor thread (see watch) periodically takes over running
+    jobs whose lease expired, e.g. after their process died or during a
+    rolling deploy where the old process still held the lease at startup.
+    """
+
+    def __init__(self, store: BulkJobStore, poll_interval: float):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads: Dict[str, threading.Thread] = {}
+        self._supervisor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, job_id: str) -> bool:
+        with self._lock:
+            if self._stop.is_set():
+                return False
+            thread = self._threads.get(job_id)
+            if thread is not None and thread.is_alive():
+                return True
+            if not self.store.acquire(job_id, self.owner):
+                return False
+            thread = threading.Thread(target=self._run, args=(job_id,), name=f"bulk-{job_id[:8]}", daemon=True)
+            self._threads[job_id] = thread
+            thread.start()
+            return True
+
+    def resume_interrupted(self):
+        for job in self.store.list_jobs():
+            if job["status"] == RUNNING and self.start(job["id"]):
+                logger.info(f"Resuming bulk job {job['id']} from file {job['enumerated']}")
+
+    def watch(self, interval: float = BULK_LEASE_SECONDS / 2):
+        """
+        Resume interrupted jobs now and every `interval` seconds, from a background thread.
+
+        Retrying matters when the previous owner's lease was still live at
+        startup: the job is picked up once that lease runs out.
+        """
+        if self._supervisor is not None:
+            return
+        self._supervisor = threading.Thread(
+            target=self._supervise, args=(interval,), name="bulk-supervisor", daemon=True
+        )
+        self._supervisor.start()
+
+    def _supervise(self, interval: float):
+        while not self._stop.is_set():
+            try:
+                self.resume_interrupted()
+            except Exception as e:
+                logger.warning(f"Could not resume bulk jobs: {str(e)}")
+            self._stop.wait(interval)
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Stop every job thread and release its lease; the jobs themselves stay running.
+
+        The next API process (or another replica) takes them over right away
+        instead of waiting for the leases to expire.
+        """
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            threads = dict(self._threads)
+        if self._supervisor is not None:
+            self._supervisor.join(max(deadline - time.monotonic(), 0))
+        for job_id, thread in threads.items():
+            thread.join(max(deadline - time.monotonic(), 0))
+            if thread.is_alive():
+                # Stuck in a round (a slow Redis call, a large result); its lease goes now anyway
+                logger.warning(f"Bulk job {job_id} did not stop in time, releasing its lease")
+                self.store.release(job_id, self.owner)
+
+    def _run(self, job_id: str):
+        job = self.store.get_job(job_id)
+        options = json.loads(job["options"])
+        enumerated = job["enumerated"]
+        source = None
+        if not job["exhausted"]:
+            source = enumerate_source(job["source"], job["source_type"], options.get("recursive", True))
+            try:
+                # The enumeration order is stable, so the files seen before are skipped by position
+                for _ in range(enumerated):
+                    next(source)
+            except StopIteration:
+                source = None
+            except OSError as e:
+                logger.error(f"Bulk job {job_id} cannot read {job['source']}: {str(e)}")
+                source = None
+        last = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                status = self.store.heartbeat(job_id, self.owner, now - last)
+                last = now
+                if status != RUNNING:
+                    break
+                try:
+                    self._collect(job_id, job["output_dir"], job["source"], job["source_type"])
+                    source, enumerated = self._fill(job_id, options, source, enumerated)
+                except Exception as e:
+                    # Redis or the store being briefly unavailable must not end the job
+                    logger.warning(f"Bulk job {job_id} round failed: {str(e)}", exc_info=True)
+                else:
+                    if source is None and not self.store.count(job_id, QUEUED) and not self.store.count(job_id, PENDING):
+                        self.store.set_status(job_id, COMPLETED)
+                        logger.info(f"Bulk job {job_id} completed")
+                        break
+                self._stop.wait(self.poll_interval)
+        finally:
+            self.store.release(job_id, self.owner)
+
+    def _collect(self, job_id: str, output_dir: str, source: str, source_type: str):
+        queued = self.store.files(job_id, QUEUED)
+        if not queued:
+            return
+        base = source if source_type == "directory" else os.path.dirname(source)
+        metas = collect_task_metas([row["task_id"] for row in queued])
+        for row, meta in zip(queued, metas):
+            if meta is None:
+                self._check_lost(job_id, row)
+            elif meta["status"] == SUCCESS:
+                try:
+                    result = load_result(meta["result"])
+                    relative = os.path.relpath(row["path"], base)
+                    if relative.startswith(".."):
+                        relative = os.path.basename(row["path"])
+                    write_output(output_dir, relative, result)
+                    pages = (result.get("metadata") or {}).get("pages") or row["pages"]
+                    self.store.update_file(job_id, row["path"], state=DONE, pages=pages, finished_at=time.time())
+                except Exception as e:
+                    logger.error(f"Bulk job {job_id}: could not save {row['path']}: {str(e)}")
+                    self.store.update_file(job_id, row["path"], state=FAILED, error=str(e), finished_at=time.time())
+            else:
+                error = "The conversion was cancelled" if meta["status"] == REVOKED else str(meta["result"])
+                self.store.update_file(job_id, row["path"], state=FAILED, error=error, finished_at=time.time())
+
+    def _check_lost(self, job_id: str, row: sqlite3.Row):
+        # No result after the estimate plus the deadline: the task (or its result) is gone
+        elapsed = time.time() - row["queued_at"]
+        if elapsed < MIN_TIME_LIMIT or elapsed < wait_timeout(row["pages"], cluster_monitor.snapshot):
+            return
+        # Cancelling frees the single-flight key, which still names the lost
+        # task; otherwise queueing the file again would just attach to it
+        cancel_tasks([row["task_id"]])
+        if row["attempts"] >= BULK_MAX_ATTEMPTS:
+            self.store.update_file(
+                job_id, row["path"], state=FAILED, error="No result after repeated attempts", finished_at=time.time()
+            )
+        else:
+            logger.warning(f"Bulk job {job_id}: no result for {row['path']}, queueing it again")
+            self.store.update_file(job_id, row["path"], state=PENDING)
+
+    def _fill(self, job_id: str, options: Dict[str, Any], source, enumerated: int):
+        slots = options["max_in_flight"] - self.store.count(job_id, QUEUED)
+        if slots <= 0:
+            return source, enumerated
+        # Enumerate only as far as there are free slots
+        pending = self.store.files(job_id, PENDING, limit=slots)
+        if len(pending) < slots and source is not None:
+            new = []
+            for path in source:
+                new.append((enumerated, path))
+                enumerated += 1
+                if len(pending) + len(new) >= slots:
+                    break
+            else:
+                source = None
+            self.store.add_files(job_id, new, enumerated, exhausted=source is None)
+            pending = self.store.files(job_id, PENDING, limit=slots)
+        for row in pending:
+            if self._stop.is_set():
+                break
+            self._submit(job_id, options, row)
+        return source, enumerated
+
+    def _submit(self, job_id: str, options: Dict[str, Any], row: sqlite3.Row):
+        path = row["path"]
+        if not within_root(path):
+            # Manifest entries can point anywhere; they get the same check as the manifest
+            self.store.update_file(
+                job_id, path, state=FAILED, error="Outside MARKER_BULK_ROOT", finished_at=time.time()
+            )
+            return
+        try:
+            pages, shards = plan_document(path)
+            flight_key = conversion_key(sha256_file(path), options["image_options"], shards)
+            pdf_ref = claim_check_store.put_file(path)
+        except OSError as e:
+            # Missing or unreadable files will not get better by retrying
+            self.store.update_file(job_id, path, state=FAILED, error=str(e), finished_at=time.time())
+            return
+        try:
+            task = submit_conversion(
+                os.path.basename(path),
+                pdf_ref,
+                options["image_options"],
+                shards,
+                pages,
+                options.get("priority"),
+                flight_key,
+            )
+        except Exception:
+            # The broker or Redis is unavailable: the file stays pending for the
+            # next round, which stores it again
+            release_payload(pdf_ref)
+            raise
+        self.store.update_file(
+            job_id,
+            path,
+            state=QUEUED,
+            task_id=task.id,
+            pages=pages,
+            attempts=row["attempts"] + 1,
+            queued_at=time.time(),
+        )
+
+
+bulk_store = BulkJobStore(BULK_DB)
+bulk_runner = BulkJobRunner(bulk_store, BULK_POLL_INTERVAL)
+
+
+def job_response(job: sqlite3.Row) -> Dict[str, Any]:
+    progress = bulk_store.progress(job["id"])
+    counts = progress["counts"]
+    finished = counts[DONE] + counts[FAILED]
+    active = job["active_seconds"] or 0
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "source": job["source"],
+        "output_dir": job["output_dir"],
+        "discovered": job["enumerated"],
+        "enumeration_complete": bool(job["exhausted"]),
+        **counts,
+        "pages_done": progress["pages_done"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+        "active_seconds": round(active, 1),
+        "files_per_second": round(finished / active, 4) if active else None,
+        "pages_per_second": round(progress["pages_done"] / active, 4) if active else None,
+        "recent_files_per_second": round(progress["recent_files_per_second"], 4),
+        "recent_pages_per_second": round(progress["recent_pages_per_second"], 4),
+    }
+    # Only a fully enumerated job knows how much is left
+    remaining = counts[PENDING] + counts[QUEUED]
+    if job["exhausted"] and job["status"] == RUNNING and progress["recent_files_per_second"]:
+        response["estimated_seconds"] = round(remaining / progress["recent_files_per_second"], 1)
+    return response
+
+
+def _get_job_or_404(job_id: str) -> sqlite3.Row:
+    job = bulk_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    return job
+
+
+def create_bulk_job(request: BulkJobRequest) -> Dict[str, Any]:
+    if (request.directory is None) == (request.manifest is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of directory or manifest")
+    source_type = "directory" if request.directory is not None else "manifest"
+    source = resolve_path(request.directory or request.manifest)
+    if source_type == "directory" and not os.path.isdir(source):
+        raise HTTPException(status_code=400, detail=f"{source} is not a directory")
+    if source_type == "manifest" and not os.path.isfile(source):
+        raise HTTPException(status_code=400, detail=f"{source} is not a file")
+    options = {
+        "image_options": image_options_payload(request.image_options),
+        "priority": request.priority,
+        "max_in_flight": request.max_in_flight or BULK_MAX_IN_FLIGHT,
+        "recursive": request.recursive,
+    }
+    job_id = str(uuid.uuid4())
+    if request.output_dir:
+        output_dir = resolve_path(request.output_dir)
+    else:
+        output_dir = os.path.abspath(os.path.join(BULK_OUTPUT_DIR, job_id))
+    bulk_store.create_job(job_id, source, source_type, output_dir, options)
+    bulk_runner.start(job_id)
+    logger.info(f"Bulk job {job_id} started on {source_type} {source}")
+    return job_response(bulk_store.get_job(job_id))
+
+
+def get_bulk_job(job_id: str) -> Dict[str, Any]:
+    return job_response(_get_job_or_404(job_id))
+
+
+def list_bulk_jobs() -> List[Dict[str, Any]]:
+    return [job_response(job) for job in bulk_store.list_jobs()]
+
+
+def list_bulk_files(job_id: str, state: str, limit: int, offset: int) -> Dict[str, Any]:
+    _get_job_or_404(job_id)
+    rows = bulk_store.files(job_id, state, limit, offset)
+    return {
+        "job_id": job_id,
+        "state": state,
+        "files": [
+            {
+                "path": row["path"],
+                "state": row["state"],
+                "task_id": row["task_id"],
+                "pages": row["pages"],
+                "attempts": row["attempts"],
+                "error": row["error"],
+                "finished_at": row["finished_at"],
+            }
+            for row in rows
+        ],
+    }
+
+
+def pause_bulk_job(job_id: str) -> Dict[str, Any]:
+    """
+    Stop queueing new files; conversions already queued finish and are recorded on resume.
+    """
+    job = _get_job_or_404(job_id)
+    if job["status"] == RUNNING:
+        bulk_store.set_status(job_id, PAUSED)
+    return job_response(bulk_store.get_job(job_id))
+
+
+def resume_bulk_job(job_id: str) -> Dict[str, Any]:
+    job = _get_job_or_404(job_id)
+    if job["status"] in (COMPLETED, CANCELLED):
+        raise HTTPException(status_code=409, detail=f"Bulk job is {job['status']}")
+    bulk_store.set_status(job_id, RUNNING)
+    if not bulk_runner.start(job_id):
+        raise HTTPException(status_code=409, detail="Bulk job is being run by another API process")
+    return job_response(bulk_store.get_job(job_id))
+
+
+def cancel_bulk_job(job_id: str, terminate: bool = False) -> Dict[str, Any]:
+    """
+    Cancel a job and its queued conversions; files already converted stay in the output directory.
+    """
+    job = _get_job_or_404(job_id)
+    if job["status"] not in (COMPLETED, CANCELLED):
+        bulk_store.set_status(job_id, CANCELLED)
+        queued = bulk_store.files(job_id, QUEUED)
+        # Conversions coalesced with an awaiting request keep running for it
+        cancel_unshared([row["task_id"] for row in queued], terminate)
+    return job_response(bulk_store.get_job(job_id))
@@ -0,0 +1,266 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_hex(data: bytes) -> str:
+    """
+    Return the hex SHA-256 digest of some bytes.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the hex SHA-256 digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_sha256: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Build a cache key from the digest of the uploaded file and the conversion options.
+
+    Args:
+    content_sha256 (str): Hex SHA-256 digest of the PDF bytes.
+    options (dict): Options that change the conversion output.
+
+    Returns:
+    str: A hex digest identifying this (content, options) pair.
+    """
+    options_blob = json.dumps(options or {}, sort_keys=True, default=str)
+    return sha256_hex(f"{content_sha256}:{options_blob}".encode("utf-8"))
+
+
+class ByteLRU:
+    """
+    Thread-safe in-memory LRU of bytes values, bounded by total size in bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes) -> bool:
+        size = len(value)
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+        return True
+
+
+class DiskStore:
+    """
+    Directory of bytes values with size-based eviction of the least recently used files.
+
+    Reads touch the file's mtime, so eviction order follows access order.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.current_bytes = sum(size for _, size, _ in self._scan())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes) -> bool:
+        if len(value) > self.max_bytes:
+            return False
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                self.current_bytes -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+            self.current_bytes += len(value)
+            if self.current_bytes > self.max_bytes:
+                self._evict()
+        return True
+
+    def _evict(self):
+        # Oldest access first; rescanning keeps us honest if another process shares the directory
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        self.current_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.current_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.current_bytes -= size
+            self.evictions += 1
+
+
+class ConversionCache:
+    """
+    Content-addressed cache of conversion results.
+
+    Results are kept as JSON in a byte-bounded in-memory LRU, with an optional
+    on-disk tier that survives restarts and is shared by processes on the same host.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 0,
+    ):
+        self.memory = ByteLRU(max_memory_bytes) if max_memory_bytes > 0 else None
+        self.disk = (
+            DiskStore(disk_dir, max_disk_bytes)
+            if disk_dir and max_disk_bytes > 0
+            else None
+        )
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory is not None or self.disk is not None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Returns:
+        dict: The cached result, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        value = self.memory.get(key) if self.memory is not None else None
+        tier = "memory"
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            tier = "disk"
+            if value is not None and self.memory is not None:
+                # Promote so the next hit does not touch the disk
+                self.memory.put(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+        return json.loads(value)
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        Store a result under the given key in every enabled tier.
+        """
+        if not self.enabled:
+            return
+        value = json.dumps(result, default=str).encode("utf-8")
+        if self.memory is not None:
+            self.memory.put(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, value)
+            except OSError as e:
+                logger.warning(f"Could not write cache entry {key} to disk: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self.memory) if self.memory is not None else 0,
+                "memory_bytes": self.memory.current_bytes if self.memory is not None else 0,
+                "memory_evictions": self.memory.evictions if self.memory is not None else 0,
+                "disk_bytes": self.disk.current_bytes if self.disk is not None else 0,
+                "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+            }
+
+
+def build_cache_from_env() -> ConversionCache:
+    """
+    Create the conversion cache configured through environment variables.
+
+    MARKER_CACHE_MAX_BYTES: size of the in-memory tier (0 disables it).
+    MARKER_CACHE_DIR: directory of the on-disk tier (unset disables it).
+    MARKER_CACHE_DISK_MAX_BYTES: size of the on-disk tier.
+    """
+    max_memory_bytes = int(os.environ.get("MARKER_CACHE_MAX_BYTES", 512 * 1024**2))
+    disk_dir = os.environ.get("MARKER_CACHE_DIR") or None
+    max_disk_bytes = int(os.environ.get("MARKER_CACHE_DISK_MAX_BYTES", 10 * 1024**3))
+    cache = ConversionCache(max_memory_bytes, disk_dir, max_disk_bytes)
+    logger.info(
+        f"Conversion cache: memory={max_memory_bytes} bytes, "
+        f"disk={disk_dir or 'disabled'} ({max_disk_bytes} bytes)"
+    )
+    return cache
+
+
+conversion_cache = build_cache_from_env()
@@ -0,0 +1,75 @@
+import os
+import logging
+from typing import Iterable, List
+from celery.states import READY_STATES
+from marker_api.celery_worker import celery_app
+from marker_api.monitor import clear_pending_pages
+from marker_api.single_flight import release as release_single_flight
+
+logger = logging.getLogger(__name__)
+
+# How long a cancellation flag is kept; tasks queued longer than this are only stopped by revoke
+CANCEL_TTL = int(os.environ.get("MARKER_CANCEL_TTL", 24 * 3600))
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a task whose conversion was cancelled, at the next document or shard boundary.
+    """
+
+
+def _cancel_key(task_id: str) -> str:
+    return f"marker:cancel:{task_id}"
+
+
+def is_cancelled(*task_ids) -> bool:
+    task_ids = [task_id for task_id in task_ids if task_id]
+    if not task_ids:
+        return False
+    try:
+        return celery_app.backend.client.exists(*[_cancel_key(task_id) for task_id in task_ids]) > 0
+    except Exception as e:
+        # A Redis hiccup must not fail the conversion itself
+        logger.warning(f"Could not check cancellation of {task_ids}: {str(e)}")
+        return False
+
+
+def abort_if_cancelled(*task_ids):
+    """
+    Raise TaskCancelled if any of the task ids (a task, the document it belongs to) was cancelled.
+    """
+    if is_cancelled(*task_ids):
+        raise TaskCancelled(f"Task {task_ids[0]} was cancelled")
+
+
+def cancel_tasks(task_ids: Iterable[str], terminate: bool = False) -> List[str]:
+    """
+    Cancel conversions by task id and return the ids that were still unfinished.
+
+    Each task gets a cancellation flag that running tasks check at document
+    and shard boundaries, and a revoke broadcast so workers drop it if it
+    has not started. The result is set to REVOKED right away, which wakes
+    anyone waiting on it; a worker that was mid-conversion sees the flag and
+    discards its output. `terminate` also kills the process running it (not
+    supported by the solo pool).
+    """
+    backend = celery_app.backend
+    cancelled = []
+    for task_id in task_ids:
+        if backend.get_task_meta(task_id, cache=False)["status"] in READY_STATES:
+            continue
+        cancelled.append(task_id)
+    if not cancelled:
+        return cancelled
+
+    pipe = backend.client.pipeline(transaction=False)
+    for task_id in cancelled:
+        pipe.set(_cancel_key(task_id), 1, ex=CANCEL_TTL)
+    pipe.execute()
+    celery_app.control.revoke(cancelled, terminate=terminate)
+    for task_id in cancelled:
+        backend.mark_as_revoked(task_id, reason="cancelled")
+        clear_pending_pages(task_id)
+        release_single_flight(task_id, succeeded=False)
+    logger.info(f"Cancelled {len(cancelled)} task(s): {', '.join(cancelled)}")
+    return cancelled
@@ -1,11 +1,51 @@
-from fastapi import HTTPException, UploadFile, File, Body
-from celery.result import AsyncResult
-from fastapi.responses import JSONResponse
-from marker_api.celery_tasks import convert_pdf_to_markdown, process_batch
+from fastapi import HTTPException, Request, Body
+from celery import chord
+from celery.result import AsyncResult, GroupResult
+from celery.states import READY_STATES, REVOKED, SUCCESS
+from fastapi.responses import JSONResponse, Response
+from marker_api.cache import sha256_file
+from marker_api.celery_tasks import (
+    convert_pdf_shard,
+    convert_pdf_to_markdown,
+    merge_pdf_shards,
+    release_failed_document,
+)
+from marker_api.cancellation import cancel_tasks
+from marker_api.celery_worker import celery_app
+from marker_api.claim_check import claim_check_store, load_result, release_payload
+from marker_api.image_store import (
+    build_zip_bundle,
+    externalize_images,
+)
+from marker_api.model.schema import ImageMode, ImageOptions
+from marker_api.monitor import cluster_monitor, track_pending_pages
+from marker_api.routing import route
+from marker_api.sharding import plan_document
+from marker_api.single_flight import (
+    SINGLE_FLIGHT,
+    claim,
+    detach,
+    find_inflight,
+    release,
+    single_flight_key,
+    waiting_refs,
+)
+from marker_api.throughput import (
+    estimate_completion,
+    time_limits,
+    wait_timeout,
+    worker_throughput,
+)
+from marker_api.uploads import cleanup_uploads, spool_file, spool_request
+from marker_api.waiter import task_waiter
+import os
+import json
+import time
+import uuid
+import redis
 import logging
 import asyncio
-import aiofiles
-from typing import List
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +55,23 @@ async def convert_pdf(pdf_filename: str = Body(..., embed=True)):
     return await celery_convert_pdf_concurrent_await(pdf_filename)
 
 
-async def celery_result(task_id: str):
+async def celery_result(task_id: str, image_mode: ImageMode = ImageMode.inline):
     task = AsyncResult(task_id)
     if not task.ready():
         return JSONResponse(
             status_code=202, content={"task_id": str(task_id), "status": "Processing"}
         )
-    result = task.get()
+    if task.state == REVOKED:
+        return {"task_id": task_id, "status": "Cancelled"}
+    if task.state != SUCCESS:
+        # A failed conversion is an answer, not a server error clients should retry
+        return {"task_id": task_id, "status": "Error", "error": str(task.result)}
+    result = await asyncio.to_thread(load_result, task.result)
+    if image_mode == ImageMode.zip:
+        bundle = await asyncio.to_thread(build_zip_bundle, [result])
+        return Response(content=bundle, media_type="application/zip")
+    if image_mode == ImageMode.reference:
+        result = await asyncio.to_thread(externalize_images, result)
     return {"task_id": task_id, "status": "Success", "result": result}
 
 
@@ -29,77 +79,254 @@ async def celery_offline_root():
     return {"message": "Celery is offline. No API is available."}
 
 
-async def celery_convert_pdf_sync(pdf_file: UploadFile = File(...)):
-    logger.info(f"Starting synchronous PDF conversion for file: {pdf_file.filename}")
-    contents = await pdf_file.read()
-    task = convert_pdf_to_markdown.delay(pdf_file.filename, contents)
-    result = task.get(timeout=3600)  # Increased to 10-minute timeout
-    logger.info(f"Completed synchronous conversion for file: {pdf_file.filename}")
+def image_options_payload(image_options: Optional[ImageOptions]) -> dict:
+    # Celery arguments travel as JSON
+    return (image_options or ImageOptions()).model_dump(mode="json")
+
+
+def largest_task(pages: Optional[int], shards=None) -> Optional[int]:
+    # A sharded document is done when its largest shard is
+    return max(max_pages for _, max_pages in shards) if shards else pages
+
+
+# How often an awaiting request checks whether its HTTP client is still connected
+DISCONNECT_CHECK_INTERVAL = 1.0
+
+
+async def wait_for_task(
+    task_id: str, timeout: Optional[float] = None, request: Optional[Request] = None
+) -> Optional[dict]:
+    """
+    Wait for a task's result meta, cancelling the task if the HTTP client goes away.
+
+    Returns None when the client disconnected first. The task itself is only
+    cancelled if no identical submission is attached to it (see single_flight).
+    Raises asyncio.TimeoutError after `timeout` seconds.
+    """
+    wait = asyncio.ensure_future(task_waiter.wait(task_id, timeout))
+    if request is None:
+        return await wait
+    try:
+        while True:
+            done, _ = await asyncio.wait({wait}, timeout=DISCONNECT_CHECK_INTERVAL)
+            if done:
+                return wait.result()
+            if await request.is_disconnected():
+                if await asyncio.to_thread(detach, task_id) == 0:
+                    logger.info(f"Client disconnected, cancelling task {task_id}")
+                    await asyncio.to_thread(cancel_tasks, [task_id])
+                return None
+    finally:
+        wait.cancel()
+
+
+def cancelled_response(task_id: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=409,
+        content={"task_id": task_id, "status": "Cancelled", "message": "The conversion was cancelled"},
+    )
+
+
+def conversion_key(
+    content_sha256: str, image_options: Optional[dict], shards=None
+) -> Optional[str]:
+    """
+    Single-flight key of a conversion, or None when de-duplication is disabled.
+
+    No image options means the defaults, so every endpoint keys them the same way.
+    """
+    if not SINGLE_FLIGHT:
+        return None
+    options = image_options or image_options_payload(None)
+    return single_flight_key(content_sha256, {"images": options, "shards": shards})
+
+
+def submit_conversion(
+    filename: str,
+    pdf_ref: dict,
+    image_options: dict,
+    shards=None,
+    pages=None,
+    priority: Optional[int] = None,
+    flight_key: Optional[str] = None,
+    waiting: bool = False,
+):
+    """
+    Queue a conversion, as one task or as shard tasks merged by a chord callback.
+
+    Tasks carry the claim-check reference of the document, never its bytes.
+    Each task goes to the queue matching its estimated cost (see
+    marker_api.routing), so short documents are not stuck behind long ones;
+    `priority` (0-9, higher first) orders tasks within a queue. Either way the
+    returned result resolves to a single PDFConversionResult (or a claim-check
+    reference to one; see load_result). Its pages count towards the pending
+    pages reported by /metrics until it finishes. Conversion tasks get time
+    limits scaled to their page count (see marker_api.throughput).
+
+    With a `flight_key` (see conversion_key), a submission identical to one
+    already queued or running returns that task's result instead of queueing
+    another conversion. Callers that await the result pass `waiting`, so the
+    task is only cancelled on their behalf once none of them waits for it.
+    """
+    task_id = str(uuid.uuid4())
+    if flight_key is not None:
+        existing = claim(flight_key, task_id, waiting)
+        if existing is not None:
+            release_payload(pdf_ref)
+            return AsyncResult(existing, app=celery_app)
+
+    size = pdf_ref.get("size")
+    workers = worker_throughput()
+    try:
+        if not shards:
+            options = {**route(pages, size, priority), **time_limits(pages, workers)}
+            logger.debug(f"Routing {filename} to {options['queue']}")
+            result = convert_pdf_to_markdown.apply_async(
+                (filename, pdf_ref, image_options), task_id=task_id, **options
+            )
+        else:
+            logger.info(f"Splitting {filename} into {len(shards)} shard tasks")
+            result = chord(
+                convert_pdf_shard.s(
+                    filename, pdf_ref, start_page, max_pages, image_options, document_id=task_id
+                ).set(
+                    **route(max_pages, size * max_pages // pages if size and pages else None, priority),
+                    **time_limits(max_pages, workers),
+                )
+                for start_page, max_pages in shards
+            )(
+                # Merging runs no models, so it never waits behind long conversions
+                merge_pdf_shards.s(filename, pdf_ref)
+                .set(**route(0, 0, priority))
+                .on_error(release_failed_document.s()),
+                task_id=task_id,
+            )
+    except Exception:
+        if flight_key is not None:
+            release(task_id, succeeded=False)
+        raise
+    track_pending_pages(result.id, pages)
+    return result
+
+
+async def celery_convert_pdf(
+    request: Request,
+    image_options: Optional[ImageOptions] = None,
+    shard_pages: Optional[int] = None,
+    priority: Optional[int] = None,
+):
+    # Spooling enforces the upload limits; the file then goes to the claim-check store
+    options = image_options_payload(image_options)
+    with await spool_file(request) as upload:
+        logger.info(f"Queueing PDF conversion for file: {upload.filename}")
+        pages, shards = await asyncio.to_thread(plan_document, upload.path, shard_pages)
+        flight_key = conversion_key(upload.sha256, options, shards)
+        if flight_key is not None:
+            existing = await asyncio.to_thread(find_inflight, flight_key)
+            if existing is not None:
+                return {"task_id": existing, "status": "Processing"}
+        pdf_ref = await asyncio.to_thread(claim_check_store.put_file, upload.path)
+    task = await asyncio.to_thread(
+        submit_conversion,
+        upload.filename,
+        pdf_ref,
+        options,
+        shards,
+        pages,
+        priority,
+        flight_key,
+    )
+    estimate = await asyncio.to_thread(
+        estimate_completion, pages, cluster_monitor.snapshot, largest_task(pages, shards)
+    )
+    return {"task_id": str(task.id), "status": "Processing", **estimate}
+
+
+async def celery_convert_pdf_sync(request: Request):
+    with await spool_file(request) as upload:
+        logger.info(f"Starting synchronous PDF conversion for file: {upload.filename}")
+        pages, _ = await asyncio.to_thread(plan_document, upload.path, 0)
+        flight_key = conversion_key(upload.sha256, None)
+        pdf_ref = await asyncio.to_thread(claim_check_store.put_file, upload.path)
+    task = await asyncio.to_thread(
+        submit_conversion,
+        upload.filename,
+        pdf_ref,
+        None,
+        pages=pages,
+        flight_key=flight_key,
+        waiting=True,
+    )
+    timeout = await asyncio.to_thread(wait_timeout, pages, cluster_monitor.snapshot)
+    meta = await wait_for_task(task.id, timeout=timeout, request=request)
+    if meta is None or meta["status"] == REVOKED:
+        return cancelled_response(task.id)
+    if meta["status"] != SUCCESS:
+        raise HTTPException(status_code=500, detail=f"Conversion failed: {str(meta['result'])}")
+    result = await asyncio.to_thread(load_result, meta["result"])
+    logger.info(f"Completed synchronous conversion for file: {upload.filename}")
     return {"status": "Success", "result": result}
 
 
-async def celery_convert_pdf_concurrent_await(pdf_filename: str):
+async def celery_convert_pdf_concurrent_await(
+    pdf_filename: str, request: Optional[Request] = None
+):
     logger.info(f"Starting concurrent PDF conversion for file: {pdf_filename}")
     try:
-        # 1. Read PDF file
+        # 1. Hand the PDF file to the claim-check store
         try:
-            async with aiofiles.open(pdf_filename, "rb") as pdf_file:
-                contents = await pdf_file.read()
-            logger.info(f"Successfully read PDF file {pdf_filename}. Size: {len(contents)} bytes")
+            pages, _ = await asyncio.to_thread(plan_document, pdf_filename, 0)
+            content_sha256 = await asyncio.to_thread(sha256_file, pdf_filename)
+            pdf_ref = await asyncio.to_thread(claim_check_store.put_file, pdf_filename)
+            logger.info(f"Successfully stored PDF file {pdf_filename}. Size: {pdf_ref['size']} bytes")
         except Exception as e:
             logger.error(f"Error reading PDF file {pdf_filename}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=400, detail=f"Error reading PDF file: {str(e)}")
 
         # 2. Start Celery task
         try:
-            task = convert_pdf_to_markdown.delay(pdf_filename, contents)
+            task = await asyncio.to_thread(
+                submit_conversion,
+                pdf_filename,
+                pdf_ref,
+                None,
+                pages=pages,
+                flight_key=conversion_key(content_sha256, None),
+                waiting=True,
+            )
             logger.info(f"Celery task started for {pdf_filename}: {task.id}")
         except Exception as e:
             logger.error(f"Failed to start Celery task for {pdf_filename}: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail="Failed to start conversion task")
 
-        # 3. Check task status with better handling
+        # 3. Wait for the completion notification pushed by the result backend;
+        #    a client that disconnects meanwhile cancels the task
         async def check_task_status():
-            attempts = 0
-            max_attempts = 3600  # 10 minutes with 1-second intervals
-            
-            while attempts < max_attempts:
-                try:
-                    task_status = AsyncResult(task.id)
-                    
-                    if task_status.ready():
-                        if task_status.successful():
-                            logger.info(f"Task {task.id} completed successfully")
-                            return task_status.get()
-                        else:
-                            error = task_status.result
-                            logger.error(f"Task {task.id} failed: {error}")
-                            raise HTTPException(status_code=500, detail=f"Conversion failed: {str(error)}")
-                    
-                    # Log status every 30 seconds
-                    if attempts % 30 == 0:
-                        logger.info(f"Task {task.id} status after {attempts}s: {task_status.status}")
-                    
-                    attempts += 1
-                    await asyncio.sleep(1)
-                
-                except Exception as e:
-                    logger.error(f"Error checking task {task.id} status: {str(e)}", exc_info=True)
-                    raise HTTPException(status_code=500, detail=f"Error monitoring task: {str(e)}")
-            
-            logger.error(f"Task {task.id} exceeded maximum execution time of {max_attempts} seconds")
-            raise asyncio.TimeoutError("Task exceeded maximum execution time")
+            meta = await wait_for_task(task.id, request=request)
+            if meta is None or meta["status"] == REVOKED:
+                return None
+            if meta["status"] != SUCCESS:
+                error = meta["result"]
+                logger.error(f"Task {task.id} failed: {error}")
+                raise HTTPException(status_code=500, detail=f"Conversion failed: {str(error)}")
+            logger.info(f"Task {task.id} completed successfully")
+            return await asyncio.to_thread(load_result, meta["result"])
 
-        # 4. Wait for task completion with timeout
+        # 4. Wait for task completion, up to its estimated completion plus its deadline
+        timeout = await asyncio.to_thread(wait_timeout, pages, cluster_monitor.snapshot)
         try:
-            result = await asyncio.wait_for(check_task_status(), timeout=3600)  # Increased to 10 minutes
+            result = await asyncio.wait_for(check_task_status(), timeout=timeout)
+            if result is None:
+                return cancelled_response(task.id)
             logger.info(f"Task completed successfully for file: {pdf_filename}")
             return {"status": "Success", "result": result}
             
         except asyncio.TimeoutError:
-            logger.error(f"Task {task.id} timed out after 600 seconds")
-            task.revoke(terminate=True)
-            logger.error(f"Task {task.id} was terminated due to timeout")
+            logger.error(f"Task {task.id} timed out after {timeout:.0f} seconds")
+            # Like a disconnect: only kill the task if no identical submission shares it
+            if await asyncio.to_thread(detach, task.id) == 0:
+                await asyncio.to_thread(cancel_tasks, [task.id], True)
+                logger.error(f"Task {task.id} was terminated due to timeout")
             return JSONResponse(
                 status_code=408,
                 content={
@@ -165,19 +392,273 @@ async def celery_convert_pdf_concurrent_await(pdf_filename: str):
 #         )
 
 
-async def celery_batch_convert(pdf_files: List[UploadFile] = File(...)):
-    batch_data = []
-    for pdf_file in pdf_files:
-        contents = await pdf_file.read()
-        batch_data.append((pdf_file.filename, contents))
+def cancel_unshared(task_ids: List[str], terminate: bool = False) -> Tuple[List[str], List[str]]:
+    """
+    Cancel the tasks no awaiting request shares (see single_flight.detach).
+
+    A task coalesced with an identical submission that another request still
+    awaits keeps running for that request; cancelling it would also release
+    its single-flight key. Returns the cancelled and the shared task ids.
+    """
+    shared = [task_id for task_id in task_ids if waiting_refs(task_id) > 0]
+    cancelled = cancel_tasks([task_id for task_id in task_ids if task_id not in shared], terminate)
+    return cancelled, shared
+
+
+def cancel_response(task_id: str, cancelled: List[str], shared: List[str]) -> dict:
+    if cancelled:
+        status = "Cancelled"
+    elif shared:
+        status = "Shared"
+    else:
+        status = "Finished"
+    return {"task_id": task_id, "status": status, "cancelled": len(cancelled), "shared": len(shared)}
+
+
+async def cancel_conversion(task_id: str, terminate: bool = False):
+    """
+    Cancel a conversion queued through /celery/convert (or any document task id).
+
+    A conversion another awaiting request shares is left running (status Shared).
+    """
+    cancelled, shared = await asyncio.to_thread(cancel_unshared, [task_id], terminate)
+    return cancel_response(task_id, cancelled, shared)
+
+
+async def cancel_batch(task_id: str, terminate: bool = False):
+    """
+    Cancel every unfinished document of a batch; finished results are kept.
+
+    Documents another awaiting request shares are left running.
+    """
+    batch = await asyncio.to_thread(GroupResult.restore, task_id, app=celery_app)
+    # A legacy process_batch batch is a single task that checks between documents
+    task_ids = [child.id for child in batch.results] if batch is not None else [task_id]
+    cancelled, shared = await asyncio.to_thread(cancel_unshared, task_ids, terminate)
+    return cancel_response(task_id, cancelled, shared)
+
+
+def batch_manifest_key(batch_id: str) -> str:
+    return f"marker:batch:{batch_id}"
+
 
-    # Start a single task to process the entire batch
-    task = process_batch.delay(batch_data)
+def submit_batch(
+    documents: List[tuple], image_options: dict, priority: Optional[int] = None
+) -> GroupResult:
+    """
+    Queue one conversion per document and save them as a GroupResult.
 
-    return {"task_id": str(task.id), "status": "Processing", "total": len(batch_data)}
+    Documents are spread over every worker instead of running one after the
+    other in a single task; each is sharded like a /celery/convert upload. The
+    filenames are saved next to the group so failures can be attributed.
 
+    Args:
+    documents (list): (filename, pdf_ref, shards, pages, flight_key) per document.
+    image_options (dict): Serialized ImageOptions.
+    priority (int): Optional priority shared by every document.
+    """
+    results = [
+        submit_conversion(filename, pdf_ref, image_options, shards, pages, priority, flight_key)
+        for filename, pdf_ref, shards, pages, flight_key in documents
+    ]
+    batch = GroupResult(str(uuid.uuid4()), results, app=celery_app)
+    batch.save()
+    celery_app.backend.client.set(
+        batch_manifest_key(batch.id),
+        json.dumps([document[0] for document in documents]),
+        ex=celery_app.conf.result_expires,
+    )
+    return batch
 
-async def celery_batch_result(task_id: str):
+
+async def celery_batch_convert(
+    request: Request,
+    image_options: Optional[ImageOptions] = None,
+    priority: Optional[int] = None,
+):
+    options = image_options_payload(image_options)
+    uploads = await spool_request(request, "pdf_files")
+    try:
+        documents = []
+        for upload in uploads:
+            pages, shards = await asyncio.to_thread(plan_document, upload.path)
+            pdf_ref = await asyncio.to_thread(claim_check_store.put_file, upload.path)
+            flight_key = conversion_key(upload.sha256, options, shards)
+            documents.append((upload.filename, pdf_ref, shards, pages, flight_key))
+    finally:
+        cleanup_uploads(uploads)
+
+    batch = await asyncio.to_thread(submit_batch, documents, options, priority)
+    # Documents whose pages could not be counted are left out of the estimate
+    counted = [(pages, shards) for _, _, shards, pages, _ in documents if pages]
+    estimate = await asyncio.to_thread(
+        estimate_completion,
+        sum(pages for pages, _ in counted),
+        cluster_monitor.snapshot,
+        max((largest_task(pages, shards) for pages, shards in counted), default=None),
+    )
+    return {"task_id": str(batch.id), "status": "Processing", "total": len(documents), **estimate}
+
+
+def batch_log_key(batch_id: str) -> str:
+    return f"marker:batch:{batch_id}:completed"
+
+
+# Page size of /batch_convert/result when the caller pages without a limit
+BATCH_PAGE_SIZE = int(os.environ.get("MARKER_BATCH_PAGE_SIZE", 50))
+
+
+def collect_batch_metas(batch: GroupResult) -> List[Optional[dict]]:
+    """
+    Fetch the result meta of every document of a batch in one round-trip.
+
+    Returns None for documents still pending. Results are not loaded here, so
+    polling a large batch only reads the documents it returns.
+    """
+    return collect_task_metas([child.id for child in batch.results])
+
+
+def collect_task_metas(task_ids: List[str]) -> List[Optional[dict]]:
+    # Result metas of finished tasks in one MGET; None for tasks still pending
+    backend = celery_app.backend
+    payloads = backend.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    metas = []
+    for payload in payloads:
+        meta = backend.meta_from_decoded(backend.decode_result(payload)) if payload else None
+        metas.append(meta if meta is not None and meta["status"] in READY_STATES else None)
+    return metas
+
+
+def document_result(meta: dict, filename: Optional[str]) -> dict:
+    if meta["status"] == SUCCESS:
+        return load_result(meta["result"])
+    if meta["status"] == REVOKED:
+        return {"filename": filename, "status": "Cancelled", "error": "The conversion was cancelled"}
+    return {"filename": filename, "status": "Error", "error": str(meta["result"])}
+
+
+def record_completions(batch_id: str, metas: List[Optional[dict]]) -> List[tuple]:
+    """
+    Append newly finished documents to the batch's completion log and return the log.
+
+    The log is an append-only Redis list of (document index, completed_at),
+    in the order polls first saw each document finish. Positions in it are
+    the cursors of /batch_convert/result, so a document finishing later
+    always lands after any cursor already handed out.
+    """
+    client = celery_app.backend.client
+    key = batch_log_key(batch_id)
+    finished = {index for index, meta in enumerate(metas) if meta is not None}
+    while True:
+        with client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                log = []
+                for entry in pipe.lrange(key, 0, -1):
+                    index, completed_at = entry.decode().split(":")
+                    log.append((int(index), float(completed_at)))
+                new = sorted(finished - {index for index, _ in log})
+                if not new:
+                    return log
+                now = time.time()
+                pipe.multi()
+                pipe.rpush(key, *[f"{index}:{now}" for index in new])
+                pipe.expire(key, celery_app.conf.result_expires)
+                pipe.execute()
+                return log + [(index, now) for index in new]
+            except redis.WatchError:
+                continue
+
+
+def batch_summary(task_id: str, metas: List[Optional[dict]]) -> dict:
+    completed = [meta for meta in metas if meta is not None]
+    failed = sum(1 for meta in completed if meta["status"] != SUCCESS)
+    total = len(metas)
+    return {
+        "task_id": task_id,
+        "completed": len(completed),
+        "total": total,
+        "successful": len(completed) - failed,
+        "failed": failed,
+        "progress": f"{len(completed)}/{total}",
+        "percent": round(len(completed) / total * 100, 2) if total else 100.0,
+    }
+
+
+def batch_page(
+    log: List[tuple],
+    cursor: Optional[int] = None,
+    since: Optional[float] = None,
+    limit: Optional[int] = None,
+):
+    """
+    The completion-log entries to return and the cursor to continue from.
+
+    Without any paging argument every completed document is returned; with
+    one, at most `limit` entries after `cursor` that completed after `since`.
+    """
+    if cursor is None and since is None and limit is None:
+        return log, len(log)
+    position = max(cursor or 0, 0)
+    limit = limit or BATCH_PAGE_SIZE
+    page = []
+    while position < len(log) and len(page) < limit:
+        index, completed_at = log[position]
+        position += 1
+        if since is None or completed_at > since:
+            page.append((index, completed_at))
+    return page, position
+
+
+async def celery_batch_result(
+    task_id: str,
+    cursor: Optional[int] = None,
+    since: Optional[float] = None,
+    limit: Optional[int] = None,
+):
+    batch = await asyncio.to_thread(GroupResult.restore, task_id, app=celery_app)
+    if batch is None:
+        # Batches queued as a single process_batch task by earlier versions
+        return await legacy_batch_result(task_id)
+
+    paged = cursor is not None or since is not None or limit is not None
+
+    def collect():
+        manifest = celery_app.backend.client.get(batch_manifest_key(task_id))
+        filenames = json.loads(manifest) if manifest else []
+        metas = collect_batch_metas(batch)
+        log = record_completions(task_id, metas)
+        page, next_cursor = batch_page(log, cursor, since, limit)
+        if not paged:
+            # Unpaged responses keep submission order, as before pagination existed
+            page = sorted(page)
+        results = []
+        for index, completed_at in page:
+            filename = filenames[index] if index < len(filenames) else None
+            result = document_result(metas[index], filename)
+            results.append({**result, "index": index, "completed_at": completed_at})
+        return metas, results, next_cursor, next_cursor < len(log)
+
+    try:
+        metas, results, next_cursor, has_more = await asyncio.to_thread(collect)
+    except Exception as e:
+        logger.error(f"Error retrieving results for batch {task_id}: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "task_id": task_id,
+                "status": "Error",
+                "message": "An error occurred while retrieving the results",
+            },
+        )
+    summary = batch_summary(task_id, metas)
+    content = {**summary, "results": results, "next_cursor": next_cursor, "has_more": has_more}
+    if summary["completed"] < summary["total"]:
+        return JSONResponse(status_code=202, content={**content, "status": "Processing"})
+    return JSONResponse(status_code=200, content={**content, "status": "Success"})
+
+
+async def legacy_batch_result(task_id: str):
     task = AsyncResult(task_id)
 
     if not task.ready():
@@ -204,7 +685,9 @@ async def celery_batch_result(task_id: str):
             )
 
     try:
-        results = task.get()
+        results = await asyncio.to_thread(
+            lambda: [load_result(result) for result in task.get()]
+        )
         return JSONResponse(
             status_code=200,
             content={
@@ -212,7 +695,7 @@ async def celery_batch_result(task_id: str):
                 "status": "Success",
                 "results": results,
                 "total": len(results),
-                "successful": sum(1 for r in results if r.get("status") == "Success"),
+                "successful": sum(1 for r in results if r.get("status") != "Error"),
                 "failed": sum(1 for r in results if r.get("status") == "Error"),
             },
         )
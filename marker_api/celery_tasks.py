@@ -1,23 +1,147 @@
-from celery import Task
+from celery import Task, current_task
+from celery.exceptions import Ignore
 from marker_api.celery_worker import celery_app
 from marker.convert import convert_single_pdf
 from marker.models import load_all_models
-import io
 import logging
-from marker_api.utils import process_image_to_base64
-from celery.signals import worker_process_init
+from marker_api.cancellation import TaskCancelled, abort_if_cancelled, is_cancelled
+from marker_api.checkpoints import (
+    CHECKPOINT_PAGES,
+    clear_checkpoints,
+    load_checkpoints,
+    save_checkpoint,
+)
+from marker_api.claim_check import (
+    load_result,
+    open_pdf,
+    release_payload,
+    store_result,
+)
+from marker_api.images import images_to_base64, render_images
+from marker_api.model.schema import ImageOptions
+from marker_api.monitor import clear_pending_pages
+from marker_api.sharding import dedupe_encoded_images, merge_shard_outputs, plan_shards
+from marker_api.single_flight import release as release_single_flight
+from marker_api.startup import env_flag
+from marker_api.throughput import record_throughput
+from marker_api.utils import get_page_count
+from celery.signals import (
+    task_postrun,
+    task_revoked,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from celery.states import READY_STATES, SUCCESS
+import gc
+import os
+import time
+import resource
+import socket
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
 model_list = None
+# Seconds this process spent loading models; 0 when inherited from the main process
+model_load_seconds = 0.0
+tasks_in_process = 0
+
+
+def preload_enabled() -> bool:
+    """
+    Whether the worker's main process loads the models before the pool forks.
+
+    Forked pool children then share the weights copy-on-write instead of each
+    loading its own copy. CUDA does not survive a fork, so on GPU the default
+    is to load in every child; MARKER_PRELOAD_MODELS overrides it.
+    """
+    from marker.settings import settings
+
+    return env_flag("MARKER_PRELOAD_MODELS", not settings.CUDA)
+
+
+def forks_children(worker) -> bool:
+    pool = getattr(worker, "pool_cls", None) or celery_app.conf.worker_pool
+    name = pool if isinstance(pool, str) else pool.__module__
+    return "prefork" in name
+
+
+def load_models():
+    global model_list, model_load_seconds
+    start = time.time()
+    model_list = load_all_models()
+    model_load_seconds = time.time() - start
+
+
+@worker_init.connect
+def preload_models(sender=None, **kwargs):
+    # solo/threads pools run tasks in this process, so it always loads here
+    if forks_children(sender) and not preload_enabled():
+        return
+    load_models()
+    # Keep the garbage collector from writing to (and so copying) the model
+    # objects in forked children
+    gc.freeze()
+    logger.info(f"Models loaded in the main worker process in {model_load_seconds:.1f}s")
 
 
 @worker_process_init.connect
 def initialize_models(**kwargs):
-    global model_list
-    if not model_list:
-        model_list = load_all_models()
-        print("Models loaded at worker startup")
+    global model_load_seconds, tasks_in_process
+    tasks_in_process = 0
+    if model_list:
+        model_load_seconds = 0.0
+        logger.info(f"Pool process {os.getpid()} started with preloaded models (0.0s model load)")
+        return
+    load_models()
+    logger.info(f"Pool process {os.getpid()} started, model load cost {model_load_seconds:.1f}s")
+
+
+@task_postrun.connect
+def count_task(**kwargs):
+    global tasks_in_process
+    tasks_in_process += 1
+
+
+@worker_process_shutdown.connect
+def log_recycle(exitcode=None, **kwargs):
+    # ru_maxrss is in KiB on Linux; it includes the model pages shared with the main process
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(
+        f"Pool process {os.getpid()} exiting (code {exitcode}) after {tasks_in_process} tasks, "
+        f"peak RSS {peak_mb:.0f} MB; it had cost {model_load_seconds:.1f}s of model loading"
+    )
+
+
+# Tasks whose id the API tracks in the pending-pages gauge (see submit_conversion)
+DOCUMENT_TASKS = ("convert_pdf", "merge_pdf_shards")
+
+
+@task_postrun.connect
+def release_pending_pages(sender=None, task_id=None, state=None, **kwargs):
+    # RETRY is not a ready state, so a retried document stays pending
+    if sender is not None and sender.name in DOCUMENT_TASKS and state in READY_STATES:
+        clear_pending_pages(task_id)
+        release_single_flight(task_id, succeeded=state == SUCCESS)
+
+
+@task_revoked.connect
+def release_revoked_pages(sender=None, request=None, **kwargs):
+    if request is not None:
+        clear_pending_pages(request.id)
+        release_single_flight(request.id, succeeded=False)
+
+
+@celery_app.task(name="release_failed_document")
+def release_failed_document(request, exc, traceback):
+    # Error callback of a sharded document's chord. When a shard fails for
+    # good the merge never runs, so its postrun signal never clears the
+    # document's pending pages or single-flight key; Celery calls this instead
+    # (request.id is the merge task id the API handed out).
+    logger.error(f"Sharded conversion {request.id} failed: {exc}")
+    clear_pending_pages(request.id)
+    release_single_flight(request.id, succeeded=False)
 
 
 class PDFConversionTask(Task):
@@ -31,28 +155,213 @@ class PDFConversionTask(Task):
         return self.run(*args, **kwargs)
 
 
+# Retries of a failed conversion; each resumes from the last checkpointed chunk
+MAX_RETRIES = 3
+
+
+def result_ttl():
+    """
+    Seconds a stored final result is kept: as long as the task result referencing it.
+    """
+    expires = celery_app.conf.result_expires
+    if isinstance(expires, timedelta):
+        return int(expires.total_seconds())
+    return None if expires is None else int(expires)
+
+
+def timed_convert(pdf_file, start_page=0, max_pages=None):
+    """
+    Run marker on a page range and report the pages per second to the throughput model.
+    """
+    started = time.perf_counter()
+    markdown_text, images, metadata = convert_single_pdf(
+        pdf_file, model_list, max_pages=max_pages, start_page=start_page
+    )
+    worker = (current_task and current_task.request.hostname) or socket.gethostname()
+    record_throughput(worker, metadata.get("pages") or max_pages, time.perf_counter() - started)
+    return markdown_text, images, metadata
+
+
+def convert_pages(
+    task_id, pdf_file, filename, image_options=None, start_page=0, max_pages=None, cancel_ids=()
+):
+    """
+    Convert a page range in chunks of CHECKPOINT_PAGES, checkpointing each chunk.
+
+    Chunks already checkpointed by an earlier attempt of the same task are
+    loaded instead of converted, and cancellation is checked between chunks.
+    Documents that fit in one chunk (or raw bytes from older API versions)
+    are converted in one piece without checkpoints, as are conversions
+    without a task id (process_batch calls the task function directly), since
+    checkpoints are keyed by it.
+
+    Returns:
+    tuple: The markdown, base64 images and metadata.
+    """
+    options = ImageOptions(**(image_options or {}))
+    page_count = max_pages
+    if task_id and isinstance(pdf_file, str) and CHECKPOINT_PAGES:
+        if page_count is None:
+            page_count = get_page_count(pdf_file) - start_page
+        chunks = plan_shards(page_count, CHECKPOINT_PAGES)
+    else:
+        chunks = [(0, page_count)]
+
+    if len(chunks) == 1:
+        markdown_text, images, metadata = timed_convert(pdf_file, start_page, max_pages)
+        markdown_text, encoded_images = render_images(markdown_text, images, options)
+        return markdown_text, images_to_base64(encoded_images), metadata
+
+    done = load_checkpoints(task_id)
+    if done:
+        logger.info(f"Resuming {filename}: {len(done)} of {len(chunks)} chunks already converted")
+    outputs = []
+    for offset, chunk_pages in chunks:
+        abort_if_cancelled(*cancel_ids)
+        output = done.get(start_page + offset)
+        if output is None:
+            markdown_text, images, metadata = timed_convert(
+                pdf_file, start_page + offset, chunk_pages
+            )
+            markdown_text, encoded_images = render_images(markdown_text, images, options)
+            output = {
+                "markdown": markdown_text,
+                "images": images_to_base64(encoded_images),
+                "metadata": metadata,
+            }
+            save_checkpoint(task_id, start_page + offset, output)
+        outputs.append((offset, output["markdown"], output["images"], output["metadata"]))
+    markdown_text, images, metadata = merge_shard_outputs(outputs)
+    markdown_text, images = dedupe_encoded_images(markdown_text, images)
+    return markdown_text, images, metadata
+
+
+def retry_or_give_up(task, exc, pdf_content=None):
+    # Checkpoints (and the document, when the task owns it) are only worth
+    # keeping while another attempt will use them
+    if task.request.retries >= MAX_RETRIES:
+        clear_checkpoints(task.request.id)
+        release_payload(pdf_content)
+    return task.retry(exc=exc, countdown=10, max_retries=MAX_RETRIES)
+
+
+# pdf_content is a claim-check reference (see marker_api.claim_check), or raw
+# bytes for tasks queued by older API versions. Large results are stored the
+# same way and the task returns the reference.
+#
+# Cancelled conversions (see marker_api.cancellation) stop at the next chunk,
+# document or shard boundary; the API has already stored them as REVOKED, so
+# they end with Ignore instead of storing a result.
 @celery_app.task(bind=True, name="convert_pdf")
-def convert_pdf_to_markdown(self, filename, pdf_content):
+def convert_pdf_to_markdown(self, filename, pdf_content, image_options=None):
     logger.info(f"\n\nStarting conversion for {filename}")
+    task_id = self.request.id
     try:
-        pdf_file = io.BytesIO(pdf_content)
-        markdown_text, images, metadata = convert_single_pdf(pdf_file, model_list)
-        image_data = {}
-        for img_filename, image in images.items():
-            logger.debug(f"\nProcessing image {img_filename}")
-            image_base64 = process_image_to_base64(image, img_filename)
-            image_data[img_filename] = image_base64
+        abort_if_cancelled(task_id)
+        with open_pdf(pdf_content) as pdf_file:
+            markdown_text, images, metadata = convert_pages(
+                task_id, pdf_file, filename, image_options, cancel_ids=(task_id,)
+            )
         logger.info(f"Completed conversion for {filename}")
-        return {
+        abort_if_cancelled(task_id)
+        result = store_result(
+            {
+                "filename": filename,
+                "markdown": markdown_text,
+                "metadata": metadata,
+                "images": images,
+                "status": "ok",
+            },
+            ttl=result_ttl(),
+        )
+        release_payload(pdf_content)
+        clear_checkpoints(task_id)
+        return result
+    except TaskCancelled:
+        logger.info(f"Conversion of {filename} was cancelled")
+        release_payload(pdf_content)
+        clear_checkpoints(task_id)
+        raise Ignore()
+    except Exception as e:
+        logger.error(f"Error converting {filename}: {str(e)}", exc_info=True)
+        raise retry_or_give_up(self, e, pdf_content)
+
+
+@celery_app.task(bind=True, name="convert_pdf_shard")
+def convert_pdf_shard(
+    self, filename, pdf_content, start_page, max_pages, image_options=None, document_id=None
+):
+    # document_id is the task id clients see for the whole document (the merge callback)
+    logger.info(
+        f"Starting conversion for {filename} pages {start_page}-{start_page + max_pages - 1}"
+    )
+    task_id = self.request.id
+    try:
+        abort_if_cancelled(task_id, document_id)
+        with open_pdf(pdf_content) as pdf_file:
+            markdown_text, images, metadata = convert_pages(
+                task_id,
+                pdf_file,
+                filename,
+                image_options,
+                start_page=start_page,
+                max_pages=max_pages,
+                cancel_ids=(task_id, document_id),
+            )
+        abort_if_cancelled(task_id, document_id)
+        # The document is shared by all shards; merge_pdf_shards releases it
+        result = store_result(
+            {
+                "start_page": start_page,
+                "markdown": markdown_text,
+                "metadata": metadata,
+                "images": images,
+            }
+        )
+        clear_checkpoints(task_id)
+        return result
+    except TaskCancelled:
+        # The merge never runs; the document expires from the claim-check store
+        logger.info(f"Conversion of {filename} pages from {start_page} was cancelled")
+        clear_checkpoints(task_id)
+        raise Ignore()
+    except Exception as e:
+        logger.error(
+            f"Error converting {filename} pages from {start_page}: {str(e)}",
+            exc_info=True,
+        )
+        raise retry_or_give_up(self, e)
+
+
+@celery_app.task(bind=True, name="merge_pdf_shards")
+def merge_pdf_shards(self, shard_results, filename, pdf_content=None):
+    # Chord callback: receives the results of every convert_pdf_shard of one document
+    if is_cancelled(self.request.id):
+        for payload in [pdf_content, *shard_results]:
+            release_payload(payload)
+        raise Ignore()
+    shards = [load_result(shard) for shard in shard_results]
+    markdown_text, images, metadata = merge_shard_outputs(
+        [
+            (shard["start_page"], shard["markdown"], shard["images"], shard["metadata"])
+            for shard in shards
+        ]
+    )
+    markdown_text, images = dedupe_encoded_images(markdown_text, images)
+    logger.info(f"Merged {len(shard_results)} shards for {filename}")
+    # The document and the shard results are no longer needed by anyone
+    for payload in [pdf_content, *shard_results]:
+        release_payload(payload)
+    return store_result(
+        {
             "filename": filename,
             "markdown": markdown_text,
             "metadata": metadata,
-            "images": image_data,
+            "images": images,
             "status": "ok",
-        }
-    except Exception as e:
-        logger.error(f"Error converting {filename}: {str(e)}", exc_info=True)
-        raise self.retry(exc=e, countdown=10, max_retries=3)
+        },
+        ttl=result_ttl(),
+    )
 
 
 
@@ -71,15 +380,20 @@ def convert_pdf_to_markdown(self, filename, pdf_content):
 #     return results
 
 
+# The API now fans batches out as one task per document (see submit_batch);
+# this task still drains batches queued by earlier versions.
 @celery_app.task(
     ignore_result=False, bind=True, base=PDFConversionTask, name="process_batch"
 )
-def process_batch(self, batch_data):
+def process_batch(self, batch_data, image_options=None):
     results = []
     total = len(batch_data)
     for i, (filename, pdf_content) in enumerate(batch_data, start=1):
+        if is_cancelled(self.request.id):
+            logger.info(f"Batch {self.request.id} cancelled after {i - 1} of {total} documents")
+            raise Ignore()
         try:
-            result = convert_pdf_to_markdown(filename, pdf_content)
+            result = convert_pdf_to_markdown(filename, pdf_content, image_options)
             results.append(result)
         except Exception as e:
             logger.error(f"Error processing {filename}: {str(e)}")
@@ -1,12 +1,22 @@
 import os
 from celery import Celery
 from dotenv import load_dotenv
+from kombu import Queue
 import multiprocessing
 
 multiprocessing.set_start_method("fork", force=True)
 
 load_dotenv(".env")
 
+from marker_api.routing import DEFAULT_QUEUE, PRIORITY_STEPS, ROUTED_QUEUES
+from marker_api.serialization import SERIALIZER_NAME, register_serializer
+
+# Always registered, so msgpack-zstd messages are accepted whatever is sent.
+# Sending them is opt-in (MARKER_TASK_SERIALIZER=msgpack-zstd) once every API
+# and worker of the cluster understands the format.
+register_serializer()
+TASK_SERIALIZER = os.environ.get("MARKER_TASK_SERIALIZER", "json")
+
 celery_app = Celery(
     "celery_app",
     broker=os.environ.get("REDIS_HOST", "redis://localhost:6379/0"),
@@ -23,10 +33,39 @@ celery_app = Celery(
 celery_app.conf.worker_heartbeat_interval = 900
 celery_app.conf.worker_prefetch_multiplier = 1
 celery_app.conf.result_expires = 900  # 1 hour
-celery_app.conf.worker_max_tasks_per_child = 3
-# Timeout settings
-celery_app.conf.task_time_limit = 900  # 2 hours
-celery_app.conf.task_soft_time_limit = 900  # Graceful exit before hard kill
+# Models are loaded once in the main process and shared with the pool children
+# (see preload_models in celery_tasks), so a child is cheap to replace. Recycle
+# children when their resident memory passes the limit (KiB; it includes the
+# shared model pages), and after many tasks as a backstop against slow leaks.
+celery_app.conf.worker_max_tasks_per_child = int(
+    os.environ.get("MARKER_WORKER_MAX_TASKS_PER_CHILD", 200)
+)
+celery_app.conf.worker_max_memory_per_child = (
+    int(os.environ.get("MARKER_WORKER_MAX_MEMORY_MB", 12288)) * 1024
+)
+# With --autoscale=MAX,MIN the pool is also capped by free memory (see marker_api/autoscaler.py)
+celery_app.conf.worker_autoscaler = "marker_api.autoscaler:MemoryAwareAutoscaler"
+# Timeout settings. Conversions get a deadline from their page count when they
+# are submitted (see marker_api/throughput.py); these apply to everything else.
+celery_app.conf.task_time_limit = int(os.environ.get("MARKER_TASK_TIME_LIMIT", 900))
+celery_app.conf.task_soft_time_limit = int(
+    os.environ.get("MARKER_TASK_SOFT_TIME_LIMIT", 900)
+)  # Graceful exit before hard kill
+# Conversions are routed to a queue by estimated cost (see marker_api/routing.py).
+# A worker started without -Q consumes all of them; dedicated workers pass -Q.
+celery_app.conf.task_queues = [Queue(DEFAULT_QUEUE)] + [Queue(name) for name in ROUTED_QUEUES]
+celery_app.conf.task_default_queue = DEFAULT_QUEUE
+celery_app.conf.task_serializer = TASK_SERIALIZER
+celery_app.conf.result_serializer = TASK_SERIALIZER
+# JSON stays accepted, so messages and results written before the switch still load
+celery_app.conf.accept_content = ["json", SERIALIZER_NAME]
+celery_app.conf.result_accept_content = ["json", SERIALIZER_NAME]
+# Message priority only needs the priority lists; the queues themselves are
+# consumed in kombu's default round-robin order, so no queue starves the others
+celery_app.conf.broker_transport_options = {
+    "priority_steps": PRIORITY_STEPS,
+    "sep": ":",
+}
 
 @celery_app.task(name="celery.ping")
 def ping():
@@ -0,0 +1,58 @@
+import os
+import json
+import logging
+from typing import Any, Dict
+from marker_api.celery_worker import celery_app
+from marker_api.claim_check import claim_check_store, load_result, release_payload, store_result
+
+logger = logging.getLogger(__name__)
+
+# Pages converted between checkpoints; 0 converts every task in one piece
+CHECKPOINT_PAGES = int(os.environ.get("MARKER_CHECKPOINT_PAGES", 20))
+
+
+def _checkpoint_key(task_id: str) -> str:
+    return f"marker:checkpoint:{task_id}"
+
+
+def save_checkpoint(task_id: str, start_page: int, output: Dict[str, Any]):
+    """
+    Persist the output of one converted page chunk of a task.
+
+    Chunk outputs go to the claim-check store (a shared directory or Redis)
+    when large; a Redis hash per task maps each chunk's first page to it. A
+    retry of the task (same task id) then skips the chunks found here.
+    """
+    ref = store_result(output)
+    key = _checkpoint_key(task_id)
+    client = celery_app.backend.client
+    client.hset(key, str(start_page), json.dumps(ref))
+    client.expire(key, claim_check_store.ttl)
+
+
+def load_checkpoints(task_id: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Chunk outputs already persisted for a task, by first page.
+    """
+    checkpoints = {}
+    for start_page, ref in celery_app.backend.client.hgetall(_checkpoint_key(task_id)).items():
+        try:
+            checkpoints[int(start_page)] = load_result(json.loads(ref))
+        except Exception as e:
+            # An expired payload is simply converted again
+            logger.warning(f"Ignoring unreadable checkpoint {start_page} of {task_id}: {str(e)}")
+    return checkpoints
+
+
+def clear_checkpoints(task_id: str):
+    """
+    Delete every checkpoint of a task, once it completed or gave up.
+    """
+    key = _checkpoint_key(task_id)
+    client = celery_app.backend.client
+    try:
+        for ref in client.hvals(key):
+            release_payload(json.loads(ref))
+        client.delete(key)
+    except Exception as e:
+        logger.warning(f"Could not clear checkpoints of {task_id}: {str(e)}")
@@ -0,0 +1,305 @@
+import io
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import redis
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Results whose JSON is larger than this are written to the store and returned by reference
+RESULT_THRESHOLD_BYTES = int(os.environ.get("MARKER_CLAIM_CHECK_RESULT_BYTES", 256 * 1024))
+
+
+def is_claim_check(value: Any) -> bool:
+    return isinstance(value, dict) and "claim_check" in value
+
+
+class ClaimCheckStore(ABC):
+    """
+    Holds large payloads outside the broker; task messages carry only a reference.
+
+    A reference is a small JSON-serializable dict:
+    {"claim_check": <backend>, "key": <id>, "size": <bytes>}.
+    Payloads are kept for `ttl` seconds if nobody deletes them; put and
+    put_file accept a shorter (or longer) TTL for one payload.
+    """
+
+    backend = None
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    def _reference(self, key: str, size: int) -> Dict[str, Any]:
+        return {"claim_check": self.backend, "key": key, "size": size}
+
+    @abstractmethod
+    def put(self, data: bytes, ttl: Optional[int] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def put_file(self, path: str, ttl: Optional[int] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def get(self, ref: Dict[str, Any]) -> bytes:
+        ...
+
+    @abstractmethod
+    def delete(self, ref: Dict[str, Any]):
+        ...
+
+    @contextmanager
+    def local_path(self, ref: Dict[str, Any]) -> Iterator[str]:
+        """
+        A local file with the payload, for libraries that read from disk.
+        """
+        fd, path = tempfile.mkstemp(prefix="marker-claim-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.get(ref))
+            yield path
+        finally:
+            os.unlink(path)
+
+
+class FilesystemClaimCheckStore(ClaimCheckStore):
+    """
+    Payloads as files in a directory shared by the API and all workers (NFS, a
+    shared volume). Workers read the document straight from that file.
+    """
+
+    backend = "fs"
+
+    def __init__(self, directory: str, ttl: int):
+        super().__init__(ttl)
+        self.directory = directory
+        self._last_sweep = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _new_path(self, ttl: Optional[int]):
+        # A TTL other than the store's travels in the key, where _sweep finds it
+        key = uuid.uuid4().hex if ttl is None else f"{uuid.uuid4().hex}-{int(ttl)}"
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return key, path
+
+    def put(self, data: bytes, ttl: Optional[int] = None) -> Dict[str, Any]:
+        self._sweep()
+        key, path = self._new_path(ttl)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self._reference(key, len(data))
+
+    def put_file(self, path: str, ttl: Optional[int] = None) -> Dict[str, Any]:
+        self._sweep()
+        key, target = self._new_path(ttl)
+        try:
+            # Same filesystem: a hard link, no copy at all
+            os.link(path, target)
+        except OSError:
+            tmp_path = f"{target}.tmp"
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return self._reference(key, os.path.getsize(target))
+
+    def get(self, ref: Dict[str, Any]) -> bytes:
+        with open(self._path(ref["key"]), "rb") as f:
+            return f.read()
+
+    def delete(self, ref: Dict[str, Any]):
+        try:
+            os.unlink(self._path(ref["key"]))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def local_path(self, ref: Dict[str, Any]) -> Iterator[str]:
+        yield self._path(ref["key"])
+
+    def _ttl(self, name: str) -> int:
+        # Names are "<uuid>" or "<uuid>-<ttl>", plus ".tmp" while being written
+        _, _, ttl = name.split(".", 1)[0].partition("-")
+        return int(ttl) if ttl.isdigit() else self.ttl
+
+    def _sweep(self):
+        # Remove payloads older than their TTL, at most once a minute.
+        # Age is taken from st_ctime: a hard link keeps the source's old mtime
+        # (and touching it would change the source file too), but creating the
+        # link updates the inode's ctime.
+        now = time.time()
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if now - os.stat(path).st_ctime > self._ttl(name):
+                        os.unlink(path)
+                except OSError:
+                    continue
+
+
+class RedisClaimCheckStore(ClaimCheckStore):
+    """
+    Payloads split into fixed-size chunk keys in Redis, expiring after the TTL.
+
+    Used when there is no shared directory. Chunks keep every command small, so
+    large documents never become a single huge Redis value.
+    """
+
+    backend = "redis"
+
+    def __init__(self, redis_url: str, ttl: int, chunk_bytes: int):
+        super().__init__(ttl)
+        self.client = redis.Redis.from_url(redis_url)
+        self.chunk_bytes = chunk_bytes
+
+    @staticmethod
+    def _chunk_key(key: str, index: int) -> str:
+        return f"marker:claim:{key}:{index}"
+
+    @staticmethod
+    def _meta_key(key: str) -> str:
+        return f"marker:claim:{key}"
+
+    def _put_chunks(self, chunks, ttl: Optional[int]) -> Dict[str, Any]:
+        key = uuid.uuid4().hex
+        ttl = self.ttl if ttl is None else ttl
+        size = 0
+        count = 0
+        pipe = self.client.pipeline(transaction=False)
+        for chunk in chunks:
+            pipe.set(self._chunk_key(key, count), chunk, ex=ttl)
+            size += len(chunk)
+            count += 1
+            if count % 16 == 0:
+                pipe.execute()
+        pipe.set(self._meta_key(key), count, ex=ttl)
+        pipe.execute()
+        return self._reference(key, size)
+
+    def put(self, data: bytes, ttl: Optional[int] = None) -> Dict[str, Any]:
+        return self._put_chunks(
+            (
+                data[i : i + self.chunk_bytes]
+                for i in range(0, max(len(data), 1), self.chunk_bytes)
+            ),
+            ttl,
+        )
+
+    def put_file(self, path: str, ttl: Optional[int] = None) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            return self._put_chunks(iter(lambda: f.read(self.chunk_bytes), b""), ttl)
+
+    def get(self, ref: Dict[str, Any]) -> bytes:
+        key = ref["key"]
+        count = self.client.get(self._meta_key(key))
+        if count is None:
+            raise KeyError(f"Claim-check payload {key} not found or expired")
+        buffer = io.BytesIO()
+        for index in range(int(count)):
+            chunk = self.client.get(self._chunk_key(key, index))
+            if chunk is None:
+                raise KeyError(f"Claim-check payload {key} is incomplete")
+            buffer.write(chunk)
+        return buffer.getvalue()
+
+    def delete(self, ref: Dict[str, Any]):
+        key = ref["key"]
+        count = self.client.get(self._meta_key(key))
+        keys = [self._meta_key(key)]
+        if count is not None:
+            keys.extend(self._chunk_key(key, index) for index in range(int(count)))
+        self.client.delete(*keys)
+
+
+def build_claim_check_store_from_env() -> ClaimCheckStore:
+    """
+    Create the claim-check store configured through environment variables.
+
+    MARKER_CLAIM_CHECK_DIR: shared directory; when empty, Redis (REDIS_HOST) is used.
+    MARKER_CLAIM_CHECK_TTL: seconds a payload is kept if nobody deletes it.
+    MARKER_CLAIM_CHECK_CHUNK_BYTES: chunk size of the Redis backend.
+    """
+    ttl = int(os.environ.get("MARKER_CLAIM_CHECK_TTL", 24 * 3600))
+    directory = os.environ.get("MARKER_CLAIM_CHECK_DIR")
+    if directory:
+        return FilesystemClaimCheckStore(directory, ttl)
+    return RedisClaimCheckStore(
+        os.environ.get("REDIS_HOST", "redis://localhost:6379/0"),
+        ttl,
+        int(os.environ.get("MARKER_CLAIM_CHECK_CHUNK_BYTES", 4 * 1024**2)),
+    )
+
+
+claim_check_store = build_claim_check_store_from_env()
+
+
+@contextmanager
+def open_pdf(payload: Union[bytes, Dict[str, Any]]) -> Iterator[Union[str, io.BytesIO]]:
+    """
+    The document of a task argument, as something convert_single_pdf can open.
+
+    Accepts a claim-check reference, or raw bytes from tasks queued before the
+    store existed.
+    """
+    if is_claim_check(payload):
+        with claim_check_store.local_path(payload) as path:
+            yield path
+    else:
+        yield io.BytesIO(payload)
+
+
+def release_payload(payload: Any):
+    """
+    Delete a claim-check payload once nothing needs it anymore; no-op for raw bytes.
+    """
+    if is_claim_check(payload):
+        try:
+            claim_check_store.delete(payload)
+        except Exception as e:
+            logger.warning(f"Could not delete claim-check payload {payload['key']}: {str(e)}")
+
+
+def store_result(
+    result: Any, threshold: Optional[int] = None, ttl: Optional[int] = None
+) -> Any:
+    """
+    Write a task result to the store if its JSON is large, returning a reference instead.
+
+    Args:
+    result: The JSON-serializable result.
+    threshold (int): Size above which the result is stored; defaults to MARKER_CLAIM_CHECK_RESULT_BYTES.
+    ttl (int): Seconds to keep the stored result; defaults to the store's TTL.
+    Final task results pass the result backend's expiry, so the payload goes
+    away together with the task result that references it.
+    """
+    threshold = RESULT_THRESHOLD_BYTES if threshold is None else threshold
+    data = json.dumps(result, default=str).encode("utf-8")
+    if len(data) <= threshold:
+        return result
+    ref = claim_check_store.put(data, ttl)
+    logger.debug(f"Stored {len(data)} byte result as claim-check {ref['key']}")
+    return ref
+
+
+def load_result(value: Any) -> Any:
+    """
+    Inverse of store_result: resolve a reference, pass anything else through.
+    """
+    if is_claim_check(value):
+        return json.loads(claim_check_store.get(value))
+    return value
@@ -1,5 +1,6 @@
 import os
 import base64
+import functools
 import mimetypes
 import requests
 from PIL import Image
@@ -8,10 +9,14 @@ import gradio as gr
 # from omniparse.documents import parse_pdf
 
 
+README_URL = "https://raw.githubusercontent.com/adithya-s-k/marker-api/refs/heads/master/README.md"
+
+
+# Fetched when the page is first opened rather than at import, and only once
+@functools.lru_cache(maxsize=1)
 def fetch_readme_content():
-    url = "https://raw.githubusercontent.com/adithya-s-k/marker-api/refs/heads/master/README.md"
     try:
-        response = requests.get(url)
+        response = requests.get(README_URL, timeout=5)
         response.raise_for_status()  # Raises an HTTPError for bad responses
         return response.text
     except requests.RequestException as e:
@@ -19,9 +24,6 @@ def fetch_readme_content():
         return "Failed to load README content. Please check the GitHub repository."
 
 
-header_markdown = fetch_readme_content()
-
-
 def decode_base64_to_pil(base64_str):
     return Image.open(BytesIO(base64.b64decode(base64_str)))
 
@@ -78,67 +80,73 @@ def parse_document(input_file_path, parameters, request: gr.Request):
         raise gr.Error(f"Failed to parse: {e}")
 
 
-demo_ui = gr.Blocks(theme=gr.themes.Monochrome(radius_size=gr.themes.sizes.radius_none))
-
-with demo_ui:
-    gr.Markdown(
-        "<h1>Marker-API</h1> \n Easily deployable 🚀 API to convert PDF to markdown quickly with high accuracy."
-    )
-    gr.Markdown(
-        "📄 [Documentation](https://docs.cognitivelab.in/) | ✅ [Follow](https://x.com/adithya_s_k) | 🐈‍⬛ [Github](https://github.com/adithya-s-k/omniparse) | ⭐ [Give a Star](https://github.com/adithya-s-k/omniparse)"
-    )
-    with gr.Tabs():
-        with gr.TabItem("Documents"):
-            with gr.Row():
-                with gr.Column(scale=80):
-                    document_file = gr.File(
-                        label="Upload Document",
-                        type="filepath",
-                        file_count="single",
-                        interactive=True,
-                        file_types=[".pdf", ".ppt", ".doc", ".pptx", ".docx"],
-                    )
-                    with gr.Accordion("Parameters", visible=True):
-                        document_parameter = gr.Dropdown(
-                            [
-                                "Fixed Size Chunking",
-                                "Regex Chunking",
-                                "Semantic Chunking",
-                            ],
-                            label="Chunking Stratergy",
+def build_demo_ui():
+    """
+    Build the Gradio demo. Called by the servers only when the UI is enabled.
+    """
+    demo_ui = gr.Blocks(theme=gr.themes.Monochrome(radius_size=gr.themes.sizes.radius_none))
+
+    with demo_ui:
+        gr.Markdown(
+            "<h1>Marker-API</h1> \n Easily deployable 🚀 API to convert PDF to markdown quickly with high accuracy."
+        )
+        gr.Markdown(
+            "📄 [Documentation](https://docs.cognitivelab.in/) | ✅ [Follow](https://x.com/adithya_s_k) | 🐈‍⬛ [Github](https://github.com/adithya-s-k/omniparse) | ⭐ [Give a Star](https://github.com/adithya-s-k/omniparse)"
+        )
+        with gr.Tabs():
+            with gr.TabItem("Documents"):
+                with gr.Row():
+                    with gr.Column(scale=80):
+                        document_file = gr.File(
+                            label="Upload Document",
+                            type="filepath",
+                            file_count="single",
+                            interactive=True,
+                            file_types=[".pdf", ".ppt", ".doc", ".pptx", ".docx"],
                         )
-                        if document_parameter == "Fixed Size Chunking":
-                            document_chunk_size = gr.Number(
-                                minimum=250, maximum=10000, step=100, show_label=False
-                            )
-                            document_overlap_size = gr.Number(
-                                minimum=250, maximum=1000, step=100, show_label=False
+                        with gr.Accordion("Parameters", visible=True):
+                            document_parameter = gr.Dropdown(
+                                [
+                                    "Fixed Size Chunking",
+                                    "Regex Chunking",
+                                    "Semantic Chunking",
+                                ],
+                                label="Chunking Stratergy",
                             )
-                    document_button = gr.Button("Parse Document")
-                with gr.Column(scale=200):
-                    with gr.Accordion("Markdown"):
-                        document_markdown = gr.Markdown()
-                    with gr.Accordion("Extracted Images"):
-                        document_images = gr.Gallery(visible=False)
-                    with gr.Accordion("Chunks", visible=False):
-                        document_chunks = gr.Markdown()
-            with gr.Accordion("JSON Output"):
-                document_json = gr.JSON(label="Output JSON", visible=False)
-            with gr.Accordion("Use API", open=True):
-                gr.Code(
-                    language="shell",
-                    value=parse_document_docs["curl"],
-                    lines=1,
-                    label="Curl",
-                )
-                gr.Code(
-                    language="python", value="Coming Soon⌛", lines=1, label="python"
-                )
-
-        gr.Markdown(header_markdown)
-
-    document_button.click(
-        fn=parse_document,
-        inputs=[document_file, document_parameter],
-        outputs=[document_markdown, document_images, document_chunks, document_json],
-    )
+                            if document_parameter == "Fixed Size Chunking":
+                                document_chunk_size = gr.Number(
+                                    minimum=250, maximum=10000, step=100, show_label=False
+                                )
+                                document_overlap_size = gr.Number(
+                                    minimum=250, maximum=1000, step=100, show_label=False
+                                )
+                        document_button = gr.Button("Parse Document")
+                    with gr.Column(scale=200):
+                        with gr.Accordion("Markdown"):
+                            document_markdown = gr.Markdown()
+                        with gr.Accordion("Extracted Images"):
+                            document_images = gr.Gallery(visible=False)
+                        with gr.Accordion("Chunks", visible=False):
+                            document_chunks = gr.Markdown()
+                with gr.Accordion("JSON Output"):
+                    document_json = gr.JSON(label="Output JSON", visible=False)
+                with gr.Accordion("Use API", open=True):
+                    gr.Code(
+                        language="shell",
+                        value=parse_document_docs["curl"],
+                        lines=1,
+                        label="Curl",
+                    )
+                    gr.Code(
+                        language="python", value="Coming Soon⌛", lines=1, label="python"
+                    )
+
+            header_markdown = gr.Markdown("Loading README...")
+
+        document_button.click(
+            fn=parse_document,
+            inputs=[document_file, document_parameter],
+            outputs=[document_markdown, document_images, document_chunks, document_json],
+        )
+        demo_ui.load(fn=fetch_readme_content, outputs=header_markdown)
+    return demo_ui
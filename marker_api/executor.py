@@ -0,0 +1,215 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import functools
+import concurrent.futures
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Optional
+from marker_api.utils import get_ram_available
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on inference threads; the scheduler decides how many are busy at once
+MAX_INFERENCE_THREADS = 64
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a conversion cannot be admitted because the wait queue is full.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Process-wide scheduler for model inference.
+
+    Conversions run on a pool of threads sharing one model list, so the event
+    loop stays free to serve other requests. At most `max_concurrency`
+    conversions run at once, whichever request they belong to.
+
+    Queued work is grouped per request (a single upload or a whole batch), and
+    free slots are handed out round-robin across groups, so a large batch
+    cannot starve the requests that arrive after it. At most `max_queue`
+    groups may wait for a slot; anything beyond that is rejected with a
+    QueueFullError carrying a retry estimate.
+    """
+
+    def __init__(self, max_concurrency: int = 1, max_queue: int = 16):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=MAX_INFERENCE_THREADS, thread_name_prefix="inference"
+        )
+        self._queues: "OrderedDict[Hashable, deque]" = OrderedDict()
+        # Queued plus running items per group; a group with outstanding work is already admitted
+        self._outstanding: Dict[Hashable, int] = {}
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        # Exponential moving average of conversion wall time, used for Retry-After
+        self.avg_duration: Optional[float] = None
+
+    def set_max_concurrency(self, max_concurrency: int):
+        """
+        Change how many conversions may run at once, e.g. once models are loaded
+        and the memory left for inference is known.
+        """
+        self.max_concurrency = max(1, min(max_concurrency, MAX_INFERENCE_THREADS))
+        logger.info(f"Inference concurrency set to {self.max_concurrency}")
+        if self._queues:
+            self._dispatch()
+
+    def retry_after(self) -> int:
+        """
+        Estimate in seconds until a newly queued request could start.
+        """
+        if self.avg_duration is None:
+            return 30
+        waves = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(self.avg_duration * waves))
+
+    def _record_duration(self, duration: float):
+        if self.avg_duration is None:
+            self.avg_duration = duration
+        else:
+            self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+
+    def _admit(self, group: Hashable):
+        if group in self._outstanding or self.running < self.max_concurrency:
+            return
+        if len(self._queues) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+
+    async def submit(
+        self, fn: Callable[..., Any], *args, group: Optional[Hashable] = None, **kwargs
+    ) -> Any:
+        """
+        Run `fn(*args, **kwargs)` on an inference thread once a slot is free.
+
+        Args:
+        fn (callable): The blocking function to run.
+        group (hashable): Key shared by all work of one request (e.g. a batch);
+            each group gets its turn in round-robin order. Defaults to a group of its own.
+
+        Raises:
+        QueueFullError: If all slots are busy and the wait queue is full.
+        """
+        if group is None:
+            group = object()
+        self._admit(group)
+
+        result_future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(group, deque()).append(
+            (result_future, functools.partial(fn, *args, **kwargs))
+        )
+        self.waiting += 1
+        self._outstanding[group] = self._outstanding.get(group, 0) + 1
+        self._dispatch()
+        # If the caller goes away while queued, the cancelled future is skipped at dispatch
+        return await result_future
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self.running < self.max_concurrency and self._queues:
+            group, queue = next(iter(self._queues.items()))
+            result_future, call = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                self._queues.move_to_end(group)
+            else:
+                del self._queues[group]
+            if result_future.cancelled():
+                self._release_group(group)
+                continue
+
+            self.running += 1
+            start_time = time.time()
+            future = self._pool.submit(call)
+            future.add_done_callback(
+                lambda f, g=group, rf=result_future, st=start_time: loop.call_soon_threadsafe(
+                    self._on_done, f, g, rf, st
+                )
+            )
+
+    def _release_group(self, group: Hashable):
+        remaining = self._outstanding[group] - 1
+        if remaining:
+            self._outstanding[group] = remaining
+        else:
+            del self._outstanding[group]
+
+    def _on_done(self, future, group, result_future, start_time):
+        # Runs when the thread finishes, even if the awaiting request went away,
+        # so an abandoned conversion holds its slot until it stops using the models
+        self.running -= 1
+        self._release_group(group)
+        self.completed += 1
+        self._record_duration(time.time() - start_time)
+        if not result_future.cancelled():
+            exception = future.exception()
+            if exception is not None:
+                result_future.set_exception(exception)
+            else:
+                result_future.set_result(future.result())
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "queued_requests": len(self._queues),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_duration": self.avg_duration,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+def default_concurrency() -> int:
+    """
+    Number of conversions that fit in the memory left on the inference device.
+
+    MARKER_INFERENCE_CONCURRENCY overrides the estimate. Otherwise the free
+    VRAM (GPU) or RAM (CPU) reported by get_ram_available is divided by
+    MARKER_RAM_PER_TASK_MB, the working memory of one conversion.
+    """
+    configured = os.environ.get("MARKER_INFERENCE_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+
+    per_task_mb = int(os.environ.get("MARKER_RAM_PER_TASK_MB", 4500))
+    device_type, ram_available = get_ram_available()
+    concurrency = max(1, ram_available // per_task_mb)
+    logger.info(
+        f"{device_type.value} has {ram_available} MB free, "
+        f"{per_task_mb} MB per conversion -> concurrency {concurrency}"
+    )
+    return min(concurrency, os.cpu_count() or 1)
+
+
+def build_executor_from_env() -> InferenceExecutor:
+    """
+    Create the inference executor configured through environment variables.
+
+    MARKER_INFERENCE_CONCURRENCY: conversions allowed to run at once
+        (sized from free memory by default_concurrency when unset).
+    MARKER_INFERENCE_QUEUE: requests allowed to wait for a free slot.
+    """
+    max_concurrency = int(os.environ.get("MARKER_INFERENCE_CONCURRENCY") or 1)
+    max_queue = int(os.environ.get("MARKER_INFERENCE_QUEUE", 16))
+    logger.info(
+        f"Inference executor: concurrency={max_concurrency}, queue={max_queue}"
+    )
+    return InferenceExecutor(max_concurrency, max_queue)
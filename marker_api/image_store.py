@@ -0,0 +1,161 @@
+import io
+import os
+import json
+import base64
+import logging
+import zipfile
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException
+from fastapi.responses import Response
+from marker_api.cache import ByteLRU, DiskStore, sha256_hex
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+
+def sniff_media_type(data: bytes) -> str:
+    """
+    Media type of an encoded image, from its magic bytes.
+    """
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class ImageBlobStore:
+    """
+    Content-addressed store of encoded images, served by GET /images/{sha256}.
+
+    Blobs live in a byte-bounded in-memory LRU and, optionally, in a directory
+    that several API replicas can share so any of them can serve a reference.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 0,
+    ):
+        self.memory = ByteLRU(max_memory_bytes)
+        self.disk = (
+            DiskStore(disk_dir, max_disk_bytes)
+            if disk_dir and max_disk_bytes > 0
+            else None
+        )
+
+    def put(self, data: bytes) -> str:
+        digest = sha256_hex(data)
+        if self.memory.get(digest) is None:
+            self.memory.put(digest, data)
+            if self.disk is not None:
+                try:
+                    self.disk.put(digest, data)
+                except OSError as e:
+                    logger.warning(f"Could not write image {digest} to disk: {str(e)}")
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        data = self.memory.get(digest)
+        if data is None and self.disk is not None:
+            data = self.disk.get(digest)
+            if data is not None:
+                self.memory.put(digest, data)
+        return data
+
+
+def build_image_store_from_env() -> ImageBlobStore:
+    """
+    Create the image blob store configured through environment variables.
+
+    MARKER_IMAGE_STORE_MAX_BYTES: size of the in-memory tier.
+    MARKER_IMAGE_STORE_DIR: optional directory, shared between replicas.
+    MARKER_IMAGE_STORE_DISK_MAX_BYTES: size of the on-disk tier.
+    """
+    return ImageBlobStore(
+        int(os.environ.get("MARKER_IMAGE_STORE_MAX_BYTES", 1024**3)),
+        os.environ.get("MARKER_IMAGE_STORE_DIR") or None,
+        int(os.environ.get("MARKER_IMAGE_STORE_DISK_MAX_BYTES", 10 * 1024**3)),
+    )
+
+
+image_store = build_image_store_from_env()
+
+
+def image_response(digest: str) -> Response:
+    """
+    Response for GET /images/{sha256}, shared by both servers.
+
+    Blobs are content-addressed, so clients may cache them forever.
+    Raises a 404 if the image was never stored or has been evicted.
+    """
+    data = image_store.get(digest)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Image not found or expired")
+    return Response(
+        content=data,
+        media_type=sniff_media_type(data),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+
+def _image_reference(data: bytes, digest: str, url: str) -> Dict[str, Any]:
+    return {
+        "sha256": digest,
+        "media_type": sniff_media_type(data),
+        "size": len(data),
+        "url": url,
+    }
+
+
+def externalize_images(result: Dict[str, Any], base_url: str = "/images") -> Dict[str, Any]:
+    """
+    Move the inline base64 images of a result into the blob store.
+
+    Returns a copy of the result whose `images` is empty and whose
+    `image_refs` maps each image name to its blob reference.
+    """
+    image_refs = {}
+    for name, encoded in (result.get("images") or {}).items():
+        data = base64.b64decode(encoded)
+        digest = image_store.put(data)
+        image_refs[name] = _image_reference(data, digest, f"{base_url}/{digest}")
+    return {**result, "images": {}, "image_refs": image_refs}
+
+
+def build_zip_bundle(results: List[Dict[str, Any]], single: bool = True) -> bytes:
+    """
+    Pack results and their images into one ZIP archive.
+
+    Images are stored once per content hash under images/, and the JSON
+    (result.json, or results.json for a batch) references them by archive path.
+    """
+    buffer = io.BytesIO()
+    written = set()
+    bundled = []
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for result in results:
+            image_refs = {}
+            for name, encoded in (result.get("images") or {}).items():
+                data = base64.b64decode(encoded)
+                digest = sha256_hex(data)
+                media_type = sniff_media_type(data)
+                path = f"images/{digest}.{IMAGE_EXTENSIONS.get(media_type, 'bin')}"
+                if path not in written:
+                    # Images are already compressed; storing them avoids burning CPU for nothing
+                    archive.writestr(path, data, compress_type=zipfile.ZIP_STORED)
+                    written.add(path)
+                image_refs[name] = _image_reference(data, digest, path)
+            bundled.append({**result, "images": {}, "image_refs": image_refs})
+        payload = bundled[0] if single and bundled else bundled
+        archive.writestr(
+            "result.json" if single else "results.json",
+            json.dumps(payload, default=str),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+    return buffer.getvalue()
+
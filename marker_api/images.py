@@ -0,0 +1,127 @@
+import os
+import re
+import base64
+import hashlib
+import logging
+import concurrent.futures
+from typing import Dict, NamedTuple, Optional, Tuple
+from PIL import Image
+from marker_api.model.schema import ImageFormat, ImageOptions
+from marker_api.utils import encode_image
+
+logger = logging.getLogger(__name__)
+
+# PIL format name, file extension and media type for each output format
+IMAGE_FORMATS = {
+    ImageFormat.png: ("PNG", "png", "image/png"),
+    ImageFormat.jpeg: ("JPEG", "jpg", "image/jpeg"),
+    ImageFormat.webp: ("WEBP", "webp", "image/webp"),
+}
+
+# Shared by every conversion in the process; PIL releases the GIL while encoding
+image_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("MARKER_IMAGE_WORKERS", min(4, os.cpu_count() or 1))),
+    thread_name_prefix="image-encoder",
+)
+
+
+class EncodedImage(NamedTuple):
+    name: str
+    data: bytes
+    media_type: str
+    sha256: str
+
+
+def pixel_digest(image: Image.Image) -> str:
+    """
+    Hash of the decoded pixels, so identical images are found before encoding them.
+    """
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def rename_image_references(markdown: str, renames: Dict[str, str]) -> str:
+    """
+    Point markdown image references (`![name](name)`) at new image names.
+
+    All names are replaced in a single pass, so renames never chain.
+    """
+    renames = {old: new for old, new in renames.items() if old != new}
+    if not renames:
+        return markdown
+    names = "|".join(re.escape(name) for name in sorted(renames, key=len, reverse=True))
+    pattern = re.compile(rf"(!\[|\]\()({names})(?=[\])])")
+    return pattern.sub(lambda m: m.group(1) + renames[m.group(2)], markdown)
+
+
+def _encode(name: str, image: Image.Image, options: ImageOptions) -> EncodedImage:
+    pil_format, _, media_type = IMAGE_FORMATS[options.image_format]
+    data = encode_image(
+        image, pil_format, options.image_quality, options.image_max_dimension
+    )
+    return EncodedImage(name, data, media_type, hashlib.sha256(data).hexdigest())
+
+
+def render_images(
+    markdown: str,
+    images: Dict[str, Image.Image],
+    options: Optional[ImageOptions] = None,
+) -> Tuple[str, Dict[str, EncodedImage]]:
+    """
+    Encode the images of a converted document in memory, in parallel.
+
+    Images with identical pixels (repeated logos, page decorations) are encoded
+    once and every reference to them in the markdown points at the first copy.
+    Names get the extension of the chosen format.
+
+    Args:
+    markdown (str): The converted markdown, referencing images by name.
+    images (dict): Image name to PIL image, as returned by convert_single_pdf.
+    options (ImageOptions): Output format, quality and maximum dimension.
+
+    Returns:
+    tuple: The markdown with updated references and a dict of image name to EncodedImage.
+    """
+    options = options or ImageOptions()
+    if not images:
+        return markdown, {}
+    _, extension, _ = IMAGE_FORMATS[options.image_format]
+
+    names = list(images.keys())
+    digests = list(image_pool.map(pixel_digest, (images[name] for name in names)))
+
+    renames = {}
+    unique = {}
+    first_names = {}
+    for name, digest in zip(names, digests):
+        if digest not in unique:
+            unique[digest] = f"{os.path.splitext(name)[0]}.{extension}"
+            first_names[unique[digest]] = name
+        renames[name] = unique[digest]
+    if len(unique) < len(names):
+        logger.debug(f"De-duplicated {len(names) - len(unique)} of {len(names)} images")
+
+    futures = [
+        image_pool.submit(_encode, new_name, images[name], options)
+        for new_name, name in first_names.items()
+    ]
+    encoded = {}
+    for future in futures:
+        try:
+            image = future.result()
+            encoded[image.name] = image
+        except Exception as e:
+            logger.error(f"Error encoding image: {str(e)}")
+
+    return rename_image_references(markdown, renames), encoded
+
+
+def images_to_base64(images: Dict[str, EncodedImage]) -> Dict[str, str]:
+    """
+    Inline representation used in JSON responses.
+    """
+    return {
+        name: base64.b64encode(image.data).decode("utf-8")
+        for name, image in images.items()
+    }
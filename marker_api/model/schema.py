@@ -36,6 +36,72 @@ class HealthResponse(BaseModel):
             ]
 
 
+class ReadyResponse(BaseModel):
+    ready: bool
+    status: str = Field(..., description="pending, loading, ready or failed")
+    stage: Optional[str] = Field(None, description="Model currently being loaded")
+    completed_stages: List[str] = []
+    total_stages: int = 0
+    progress: float = Field(0.0, description="Fraction of load stages completed")
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    workers: Optional[int] = Field(
+        None, description="Workers answering a ping (only for distributed type)"
+    )
+
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool
+    hits: int
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    hit_ratio: float
+    memory_entries: int
+    memory_bytes: int
+    memory_evictions: int
+    disk_bytes: int
+    disk_evictions: int
+
+
+class ImageFormat(str, Enum):
+    png = "png"
+    jpeg = "jpeg"
+    webp = "webp"
+
+
+class ImageOptions(BaseModel):
+    image_format: ImageFormat = Field(
+        ImageFormat.png, description="Encoding of extracted images"
+    )
+    image_quality: int = Field(
+        85, ge=1, le=100, description="Quality for lossy formats (jpeg, webp)"
+    )
+    image_max_dimension: Optional[int] = Field(
+        None, gt=0, description="Downscale images so neither side exceeds this size"
+    )
+
+
+class ImageMode(str, Enum):
+    inline = "inline"
+    reference = "reference"
+    zip = "zip"
+
+
+class ImageReference(BaseModel):
+    sha256: str
+    media_type: str
+    size: int
+    url: str = Field(
+        ..., description="Blob endpoint path, or archive path inside a ZIP bundle"
+    )
+
+
+class StreamFormat(str, Enum):
+    ndjson = "ndjson"
+    sse = "sse"
+
+
 class GeneralMetadata(BaseModel):
     languages: Optional[Union[str, List[str]]] = None
     toc: Optional[List[Dict[str, Any]]] = None
@@ -47,7 +113,12 @@ class PDFConversionResult(BaseModel):
     filename: str
     markdown: str
     metadata: GeneralMetadata
-    images: Dict[str, str]
+    images: Dict[str, str] = Field(
+        default_factory=dict, description="Base64 images (image_mode=inline)"
+    )
+    image_refs: Optional[Dict[str, ImageReference]] = Field(
+        None, description="Image references (image_mode=reference or zip)"
+    )
     status: str
 
 
@@ -59,23 +130,117 @@ class ConversionResponse(BaseModel):
 class CeleryTaskResponse(BaseModel):
     task_id: str
     status: str
+    estimated_seconds: Optional[float] = Field(
+        None, description="Estimated seconds until the conversion finishes, from queue depth and measured throughput"
+    )
+    estimated_completion: Optional[float] = Field(None, description="Estimated completion time (Unix time)")
+
+
+class CancelResponse(BaseModel):
+    task_id: str
+    status: str = Field(
+        ...,
+        description="Cancelled, Shared if only tasks other requests await were left, "
+        "or Finished if nothing was left to cancel",
+    )
+    cancelled: int = Field(0, description="Tasks that were stopped")
+    shared: int = Field(0, description="Tasks left running because other requests await them")
 
 
 class CeleryResultResponse(BaseModel):
     task_id: str
     status: str
     result: Optional[PDFConversionResult] = None
+    error: Optional[str] = Field(None, description="Why the conversion failed, when status is Error")
 
 
 class BatchConversionResponse(BaseModel):
     task_id: str
     status: str
+    total: Optional[int] = None
+    estimated_seconds: Optional[float] = Field(
+        None, description="Estimated seconds until the conversion finishes, from queue depth and measured throughput"
+    )
+    estimated_completion: Optional[float] = Field(None, description="Estimated completion time (Unix time)")
+
+
+class SimpleBatchConversionResponse(BaseModel):
+    status: str
+    results: List[PDFConversionResult]
+
+
+class BatchDocumentResult(PDFConversionResult):
+    index: Optional[int] = Field(None, description="Position of the document in the batch")
+    completed_at: Optional[float] = Field(None, description="When the document was seen finished (Unix time)")
 
 
 class BatchResultResponse(BaseModel):
     task_id: str
     status: str
-    results: Optional[List[PDFConversionResult]] = None
+    results: Optional[List[BatchDocumentResult]] = None
     completed: Optional[int] = None
     total: Optional[int] = None
+    successful: Optional[int] = None
+    failed: Optional[int] = None
     progress: Optional[str] = None
+    percent: Optional[float] = None
+    next_cursor: Optional[int] = Field(
+        None, description="Pass as `cursor` to fetch documents completed after this page"
+    )
+    has_more: Optional[bool] = None
+
+
+class BulkJobRequest(BaseModel):
+    directory: Optional[str] = Field(None, description="Server-side directory whose PDFs are converted")
+    manifest: Optional[str] = Field(
+        None, description="Server-side file listing one PDF path per line (relative to the manifest)"
+    )
+    recursive: bool = Field(True, description="Include subdirectories of `directory`")
+    output_dir: Optional[str] = Field(
+        None, description="Where results are written; defaults to a per-job directory under MARKER_BULK_OUTPUT_DIR"
+    )
+    image_options: Optional[ImageOptions] = None
+    priority: Optional[int] = Field(None, ge=0, le=9)
+    max_in_flight: Optional[int] = Field(
+        None, ge=1, description="Conversions kept queued or running at once (MARKER_BULK_MAX_IN_FLIGHT)"
+    )
+
+
+class BulkJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="running, paused, completed or cancelled")
+    source: str
+    output_dir: str
+    discovered: int = Field(..., description="Files enumerated from the source so far")
+    enumeration_complete: bool
+    pending: int
+    queued: int
+    done: int
+    failed: int
+    pages_done: int
+    created_at: float
+    finished_at: Optional[float] = None
+    active_seconds: float = Field(..., description="Time the job has spent running, across restarts")
+    files_per_second: Optional[float] = None
+    pages_per_second: Optional[float] = None
+    recent_files_per_second: float = Field(..., description="Over the last 5 minutes")
+    recent_pages_per_second: float
+    estimated_seconds: Optional[float] = Field(
+        None, description="Time left at the recent rate, once every file has been enumerated"
+    )
+
+
+class BulkFile(BaseModel):
+    path: str
+    state: str
+    task_id: Optional[str] = None
+    pages: Optional[int] = None
+    attempts: int
+    error: Optional[str] = None
+    finished_at: Optional[float] = None
+
+
+class BulkFilesResponse(BaseModel):
+    job_id: str
+    state: str
+    files: List[BulkFile]
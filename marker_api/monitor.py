@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from marker_api.celery_worker import celery_app
+from marker_api.routing import priority_queue_keys
+from marker_api import serialization
+from marker_api.single_flight import single_flight_stats
+from marker_api.throughput import worker_throughput
+
+logger = logging.getLogger(__name__)
+
+# Hash of task id -> {"pages", "queued_at"} for every queued or running conversion
+PENDING_PAGES_KEY = "marker:pending_pages"
+# Entries older than this are assumed lost (e.g. the worker running them was killed)
+PENDING_PAGES_TTL = int(os.environ.get("MARKER_PENDING_PAGES_TTL", 6 * 3600))
+
+
+def track_pending_pages(task_id: str, pages: Optional[int]):
+    """
+    Record the pages a submitted conversion will process, until it finishes.
+    """
+    if not pages:
+        return
+    try:
+        celery_app.backend.client.hset(
+            PENDING_PAGES_KEY, task_id, json.dumps({"pages": pages, "queued_at": time.time()})
+        )
+    except Exception as e:
+        logger.warning(f"Could not record pending pages for {task_id}: {str(e)}")
+
+
+def clear_pending_pages(task_id: str):
+    try:
+        celery_app.backend.client.hdel(PENDING_PAGES_KEY, task_id)
+    except Exception as e:
+        logger.warning(f"Could not clear pending pages for {task_id}: {str(e)}")
+
+
+def queue_names() -> List[str]:
+    queues = celery_app.conf.task_queues
+    if queues:
+        return [queue.name for queue in queues]
+    return [celery_app.conf.task_default_queue]
+
+
+class ClusterMonitor:
+    """
+    Refreshes a snapshot of the Celery cluster on a background thread.
+
+    Each refresh sends one round of inspect broadcasts (stats, active, reserved)
+    and reads queue lengths and pending pages from Redis. Endpoints read the
+    last snapshot from memory, so probes and metric scrapes never reach the
+    workers themselves.
+
+    Args:
+    interval (float): Seconds between refreshes.
+    inspect_timeout (float): How long each broadcast waits for worker replies.
+    """
+
+    def __init__(self, interval: float, inspect_timeout: float = 1.0):
+        self.interval = interval
+        self.inspect_timeout = inspect_timeout
+        self.snapshot: Dict[str, Any] = {}
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="cluster-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def _pending_pages(self, client) -> int:
+        now = time.time()
+        total = 0
+        expired = []
+        for task_id, value in client.hgetall(PENDING_PAGES_KEY).items():
+            entry = json.loads(value)
+            if now - entry["queued_at"] > PENDING_PAGES_TTL:
+                expired.append(task_id)
+            else:
+                total += entry["pages"]
+        if expired:
+            client.hdel(PENDING_PAGES_KEY, *expired)
+        return total
+
+    def _queue_length(self, client, queue: str) -> int:
+        # Prioritized messages live in one list per priority step
+        sep = celery_app.conf.broker_transport_options.get("sep", ":")
+        pipe = client.pipeline(transaction=False)
+        for key in priority_queue_keys(queue, sep):
+            pipe.llen(key)
+        return sum(pipe.execute())
+
+    def refresh(self):
+        snapshot = {"updated_at": time.time(), "broker_ok": False}
+        try:
+            client = celery_app.backend.client
+            client.ping()
+            snapshot["broker_ok"] = True
+            snapshot["queues"] = {name: self._queue_length(client, name) for name in queue_names()}
+            snapshot["pending_pages"] = self._pending_pages(client)
+            snapshot["single_flight"] = single_flight_stats(client)
+            snapshot["throughput"] = {
+                worker: entry["pages_per_second"] for worker, entry in worker_throughput(client).items()
+            }
+
+            inspect = celery_app.control.inspect(timeout=self.inspect_timeout)
+            stats = inspect.stats() or {}
+            active = inspect.active() or {}
+            reserved = inspect.reserved() or {}
+            snapshot["workers"] = len(stats)
+            snapshot["worker_concurrency"] = sum(
+                (worker.get("pool") or {}).get("max-concurrency", 0) for worker in stats.values()
+            )
+            snapshot["active_tasks"] = sum(len(tasks) for tasks in active.values())
+            snapshot["reserved_tasks"] = sum(len(tasks) for tasks in reserved.values())
+            self.refreshes += 1
+        except Exception as e:
+            self.refresh_errors += 1
+            snapshot["error"] = str(e)
+            logger.warning(f"Cluster monitor refresh failed: {str(e)}")
+        self.snapshot = snapshot
+
+    def render_metrics(self) -> str:
+        """
+        The last snapshot in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        metric("marker_broker_up", "gauge", "1 if Redis answered the last refresh.",
+               [("", int(snapshot.get("broker_ok", False)))])
+        metric("marker_workers", "gauge", "Celery workers that answered the last inspect.",
+               [("", snapshot.get("workers", 0))])
+        metric("marker_worker_concurrency", "gauge", "Total pool processes across workers.",
+               [("", snapshot.get("worker_concurrency", 0))])
+        metric("marker_tasks_active", "gauge", "Tasks being executed by workers.",
+               [("", snapshot.get("active_tasks", 0))])
+        metric("marker_tasks_reserved", "gauge", "Tasks prefetched by workers but not started.",
+               [("", snapshot.get("reserved_tasks", 0))])
+        metric("marker_queue_length", "gauge", "Messages waiting in each broker queue.",
+               [(f'{{queue="{name}"}}', length) for name, length in snapshot.get("queues", {}).items()])
+        metric("marker_pending_pages", "gauge", "Pages of submitted documents not converted yet.",
+               [("", snapshot.get("pending_pages", 0))])
+        metric("marker_worker_pages_per_second", "gauge",
+               "Moving average of pages per second of one conversion, per worker.",
+               [(f'{{worker="{worker}"}}', round(rate, 4))
+                for worker, rate in snapshot.get("throughput", {}).items()])
+        single_flight = snapshot.get("single_flight", {})
+        metric("marker_submissions_total", "counter",
+               "Conversions queued (submitted) or attached to an identical in-flight one (coalesced).",
+               [(f'{{outcome="{outcome}"}}', single_flight.get(outcome, 0))
+                for outcome in ("submitted", "coalesced")])
+        serializer = dict(serialization.stats)
+        metric("marker_serializer_payloads_total", "counter",
+               "msgpack+zstd payloads handled by this API process.",
+               [('{direction="encoded"}', serializer["encoded"]),
+                ('{direction="decoded"}', serializer["decoded"]),
+                ('{direction="decoded_json"}', serializer["decoded_json"])])
+        metric("marker_serializer_bytes_total", "counter",
+               "Payload bytes before (raw) and after (compressed) compression.",
+               [(f'{{direction="{direction}",size="{size}"}}', serializer[f"{direction}_{size}_bytes"])
+                for direction in ("encoded", "decoded") for size in ("raw", "compressed")])
+        metric("marker_monitor_last_refresh_timestamp_seconds", "gauge",
+               "When the snapshot was taken.", [("", snapshot.get("updated_at", 0))])
+        metric("marker_monitor_refresh_errors_total", "counter",
+               "Failed snapshot refreshes.", [("", self.refresh_errors)])
+        return "\n".join(lines) + "\n"
+
+
+cluster_monitor = ClusterMonitor(
+    interval=float(os.environ.get("MARKER_MONITOR_INTERVAL", 15)),
+    inspect_timeout=float(os.environ.get("MARKER_MONITOR_INSPECT_TIMEOUT", 1.0)),
+)
@@ -1,8 +1,11 @@
-import os
 import time
-import base64
+from typing import Union
 from marker.convert import convert_single_pdf
 from marker.logger import configure_logging
+from marker_api.cache import conversion_cache, make_cache_key, sha256_file, sha256_hex
+from marker_api.images import images_to_base64, render_images
+from marker_api.model.schema import ImageOptions
+from marker_api.sharding import merge_shard_outputs
 import logging
 
 # Initialize logging
@@ -11,13 +14,16 @@ logger = logging.getLogger(__name__)
 
 
 # Function to parse PDF and return markdown, metadata, and image data
-def parse_pdf_and_return_markdown(pdf_file: bytes, extract_images: bool, model_list):
+def parse_pdf_and_return_markdown(
+    pdf_file: Union[bytes, str], extract_images: bool, model_list, image_options=None
+):
     """
     Function to parse a PDF and extract text and images.
 
     Args:
-    pdf_file (bytes): The content of the PDF file.
+    pdf_file (bytes | str): The content of the PDF file, or its path.
     extract_images (bool): Whether to extract images or not.
+    image_options (ImageOptions): Format, quality and size of extracted images.
 
     Returns
     tuple: A tuple containing the full text, metadata, and image data (if extracted).
@@ -27,48 +33,102 @@ def parse_pdf_and_return_markdown(pdf_file: bytes, extract_images: bool, model_l
     logger.debug(f"Images extracted: {list(images.keys())}")
     image_data = {}
     if extract_images:
-        for i, (filename, image) in enumerate(images.items()):
-            logger.debug(f"Processing image {filename}")
+        full_text, encoded_images = render_images(full_text, images, image_options)
+        image_data = images_to_base64(encoded_images)
 
-            # Save image as PNG
-            image.save(filename, "PNG")
+    return full_text, out_meta, image_data
 
-            # Read the saved image file as bytes
-            with open(filename, "rb") as f:
-                image_bytes = f.read()
 
-            # Convert image to base64
-            image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-            image_data[f"{filename}"] = image_base64
+def conversion_options(image_options=None, shard_pages: int = 0) -> dict:
+    """
+    Options that change the conversion output, used as part of the cache key.
+    """
+    image_options = image_options or ImageOptions()
+    options = {"extract_images": True, "images": image_options.model_dump(mode="json")}
+    if shard_pages:
+        options["shard_pages"] = shard_pages
+    return options
 
-            # Remove the temporary image file
-            os.remove(filename)
 
-    return full_text, out_meta, image_data
+def source_sha256(pdf_source: Union[bytes, str]) -> str:
+    """
+    SHA-256 of a PDF given as bytes or as a path.
+    """
+    if isinstance(pdf_source, bytes):
+        return sha256_hex(pdf_source)
+    return sha256_file(pdf_source)
+
+
+# Function to look up a previous conversion of the same file
+def lookup_cached_result(
+    content_sha256: str, filename: str, image_options=None, shard_pages: int = 0
+):
+    """
+    Function to check the conversion cache before queueing a PDF for inference.
+
+    Args:
+    content_sha256 (str): SHA-256 of the PDF file, computed while it was uploaded.
+    filename (str): The name of the PDF file.
+    image_options (ImageOptions): Format, quality and size of extracted images.
+    shard_pages (int): Shard size if the document is converted in page-range shards.
+
+    Returns:
+    tuple: The cache key and the cached result (None on a miss).
+    """
+    cache_key = make_cache_key(
+        content_sha256, conversion_options(image_options, shard_pages)
+    )
+    cached = conversion_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit for {filename} ({cache_key})")
+        cached.update(filename=filename, time=0.0)
+    return cache_key, cached
 
 
 # Function to process a single PDF file
-def process_pdf_file(file_content: bytes, filename: str, model_list):
+def process_pdf_file(
+    file_content: Union[bytes, str],
+    filename: str,
+    model_list,
+    cache_key=None,
+    image_options=None,
+):
     """
     Function to process a single PDF file.
 
+    Results are cached by the SHA-256 of the file content and the conversion
+    options, so re-uploads of the same document skip the model pipeline.
+
     Args:
-    file_content (bytes): The content of the PDF file.
+    file_content (bytes | str): The content of the PDF file, or the path it was spooled to.
     filename (str): The name of the PDF file.
     model_list: The list of loaded models.
+    cache_key (str): Key from lookup_cached_result, if the cache was already checked.
+    image_options (ImageOptions): Format, quality and size of extracted images.
 
     Returns:
     dict: A dictionary containing the filename, markdown text, metadata, image data, status, and processing time.
     """
     entry_time = time.time()
     logger.info(f"Entry time for {filename}: {entry_time}")
+    if cache_key is None:
+        cache_key, cached = lookup_cached_result(
+            source_sha256(file_content), filename, image_options
+        )
+        if cached is not None:
+            cached["time"] = time.time() - entry_time
+            return cached
+
     markdown_text, metadata, image_data = parse_pdf_and_return_markdown(
-        file_content, extract_images=True, model_list=model_list
+        file_content,
+        extract_images=True,
+        model_list=model_list,
+        image_options=image_options,
     )
     completion_time = time.time()
     logger.info(f"Model processes complete time for {filename}: {completion_time}")
     time_difference = completion_time - entry_time
-    return {
+    result = {
         "filename": filename,
         "markdown": markdown_text,
         "metadata": metadata,
@@ -76,3 +136,53 @@ def process_pdf_file(file_content: bytes, filename: str, model_list):
         "status": "ok",
         "time": time_difference,
     }
+    conversion_cache.put(cache_key, result)
+    return result
+
+
+# Function to convert one page range of a PDF
+def convert_pdf_shard(
+    file_content: Union[bytes, str], model_list, start_page: int, max_pages: int
+):
+    """
+    Function to convert the pages [start_page, start_page + max_pages) of a PDF.
+
+    Returns:
+    tuple: The start page, markdown text, images (PIL) and metadata of the shard.
+    """
+    logger.info(f"Converting pages {start_page}-{start_page + max_pages - 1}")
+    markdown_text, images, metadata = convert_single_pdf(
+        file_content, model_list, max_pages=max_pages, start_page=start_page
+    )
+    return start_page, markdown_text, images, metadata
+
+
+# Function to merge converted shards into a single result
+def assemble_sharded_result(
+    filename: str, shard_outputs, image_options, cache_key: str, entry_time: float
+):
+    """
+    Function to merge shard outputs and encode their images as one document.
+
+    Args:
+    filename (str): The name of the PDF file.
+    shard_outputs (list): Outputs of convert_pdf_shard.
+    image_options (ImageOptions): Format, quality and size of extracted images.
+    cache_key (str): Key the merged result is cached under.
+    entry_time (float): When the request started, for the reported processing time.
+
+    Returns:
+    dict: The same shape as process_pdf_file.
+    """
+    markdown_text, images, metadata = merge_shard_outputs(shard_outputs)
+    markdown_text, encoded_images = render_images(markdown_text, images, image_options)
+    result = {
+        "filename": filename,
+        "markdown": markdown_text,
+        "metadata": metadata,
+        "images": images_to_base64(encoded_images),
+        "status": "ok",
+        "time": time.time() - entry_time,
+    }
+    conversion_cache.put(cache_key, result)
+    return result
@@ -0,0 +1,61 @@
+import os
+from typing import Dict, List, Optional
+
+# Queues by estimated conversion cost; "celery" stays for tasks queued by earlier versions
+DEFAULT_QUEUE = "celery"
+SMALL_QUEUE = os.environ.get("MARKER_QUEUE_SMALL", "marker_small")
+MEDIUM_QUEUE = os.environ.get("MARKER_QUEUE_MEDIUM", "marker_medium")
+LARGE_QUEUE = os.environ.get("MARKER_QUEUE_LARGE", "marker_large")
+ROUTED_QUEUES = [SMALL_QUEUE, MEDIUM_QUEUE, LARGE_QUEUE]
+
+# A document goes to the cheapest queue whose page *and* size limits it fits
+SMALL_MAX_PAGES = int(os.environ.get("MARKER_SMALL_MAX_PAGES", 10))
+SMALL_MAX_BYTES = int(os.environ.get("MARKER_SMALL_MAX_BYTES", 5 * 1024**2))
+MEDIUM_MAX_PAGES = int(os.environ.get("MARKER_MEDIUM_MAX_PAGES", 100))
+MEDIUM_MAX_BYTES = int(os.environ.get("MARKER_MEDIUM_MAX_BYTES", 50 * 1024**2))
+
+# Redis emulates priorities with one list per step; 0 is served first
+PRIORITY_STEPS = list(range(10))
+MAX_PRIORITY = PRIORITY_STEPS[-1]
+DEFAULT_PRIORITY = int(os.environ.get("MARKER_DEFAULT_PRIORITY", 5))
+
+
+def queue_for(pages: Optional[int], size: Optional[int]) -> str:
+    """
+    The queue for a conversion of `pages` pages from a `size` byte document.
+
+    Either may be None when unknown; a document whose pages could not be
+    counted is routed by its size alone.
+    """
+    pages = pages or 0
+    size = size or 0
+    if pages <= SMALL_MAX_PAGES and size <= SMALL_MAX_BYTES:
+        return SMALL_QUEUE
+    if pages <= MEDIUM_MAX_PAGES and size <= MEDIUM_MAX_BYTES:
+        return MEDIUM_QUEUE
+    return LARGE_QUEUE
+
+
+def broker_priority(priority: Optional[int]) -> int:
+    """
+    Map an API priority (0 lowest .. 9 highest) to the broker's (0 served first).
+    """
+    if priority is None:
+        priority = DEFAULT_PRIORITY
+    return MAX_PRIORITY - min(max(priority, 0), MAX_PRIORITY)
+
+
+def route(
+    pages: Optional[int], size: Optional[int] = None, priority: Optional[int] = None
+) -> Dict[str, object]:
+    """
+    apply_async / signature options placing a task on its cost queue.
+    """
+    return {"queue": queue_for(pages, size), "priority": broker_priority(priority)}
+
+
+def priority_queue_keys(queue: str, sep: str = ":") -> List[str]:
+    """
+    The Redis lists holding the messages of `queue`, one per priority step.
+    """
+    return [queue if step == 0 else f"{queue}{sep}{step}" for step in PRIORITY_STEPS]
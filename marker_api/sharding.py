@@ -0,0 +1,161 @@
+import os
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from collections.abc import Collection
+from marker_api.images import rename_image_references
+from marker_api.utils import get_page_count
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_PAGES = int(os.environ.get("MARKER_SHARD_PAGES", 0))
+
+
+def resolve_shard_pages(shard_pages: Optional[int]) -> int:
+    """
+    Shard size for a request: the explicit value, else MARKER_SHARD_PAGES (0 disables sharding).
+    """
+    return DEFAULT_SHARD_PAGES if shard_pages is None else max(0, shard_pages)
+
+
+def plan_shards(page_count: int, shard_pages: int) -> List[Tuple[int, int]]:
+    """
+    Split a document into (start_page, max_pages) ranges of at most shard_pages pages.
+
+    Returns a single range covering the document when sharding would not split it.
+    """
+    if shard_pages <= 0 or page_count <= shard_pages:
+        return [(0, page_count)]
+    return [
+        (start, min(shard_pages, page_count - start))
+        for start in range(0, page_count, shard_pages)
+    ]
+
+
+def plan_document(
+    pdf_path: str, shard_pages: Optional[int] = None
+) -> Tuple[Optional[int], Optional[List[Tuple[int, int]]]]:
+    """
+    Page count of a document (None if it cannot be read) and its shard plan.
+
+    The shard plan is None when the document is not split. This reads the PDF,
+    so async callers run it in a thread.
+
+    Args:
+    pdf_path (str): Path to the PDF.
+    shard_pages (int): Shard size; None falls back to MARKER_SHARD_PAGES.
+
+    Returns:
+    tuple: (page_count, shards)
+    """
+    try:
+        page_count = get_page_count(pdf_path)
+    except Exception as e:
+        logger.warning(f"Could not count pages, converting unsharded: {str(e)}")
+        return None, None
+    shard_pages = resolve_shard_pages(shard_pages)
+    if not shard_pages:
+        return page_count, None
+    shards = plan_shards(page_count, shard_pages)
+    return page_count, shards if len(shards) > 1 else None
+
+
+def avoid_image_collisions(
+    markdown: str, images: Dict[str, Any], taken: Collection[str], page_offset: int
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Rename a shard's images whose names are already taken by earlier shards.
+
+    marker already names images by absolute page, so names only collide for
+    images it did not name; those get the shard's start page as a prefix.
+    """
+    renames = {}
+    kept = {}
+    for name, image in images.items():
+        new_name = name
+        while new_name in taken or new_name in kept:
+            new_name = f"{page_offset}_{new_name}"
+        renames[name] = new_name
+        kept[new_name] = image
+    return rename_image_references(markdown, renames), kept
+
+
+def _merge_stats(total: Any, value: Any) -> Any:
+    # Sum numbers and merge nested dicts key by key; keep the first value for anything else
+    if total is None:
+        return value
+    if isinstance(total, dict) and isinstance(value, dict):
+        merged = dict(total)
+        for key, item in value.items():
+            merged[key] = _merge_stats(merged.get(key), item)
+        return merged
+    if isinstance(total, (int, float)) and isinstance(value, (int, float)) and not isinstance(total, bool):
+        return total + value
+    return total
+
+
+def merge_metadata(shard_metadata: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine the metadata of consecutive shards into document metadata.
+
+    Page counts and per-stage stats are summed, the TOC (always read from the
+    whole document) and file type come from the first shard, and languages are
+    the union over all shards.
+    """
+    if not shard_metadata:
+        return {}
+    merged = dict(shard_metadata[0])
+    languages = list(merged.get("languages") or [])
+    for metadata in shard_metadata[1:]:
+        for key, value in metadata.items():
+            if key == "languages":
+                languages.extend(lang for lang in (value or []) if lang not in languages)
+            elif key in ("toc", "filetype"):
+                merged.setdefault(key, value)
+            else:
+                merged[key] = _merge_stats(merged.get(key), value)
+    if languages:
+        merged["languages"] = languages
+    return merged
+
+
+def merge_shard_outputs(
+    outputs: List[Tuple[int, str, Dict[str, Any], Dict[str, Any]]]
+) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """
+    Merge (start_page, markdown, images, metadata) shard outputs into one document.
+
+    Args:
+    outputs (list): Shard outputs, in any order.
+
+    Returns:
+    tuple: The merged markdown, images and metadata.
+    """
+    outputs = sorted(outputs, key=lambda output: output[0])
+    markdown_parts = []
+    images = {}
+    for start_page, markdown, shard_images, _ in outputs:
+        markdown, shard_images = avoid_image_collisions(
+            markdown, shard_images, images.keys(), start_page
+        )
+        markdown_parts.append(markdown.strip("\n"))
+        images.update(shard_images)
+    metadata = merge_metadata([output[3] for output in outputs])
+    logger.debug(f"Merged {len(outputs)} shards, {metadata.get('pages')} pages")
+    return "\n\n".join(markdown_parts), images, metadata
+
+
+def dedupe_encoded_images(
+    markdown: str, images: Dict[str, str]
+) -> Tuple[str, Dict[str, str]]:
+    """
+    Collapse identical encoded images coming from different shards onto the first copy.
+    """
+    first_by_value = {}
+    renames = {}
+    unique = {}
+    for name, data in images.items():
+        canonical = first_by_value.setdefault(data, name)
+        renames[name] = canonical
+        if canonical == name:
+            unique[name] = data
+    return rename_image_references(markdown, renames), unique
@@ -0,0 +1,166 @@
+import os
+import logging
+from typing import Any, Dict, Optional
+import redis
+from celery.states import FAILURE, REVOKED
+from marker_api.cache import make_cache_key
+from marker_api.celery_worker import celery_app
+from marker_api.startup import env_flag
+
+logger = logging.getLogger(__name__)
+
+# Identical submissions (same content and options) share one task while it runs
+SINGLE_FLIGHT = env_flag("MARKER_SINGLE_FLIGHT", True)
+# How long a submission stays claimed while it is queued or running
+SINGLE_FLIGHT_TTL = int(os.environ.get("MARKER_SINGLE_FLIGHT_TTL", 6 * 3600))
+# Cluster-wide counters: submitted (owned a key) and coalesced (attached to one)
+STATS_KEY = "marker:single_flight:stats"
+
+
+def single_flight_key(content_sha256: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Redis key shared by every submission of the same content with the same options.
+    """
+    return f"marker:inflight:{make_cache_key(content_sha256, options)}"
+
+
+def _task_key(task_id: str) -> str:
+    # Reverse mapping, so a worker finishing a task can find the key it owns
+    return f"marker:inflight:task:{task_id}"
+
+
+def _refs_key(task_id: str) -> str:
+    # Requests still waiting for the task: the owner and duplicates that wait for it
+    return f"marker:inflight:refs:{task_id}"
+
+
+def _client():
+    return celery_app.backend.client
+
+
+def _attachable(task_id: str) -> bool:
+    # A missing result is PENDING: queued or running. Failed tasks are not reused.
+    meta = celery_app.backend.get_task_meta(task_id, cache=False)
+    return meta["status"] not in (FAILURE, REVOKED)
+
+
+def _delete_if_owner(client, key: str, task_id: str) -> bool:
+    # Delete `key` only while it still names `task_id`
+    with client.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            current = pipe.get(key)
+            if current is None or current.decode() != task_id:
+                return False
+            pipe.multi()
+            pipe.delete(key)
+            pipe.execute()
+            return True
+        except redis.WatchError:
+            return False
+
+
+def find_inflight(key: str, waiting: bool = False) -> Optional[str]:
+    """
+    The task id of an earlier, not failed submission under `key`, if any.
+
+    A hit counts as coalesced: the caller reuses that task instead of queueing
+    one. A `waiting` caller (one that awaits the result and detaches when it
+    gives up) also takes a reference on the task.
+    """
+    client = _client()
+    existing = client.get(key)
+    if existing is None:
+        return None
+    task_id = existing.decode()
+    if not _attachable(task_id):
+        return None
+    client.hincrby(STATS_KEY, "coalesced", 1)
+    if waiting:
+        client.incr(_refs_key(task_id))
+        client.expire(_refs_key(task_id), SINGLE_FLIGHT_TTL)
+    logger.info(f"Attaching duplicate submission to task {task_id}")
+    return task_id
+
+
+def claim(key: str, task_id: str, waiting: bool = False) -> Optional[str]:
+    """
+    Make `task_id` the submission for `key`.
+
+    Returns None when the caller owns the key and should queue the task, or
+    the task id of the submission that got there first. A key left behind by
+    a failed task is taken over. Only `waiting` callers take a reference on
+    the task (see find_inflight and detach).
+    """
+    client = _client()
+    for _ in range(3):
+        if client.set(key, task_id, nx=True, ex=SINGLE_FLIGHT_TTL):
+            client.set(_task_key(task_id), key, ex=SINGLE_FLIGHT_TTL)
+            if waiting:
+                client.set(_refs_key(task_id), 1, ex=SINGLE_FLIGHT_TTL)
+            client.hincrby(STATS_KEY, "submitted", 1)
+            return None
+        existing = find_inflight(key, waiting)
+        if existing is not None:
+            return existing
+        stale = client.get(key)
+        if stale is not None:
+            _delete_if_owner(client, key, stale.decode())
+    logger.warning(f"Could not claim {key}, submitting without de-duplication")
+    return None
+
+
+def release(task_id: str, succeeded: bool):
+    """
+    Called when a claimed task finishes or could not be queued.
+
+    After a success, duplicates keep attaching to the task for as long as its
+    result is kept. After a failure, the next submission queues a new task.
+    """
+    client = _client()
+    try:
+        key = client.get(_task_key(task_id))
+        if key is None:
+            return
+        key = key.decode()
+        if succeeded:
+            client.expire(key, celery_app.conf.result_expires)
+        else:
+            _delete_if_owner(client, key, task_id)
+        client.delete(_task_key(task_id), _refs_key(task_id))
+    except Exception as e:
+        logger.warning(f"Could not release single-flight key of {task_id}: {str(e)}")
+
+
+def detach(task_id: str) -> int:
+    """
+    Drop one waiting request's reference on a task; returns how many are left.
+
+    0 means no other request is waiting for it, so it may be cancelled.
+    Submissions that do not wait (clients polling by task id) hold no reference.
+    """
+    try:
+        client = _client()
+        if not client.exists(_refs_key(task_id)):
+            return 0
+        return max(0, client.decr(_refs_key(task_id)))
+    except Exception as e:
+        logger.warning(f"Could not detach from {task_id}: {str(e)}")
+        return 1
+
+
+def waiting_refs(task_id: str) -> int:
+    """
+    How many requests are still waiting for a task (see detach).
+    """
+    refs = _client().get(_refs_key(task_id))
+    return max(0, int(refs)) if refs is not None else 0
+
+
+def single_flight_stats(client=None) -> Dict[str, int]:
+    client = client or _client()
+    counters = client.hgetall(STATS_KEY)
+    return {
+        "submitted": int(counters.get(b"submitted", 0)),
+        "coalesced": int(counters.get(b"coalesced", 0)),
+    }
@@ -0,0 +1,150 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+
+def env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Mount the Gradio demo at "/" (Gradio is only imported when this is on)
+ENABLE_UI = env_flag("MARKER_ENABLE_UI", True)
+# Open the port right away and load models in the background; /ready reports progress
+FAST_START = env_flag("MARKER_FAST_START", False)
+
+
+def mount_demo_ui(app: FastAPI) -> FastAPI:
+    """
+    Mount the Gradio demo on the app if MARKER_ENABLE_UI is set.
+
+    Gradio and the demo module are imported here, so servers running without
+    the UI never pay for the import.
+    """
+    if not ENABLE_UI:
+        logger.info("Demo UI disabled (MARKER_ENABLE_UI)")
+        return app
+    import gradio as gr
+    from marker_api.demo import build_demo_ui
+
+    return gr.mount_gradio_app(app, build_demo_ui(), path="")
+
+
+def _model_stages() -> List[tuple]:
+    # Same models and order as marker.models.load_all_models, one stage each
+    from marker.models import (
+        setup_detection_model,
+        setup_layout_model,
+        setup_order_model,
+        setup_recognition_model,
+        setup_texify_model,
+    )
+    from marker.postprocessors.editor import load_editing_model
+
+    return [
+        ("detection", setup_detection_model),
+        ("layout", setup_layout_model),
+        ("order", setup_order_model),
+        ("edit", load_editing_model),
+        ("ocr", setup_recognition_model),
+        ("texify", setup_texify_model),
+    ]
+
+
+MODEL_STAGES = ["import", "detection", "layout", "order", "edit", "ocr", "texify"]
+
+
+class ModelLoader:
+    """
+    Loads the marker models stage by stage and records progress for /ready.
+
+    `start()` loads on a background thread; `load()` loads on the calling
+    thread. Either way `on_loaded` is called with the model list, in marker's
+    order [texify, layout, order, edit, detection, ocr], once every stage is done.
+    """
+
+    def __init__(self, on_loaded: Optional[Callable[[list], None]] = None):
+        self.on_loaded = on_loaded
+        self.status = "pending"
+        self.stage = None
+        self.completed: List[str] = []
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.model_list = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self.load, name="model-loader", daemon=True
+            )
+        self._thread.start()
+
+    def load(self) -> Optional[list]:
+        self.status = "loading"
+        self.started_at = time.time()
+        try:
+            self.stage = "import"
+            stages = _model_stages()
+            self.completed.append("import")
+            models = {}
+            for name, setup in stages:
+                self.stage = name
+                stage_start = time.time()
+                models[name] = setup()
+                self.completed.append(name)
+                logger.info(f"Loaded {name} model in {time.time() - stage_start:.1f}s")
+            model_list = [
+                models["texify"],
+                models["layout"],
+                models["order"],
+                models["edit"],
+                models["detection"],
+                models["ocr"],
+            ]
+            if self.on_loaded is not None:
+                self.on_loaded(model_list)
+            self.model_list = model_list
+            self.status = "ready"
+            logger.info(f"All models loaded in {time.time() - self.started_at:.1f}s")
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.critical(f"Model loading failed at stage {self.stage}: {str(e)}", exc_info=True)
+        finally:
+            self.stage = None
+            self.finished_at = time.time()
+        return self.model_list
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def progress(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "ready": self.ready,
+            "status": self.status,
+            "stage": self.stage,
+            "completed_stages": list(self.completed),
+            "total_stages": len(MODEL_STAGES),
+            "progress": round(len(self.completed) / len(MODEL_STAGES), 3),
+            "elapsed": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "error": self.error,
+        }
@@ -0,0 +1,87 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from marker_api.model.schema import StreamFormat
+
+logger = logging.getLogger(__name__)
+
+STREAM_MEDIA_TYPES = {
+    StreamFormat.ndjson: "application/x-ndjson",
+    StreamFormat.sse: "text/event-stream",
+}
+
+
+def format_event(event: str, data: Dict[str, Any], stream_format: StreamFormat) -> bytes:
+    """
+    Serialize one event as an NDJSON line or a Server-Sent Event.
+    """
+    payload = json.dumps(data, default=str)
+    if stream_format == StreamFormat.sse:
+        return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+    return (json.dumps({"event": event, **data}, default=str) + "\n").encode("utf-8")
+
+
+async def stream_as_completed(
+    futures: List[asyncio.Future],
+    filenames: List[str],
+    stream_format: StreamFormat,
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Emit one event per document as soon as its conversion finishes, then a summary.
+
+    Each result is serialized and released right away, so the response never
+    holds more than the documents currently in flight. A failed document is
+    reported in its own event without stopping the rest of the batch. If the
+    client disconnects, work that has not started yet is cancelled.
+    `transform`, if given, is applied to each result on a worker thread.
+    """
+    start_time = time.time()
+    total = len(futures)
+    index_of = {future: i for i, future in enumerate(futures)}
+    pending = set(futures)
+    # Finished futures are dropped as they are reported, so their results can be freed
+    del futures
+    successful = 0
+    failed = 0
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                i = index_of.pop(future)
+                try:
+                    result = future.result()
+                    if transform is not None:
+                        result = await asyncio.to_thread(transform, result)
+                    successful += 1
+                    yield format_event(
+                        "result", {"index": i, "status": "Success", "result": result}, stream_format
+                    )
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Error converting {filenames[i]}: {str(e)}")
+                    yield format_event(
+                        "result",
+                        {
+                            "index": i,
+                            "status": "Error",
+                            "filename": filenames[i],
+                            "error": str(e),
+                        },
+                        stream_format,
+                    )
+        yield format_event(
+            "summary",
+            {
+                "total": total,
+                "successful": successful,
+                "failed": failed,
+                "time": time.time() - start_time,
+            },
+            stream_format,
+        )
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, Optional
+import redis
+from marker_api.celery_worker import celery_app
+
+logger = logging.getLogger(__name__)
+
+# Hash of worker hostname -> {"pages_per_second", "pages", "seconds", "updated_at"}
+THROUGHPUT_KEY = "marker:throughput"
+# Workers that reported nothing for this long no longer count (scaled down, renamed)
+THROUGHPUT_TTL = int(os.environ.get("MARKER_THROUGHPUT_TTL", 24 * 3600))
+# Pages per second of one conversion until a worker has reported its own
+DEFAULT_PAGES_PER_SECOND = float(os.environ.get("MARKER_DEFAULT_PAGES_PER_SECOND", 0.5))
+# Weight of the newest measurement in the moving average
+THROUGHPUT_SMOOTHING = float(os.environ.get("MARKER_THROUGHPUT_SMOOTHING", 0.2))
+
+# Per-task deadline: expected duration on the slowest worker times a safety
+# factor, plus the fixed cost of opening a document, within [MIN, MAX] seconds
+TIME_LIMIT_FACTOR = float(os.environ.get("MARKER_TIME_LIMIT_FACTOR", 3))
+TIME_LIMIT_OVERHEAD = int(os.environ.get("MARKER_TIME_LIMIT_OVERHEAD", 60))
+MIN_TIME_LIMIT = int(os.environ.get("MARKER_MIN_TIME_LIMIT", 120))
+MAX_TIME_LIMIT = int(os.environ.get("MARKER_MAX_TIME_LIMIT", 4 * 3600))
+# Time between the soft limit (the task fails and retries) and the hard kill
+TIME_LIMIT_GRACE = 60
+
+
+def record_throughput(worker: str, pages: int, seconds: float):
+    """
+    Fold one conversion's speed into its worker's moving average of pages per second.
+
+    Every pool process of a worker reports under the worker's hostname, so the
+    average already reflects the slowdown of running several at once.
+    """
+    if not pages or seconds <= 0:
+        return
+    client = celery_app.backend.client
+    sample = pages / seconds
+    try:
+        while True:
+            with client.pipeline() as pipe:
+                try:
+                    pipe.watch(THROUGHPUT_KEY)
+                    current = pipe.hget(THROUGHPUT_KEY, worker)
+                    if current is None:
+                        entry = {"pages_per_second": sample, "pages": 0, "seconds": 0.0}
+                    else:
+                        entry = json.loads(current)
+                        entry["pages_per_second"] += THROUGHPUT_SMOOTHING * (
+                            sample - entry["pages_per_second"]
+                        )
+                    entry["pages"] += pages
+                    entry["seconds"] += seconds
+                    entry["updated_at"] = time.time()
+                    pipe.multi()
+                    pipe.hset(THROUGHPUT_KEY, worker, json.dumps(entry))
+                    pipe.execute()
+                    break
+                except redis.WatchError:
+                    continue
+    except Exception as e:
+        # Losing a sample only makes the estimates a little staler
+        logger.warning(f"Could not record throughput of {worker}: {str(e)}")
+    logger.debug(f"{worker}: {pages} pages in {seconds:.1f}s ({sample:.2f} pages/s)")
+
+
+def worker_throughput(client=None) -> Dict[str, Dict[str, Any]]:
+    """
+    The throughput entry of every worker that reported within THROUGHPUT_TTL.
+    """
+    client = client or celery_app.backend.client
+    now = time.time()
+    workers = {}
+    for worker, value in client.hgetall(THROUGHPUT_KEY).items():
+        entry = json.loads(value)
+        if now - entry["updated_at"] <= THROUGHPUT_TTL:
+            workers[worker.decode()] = entry
+    return workers
+
+
+def pages_per_second(workers: Dict[str, Dict[str, Any]], slowest: bool = False) -> float:
+    """
+    Pages per second of one conversion: the average over workers, or the slowest worker.
+    """
+    rates = [entry["pages_per_second"] for entry in workers.values() if entry["pages_per_second"] > 0]
+    if not rates:
+        return DEFAULT_PAGES_PER_SECOND
+    return min(rates) if slowest else sum(rates) / len(rates)
+
+
+def time_limits(pages: Optional[int], workers: Optional[Dict[str, Dict[str, Any]]] = None) -> dict:
+    """
+    Celery `soft_time_limit` and `time_limit` options for a task converting `pages` pages.
+
+    The deadline assumes the slowest worker, since the task may land on any of
+    them. Returns no options when the page count is unknown, which leaves the
+    global limits of celery_worker in place.
+    """
+    if not pages:
+        return {}
+    if workers is None:
+        workers = worker_throughput()
+    expected = pages / pages_per_second(workers, slowest=True)
+    soft = int(min(max(TIME_LIMIT_OVERHEAD + TIME_LIMIT_FACTOR * expected, MIN_TIME_LIMIT), MAX_TIME_LIMIT))
+    return {"soft_time_limit": soft, "time_limit": soft + TIME_LIMIT_GRACE}
+
+
+def estimate_completion(
+    pages: Optional[int],
+    snapshot: Dict[str, Any],
+    largest: Optional[int] = None,
+    workers: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> dict:
+    """
+    Estimated seconds until a just-submitted conversion of `pages` pages finishes.
+
+    The pages queued ahead (pending pages from the cluster monitor snapshot)
+    are converted by every pool process in parallel at the average rate.
+    The submission itself then spreads over the pool too, but cannot finish
+    before its largest single task (a document, or a shard) does. Priorities
+    and queue routing are not modelled, so this is the estimate for a
+    default-priority submission.
+
+    Args:
+    pages (int): Pages submitted (the sum for a batch); None if unknown.
+    snapshot (dict): The last ClusterMonitor snapshot.
+    largest (int): Pages of the largest task of the submission; defaults to `pages`.
+    workers (dict): Entries from worker_throughput, read from Redis if omitted.
+
+    Returns:
+    dict: estimated_seconds and estimated_completion (Unix time), or nothing if pages is unknown.
+    """
+    if not pages:
+        return {}
+    if workers is None:
+        workers = worker_throughput()
+    rate = pages_per_second(workers)
+    slots = max(snapshot.get("worker_concurrency") or len(workers), 1)
+    # Pending pages include this submission once the monitor has refreshed after it
+    queued = max(snapshot.get("pending_pages", 0) - pages, 0)
+    seconds = queued / (rate * slots) + max(pages / (rate * slots), (largest or pages) / rate)
+    return {"estimated_seconds": round(seconds, 1), "estimated_completion": round(time.time() + seconds, 1)}
+
+
+def wait_timeout(pages: Optional[int], snapshot: Dict[str, Any]) -> float:
+    """
+    How long the API waits on a conversion: its estimated completion plus its deadline.
+    """
+    if not pages:
+        return MAX_TIME_LIMIT + TIME_LIMIT_GRACE
+    workers = worker_throughput()
+    estimate = estimate_completion(pages, snapshot, workers=workers)
+    return estimate["estimated_seconds"] + time_limits(pages, workers)["time_limit"]
@@ -0,0 +1,304 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Dict, List, Optional
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Largest single PDF and largest total upload accepted by one request
+MAX_UPLOAD_BYTES = int(os.environ.get("MARKER_MAX_UPLOAD_BYTES", 512 * 1024**2))
+MAX_REQUEST_BYTES = int(os.environ.get("MARKER_MAX_REQUEST_BYTES", 2 * 1024**3))
+# Directory uploads are spooled to; defaults to the system temp directory
+UPLOAD_DIR = os.environ.get("MARKER_UPLOAD_DIR") or None
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class RequestBudget:
+    """
+    Running total of the bytes received by one request, checked against MAX_REQUEST_BYTES.
+    """
+
+    def __init__(self, max_bytes: int = MAX_REQUEST_BYTES):
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def check_declared(self, content_length: Optional[str]):
+        # A declared Content-Length lets an oversized request be refused before any of it is read
+        if content_length and content_length.isdigit() and self._exceeds(int(content_length)):
+            raise self._too_large()
+
+    def consume(self, size: int):
+        self.used += size
+        if self._exceeds(self.used):
+            raise self._too_large()
+
+    def _exceeds(self, size: int) -> bool:
+        return bool(self.max_bytes) and size > self.max_bytes
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"Request exceeds the upload limit of {self.max_bytes} bytes",
+        )
+
+
+class SpooledUpload:
+    """
+    An uploaded PDF written to a temporary file, with its size and SHA-256.
+
+    Conversions take `path`, so the document is read from disk by the PDF
+    library instead of being held as bytes by the API process.
+    """
+
+    def __init__(self, filename: str, path: str, size: int, sha256: str):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def cleanup(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+
+class _SpoolFile:
+    """
+    One file part being written to a temporary file.
+
+    The parser callbacks only append to `pending`; write() runs in a thread
+    and does the hashing and the writing.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.size = 0
+        self.complete = False
+        self.closed = False
+        self.pending = bytearray()
+        self._digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(prefix="marker-upload-", suffix=".pdf", dir=UPLOAD_DIR)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self):
+        data = bytes(self.pending)
+        self.pending.clear()
+        self._digest.update(data)
+        self._file.write(data)
+        if self.complete:
+            self._file.close()
+            self.closed = True
+
+    def spooled(self) -> SpooledUpload:
+        return SpooledUpload(self.filename, self.path, self.size, self._digest.hexdigest())
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _FieldSpooler:
+    """
+    MultipartParser callbacks collecting the file parts of one form field.
+
+    Parts of other fields are skipped. Per-file limits are checked as the
+    data is parsed, before it is buffered.
+    """
+
+    def __init__(self, field: str, max_files: Optional[int], max_bytes: int):
+        self.field = field
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.files: List[_SpoolFile] = []
+        self.ended = False
+        self._current: Optional[_SpoolFile] = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": lambda data, start, end: self._header_field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._header_value.extend(data[start:end]),
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._current = None
+
+    def _on_header_end(self):
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("utf-8", errors="replace") != self.field:
+            return
+        if b"filename" not in options:
+            raise HTTPException(
+                status_code=422, detail=f"Form field {self.field} must be a file"
+            )
+        if self.max_files is not None and len(self.files) >= self.max_files:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Form field {self.field} accepts at most {self.max_files} file(s)",
+            )
+        self._current = _SpoolFile(options[b"filename"].decode("utf-8", errors="replace"))
+        self.files.append(self._current)
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._current is None:
+            return
+        self._current.size += end - start
+        if self.max_bytes and self._current.size > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{self._current.filename} exceeds the per-file limit of {self.max_bytes} bytes",
+            )
+        self._current.pending.extend(data[start:end])
+
+    def _on_part_end(self):
+        if self._current is not None:
+            self._current.complete = True
+        self._current = None
+
+    def _on_end(self):
+        self.ended = True
+
+    async def flush(self):
+        # Disk writes happen in UPLOAD_CHUNK_BYTES pieces rather than once per network read
+        for file in self.files:
+            if not file.closed and (file.complete or len(file.pending) >= UPLOAD_CHUNK_BYTES):
+                await asyncio.to_thread(file.write)
+
+    def discard(self):
+        for file in self.files:
+            file.discard()
+
+
+async def spool_request(
+    request: Request,
+    field: str,
+    max_files: Optional[int] = None,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    max_request_bytes: int = MAX_REQUEST_BYTES,
+) -> List[SpooledUpload]:
+    """
+    Stream the files of one multipart form field to temporary files as the body arrives.
+
+    The body is parsed straight from request.stream(); declaring the files as
+    UploadFile parameters would have Starlette buffer the whole body before
+    the handler runs, so no limit could apply until the upload was complete.
+    Here a Content-Length over the request limit is refused before anything
+    is read, and the per-file and per-request limits are enforced as bytes
+    arrive. The files of a multipart body come one after another on a single
+    stream, so they are spooled in order, each exactly once.
+
+    Args:
+    request (Request): A multipart/form-data request.
+    field (str): The form field holding the PDFs; other fields are skipped.
+    max_files (int): Most files accepted in the field, if limited.
+    max_bytes (int): Per-file limit (0 disables it).
+    max_request_bytes (int): Limit on the whole body (0 disables it).
+
+    Returns:
+    list: A SpooledUpload per file, in upload order; the caller must clean them up.
+
+    Raises:
+    HTTPException: 413 once a limit is exceeded, 400 for a malformed body and
+    422 if the field holds no file. Files spooled so far are removed.
+    """
+    budget = RequestBudget(max_request_bytes)
+    budget.check_declared(request.headers.get("content-length"))
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+
+    spooler = _FieldSpooler(field, max_files, max_bytes)
+    parser = MultipartParser(params[b"boundary"], spooler.callbacks())
+    try:
+        async for chunk in request.stream():
+            budget.consume(len(chunk))
+            parser.write(chunk)
+            await spooler.flush()
+        parser.finalize()
+        if not spooler.ended:
+            raise HTTPException(status_code=400, detail="Incomplete multipart body")
+        if not spooler.files:
+            raise HTTPException(status_code=422, detail=f"No file in form field {field}")
+    except MultipartParseError as e:
+        spooler.discard()
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {str(e)}")
+    except BaseException:
+        spooler.discard()
+        raise
+    uploads = [file.spooled() for file in spooler.files]
+    for upload in uploads:
+        logger.debug(f"Spooled {upload.filename} ({upload.size} bytes) to {upload.path}")
+    return uploads
+
+
+async def spool_file(request: Request, field: str = "pdf_file") -> SpooledUpload:
+    """
+    Spool the single file of a request with spool_request.
+    """
+    return (await spool_request(request, field, max_files=1))[0]
+
+
+def multipart_body(field: str, multiple: bool = False) -> dict:
+    """
+    `openapi_extra` documenting a file field read by spool_request, which FastAPI cannot see.
+    """
+    schema = {"type": "string", "format": "binary"}
+    if multiple:
+        schema = {"type": "array", "items": schema}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {field: schema},
+                        "required": [field],
+                    }
+                }
+            },
+        }
+    }
+
+
+def cleanup_uploads(uploads: List[SpooledUpload]):
+    for upload in uploads:
+        upload.cleanup()
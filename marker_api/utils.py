@@ -1,10 +1,13 @@
+import os
 import base64
 import torch
 from enum import Enum
 import pynvml
 import io
+import pypdfium2 as pdfium
 from art import text2art
 from PIL import Image
+from typing import Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,25 +18,63 @@ class DeviceType(Enum):
     GPU = "gpu"
 
 
-def process_image_to_base64(image: Image.Image, filename: str) -> str:
+def encode_image(
+    image: Image.Image,
+    image_format: str = "PNG",
+    quality: int = 85,
+    max_dimension: Optional[int] = None,
+) -> bytes:
+    """
+    Encode an image in memory.
+
+    Args:
+    image (PIL.Image.Image): The image to encode.
+    image_format (str): PIL format name, e.g. "PNG", "JPEG" or "WEBP".
+    quality (int): Quality for lossy formats (1-100).
+    max_dimension (int): Downscale so neither side exceeds this many pixels.
+
+    Returns:
+    bytes: The encoded image.
+    """
+    if max_dimension and max(image.size) > max_dimension:
+        image = image.copy()
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    img_byte_arr = io.BytesIO()
+    if image_format == "PNG":
+        image.save(img_byte_arr, format="PNG", optimize=False)
+    else:
+        image.save(img_byte_arr, format=image_format, quality=quality)
+    return img_byte_arr.getvalue()
+
+
+def process_image_to_base64(
+    image: Image.Image,
+    filename: str,
+    image_format: str = "PNG",
+    quality: int = 85,
+    max_dimension: Optional[int] = None,
+) -> str:
     """
     Process an image and convert it to base64.
 
     Args:
     image (PIL.Image.Image): The image to process.
-    filename (str): The filename to use for the temporary file.
+    filename (str): The image name, used for error reporting.
+    image_format (str): PIL format name, e.g. "PNG", "JPEG" or "WEBP".
+    quality (int): Quality for lossy formats (1-100).
+    max_dimension (int): Downscale so neither side exceeds this many pixels.
 
     Returns:
     str: The base64 encoded string of the image.
     """
     try:
-        # Save image as PNG in memory
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format="PNG")
-        img_byte_arr = img_byte_arr.getvalue()
+        img_bytes = encode_image(image, image_format, quality, max_dimension)
 
         # Convert image to base64
-        image_base64 = base64.b64encode(img_byte_arr).decode("utf-8")
+        image_base64 = base64.b64encode(img_bytes).decode("utf-8")
 
         return image_base64
     except Exception as e:
@@ -41,6 +82,23 @@ def process_image_to_base64(image: Image.Image, filename: str) -> str:
         return ""
 
 
+def get_page_count(pdf_file: Union[bytes, str]) -> int:
+    """
+    Count the pages of a PDF without rendering or extracting anything.
+
+    Args:
+    pdf_file (bytes or str): The PDF content or a path to it.
+
+    Returns:
+    int: The number of pages.
+    """
+    doc = pdfium.PdfDocument(pdf_file)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
 def get_ram_available():
     """
     Function to get VRAM/RAM availability on device
@@ -68,11 +126,119 @@ def get_ram_available():
         return DeviceType.GPU, ram_available
 
     else:
-        # For CPU, use torch's built-in method to get total RAM available
-        ram_available = torch.cuda.memory_reserved() // (1024**2)  # Convert bytes to MB
+        # For CPU, read the free system memory
+        ram_available = get_system_ram_available() // (1024**2)  # Convert bytes to MB
         return DeviceType.CPU, ram_available
 
 
+def get_system_ram_available() -> int:
+    """
+    Function to get the memory in bytes that can be allocated without swapping
+
+    Reads MemAvailable from /proc/meminfo, falling back to free physical pages
+    on systems without procfs. Inside a container the cgroup memory limit is
+    applied as well, since /proc/meminfo describes the whole host.
+    """
+    available = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024  # Value is in kB
+                    break
+    except OSError:
+        pass
+    if available is None:
+        available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    cgroup_available = get_cgroup_ram_available()
+    if cgroup_available is not None:
+        available = min(available, cgroup_available)
+    return available
+
+
+def _read_cgroup_value(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def _read_cgroup_stat(path: str, field: str) -> int:
+    try:
+        with open(path) as f:
+            for line in f:
+                name, value = line.split()
+                if name == field:
+                    return int(value)
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def get_cgroup_ram_available() -> Optional[int]:
+    """
+    Function to get the memory in bytes left under this container's cgroup limit
+
+    Reclaimable page cache (inactive files) does not count as used. Returns
+    None when there is no cgroup memory limit (cgroup v2 or v1).
+    """
+    for limit_file, usage_file, stat_file, cache_field in (
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current",
+         "/sys/fs/cgroup/memory.stat", "inactive_file"),
+        ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes",
+         "/sys/fs/cgroup/memory/memory.stat", "total_inactive_file"),
+    ):
+        limit = _read_cgroup_value(limit_file)
+        usage = _read_cgroup_value(usage_file)
+        # cgroup v1 reports "no limit" as a huge number
+        if limit is None or usage is None or limit >= 2**60:
+            continue
+        used = usage - _read_cgroup_stat(stat_file, cache_field)
+        return max(0, limit - used)
+    return None
+
+
+def get_process_private_memory(pid: int) -> int:
+    """
+    Function to get the memory in bytes used by a process alone
+
+    Sums the private pages from /proc/<pid>/smaps_rollup, so model weights
+    shared copy-on-write with the parent are not counted. Returns 0 when
+    the process is gone or procfs is unavailable.
+    """
+    total = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    total += int(line.split()[1]) * 1024  # Value is in kB
+    except OSError:
+        return 0
+    return total
+
+
+def get_gpu_process_memory() -> dict:
+    """
+    Function to get the VRAM in bytes used by each process on the first GPU
+
+    Returns an empty dict when NVML is unavailable.
+    """
+    try:
+        pynvml.nvmlInit()
+    except Exception:
+        return {}
+    try:
+        handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+        return {
+            process.pid: process.usedGpuMemory or 0
+            for process in pynvml.nvmlDeviceGetComputeRunningProcesses(handle)
+        }
+    finally:
+        pynvml.nvmlShutdown()
+
+
 # # Example usage:
 # device_type, ram_available = get_ram_available()
 # print(f"Device Type: {device_type}, Available RAM: {ram_available} MB")
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+import redis.asyncio as aioredis
+from celery.states import READY_STATES
+from marker_api.celery_worker import celery_app
+
+logger = logging.getLogger(__name__)
+
+# How often waiting tasks are re-checked directly, in case a notification was missed
+RECHECK_INTERVAL = 30
+RECONNECT_DELAY = 1
+
+
+class TaskWaiter:
+    """
+    Resolves asyncio futures when Celery tasks finish, from result-backend notifications.
+
+    The Redis result backend publishes every stored result on a channel named
+    after its key (celery-task-meta-<task_id>). One listener per API process
+    pattern-subscribes to those channels, so a waiting request learns about
+    completion within milliseconds and no request polls Redis. Pending tasks
+    are also re-checked after a reconnect and every RECHECK_INTERVAL seconds,
+    so a missed message only delays a result instead of losing it.
+    """
+
+    def __init__(self, app=celery_app):
+        self.app = app
+        self.prefix = app.backend.task_keyprefix.decode()
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._client: Optional[aioredis.Redis] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._rechecker: Optional[asyncio.Task] = None
+
+    def _ensure_started(self):
+        if self._listener is None or self._listener.done():
+            if self._client is None:
+                self._client = aioredis.Redis.from_url(self.app.conf.result_backend)
+            self._listener = asyncio.create_task(self._listen())
+            self._rechecker = asyncio.create_task(self._recheck_periodically())
+
+    async def stop(self):
+        for task in (self._listener, self._rechecker):
+            if task is not None:
+                task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+        self._listener = self._rechecker = self._client = None
+
+    def _decode(self, payload) -> Optional[dict]:
+        backend = self.app.backend
+        return backend.meta_from_decoded(backend.decode_result(payload))
+
+    def _resolve(self, task_id: str, meta: dict):
+        if meta.get("status") not in READY_STATES:
+            return
+        for future in self._waiters.pop(task_id, []):
+            if not future.done():
+                future.set_result(meta)
+
+    async def _check(self, task_ids: List[str]):
+        if not task_ids:
+            return
+        payloads = await self._client.mget([f"{self.prefix}{task_id}" for task_id in task_ids])
+        for task_id, payload in zip(task_ids, payloads):
+            if payload is not None:
+                self._resolve(task_id, self._decode(payload))
+
+    async def _listen(self):
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.prefix}*")
+                # Anything that finished while we were (re)connecting
+                await self._check(list(self._waiters))
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    task_id = message["channel"].decode()[len(self.prefix):]
+                    if task_id in self._waiters:
+                        self._resolve(task_id, self._decode(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Task notification listener disconnected: {str(e)}")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+
+    async def _recheck_periodically(self):
+        while True:
+            await asyncio.sleep(RECHECK_INTERVAL)
+            try:
+                await self._check(list(self._waiters))
+            except Exception as e:
+                logger.warning(f"Could not re-check waiting tasks: {str(e)}")
+
+    async def wait(self, task_id: str, timeout: Optional[float] = None) -> dict:
+        """
+        Wait until a task is ready and return its result meta (status, result, ...).
+
+        For a failed task, `result` is the exception. Raises asyncio.TimeoutError
+        after `timeout` seconds.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, []).append(future)
+        try:
+            # The task may have finished before we started listening for it
+            await self._check([task_id])
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters is not None and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[task_id]
+
+
+task_waiter = TaskWaiter()
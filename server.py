@@ -1,26 +1,54 @@
 import os
+import time
 import asyncio
 import argparse
-from fastapi import FastAPI, UploadFile, File
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-import concurrent.futures
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import List, Optional
 from marker.logger import configure_logging  # Import logging configuration
-from marker.models import load_all_models  # Import function to load models
 from marker_api.routes import (
+    assemble_sharded_result,
+    convert_pdf_shard,
+    lookup_cached_result,
     process_pdf_file,
 )
+from marker_api.sharding import plan_document, resolve_shard_pages
+from marker_api.batching import enable_micro_batching
+from marker_api.cache import conversion_cache
+from marker_api.image_store import (
+    build_zip_bundle,
+    externalize_images,
+    image_response,
+)
+from marker_api.executor import (
+    QueueFullError,
+    build_executor_from_env,
+    default_concurrency,
+)
 from marker_api.utils import print_markerapi_text_art
 from contextlib import asynccontextmanager
 import logging
-import gradio as gr
 from marker_api.model.schema import (
-    BatchConversionResponse,
+    CacheStatsResponse,
     ConversionResponse,
     HealthResponse,
+    ImageMode,
+    ImageOptions,
+    ReadyResponse,
     ServerType,
+    SimpleBatchConversionResponse,
+    StreamFormat,
 )
-from marker_api.demo import demo_ui
+from marker_api.streaming import STREAM_MEDIA_TYPES, stream_as_completed
+from marker_api.uploads import (
+    SpooledUpload,
+    cleanup_uploads,
+    multipart_body,
+    spool_file,
+    spool_request,
+)
+from marker_api.startup import FAST_START, ModelLoader, mount_demo_ui
 
 # Initialize logging
 configure_logging()
@@ -29,15 +57,35 @@ logger = logging.getLogger(__name__)
 # Global variable to hold model list
 model_list = None
 
+# Shared executor that runs every conversion against the single model list
+inference_executor = build_executor_from_env()
+
+
+def on_models_loaded(models):
+    global model_list
+    # Concurrent conversions share detection/layout forward passes
+    model_list = enable_micro_batching(models, lambda: inference_executor.running)
+    # Size concurrency from the memory left once the models are resident
+    inference_executor.set_max_concurrency(default_concurrency())
+
+
+model_loader = ModelLoader(on_loaded=on_models_loaded)
+
 
 # Event that runs on startup to load all models
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global model_list
     logger.debug("--------------------- Loading OCR Model -----------------------")
     print_markerapi_text_art()
-    model_list = load_all_models()
+    if FAST_START:
+        # Serve /health right away; /ready turns 200 once the models are in
+        model_loader.start()
+    else:
+        await asyncio.to_thread(model_loader.load)
+        if not model_loader.ready:
+            raise RuntimeError(f"Model loading failed: {model_loader.error}")
     yield
+    inference_executor.shutdown(wait=False)
 
 
 # Initialize FastAPI app
@@ -52,50 +100,283 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-app = gr.mount_gradio_app(app, demo_ui, path="")
-
 
 @app.get("/health", response_model=HealthResponse)
 def server():
     """
     Root endpoint to check server status.
+
+    Used as the liveness probe: answers as soon as the process serves HTTP.
     """
     return HealthResponse(message="Welcome to Marker-api", type=ServerType.simple)
 
 
+@app.get("/ready", response_model=ReadyResponse)
+def ready():
+    """
+    Readiness probe: 200 once the models are loaded, 503 with load progress until then.
+    """
+    progress = ReadyResponse(**model_loader.progress())
+    if not progress.ready:
+        return JSONResponse(status_code=503, content=progress.model_dump())
+    return progress
+
+
+@app.get("/cache/stats", response_model=CacheStatsResponse)
+def cache_stats():
+    """
+    Hit/miss/eviction counters of the conversion result cache.
+    """
+    return CacheStatsResponse(**conversion_cache.stats())
+
+
+@app.get("/images/{sha256}")
+def get_image(sha256: str):
+    """
+    Serve an image referenced by a result converted with image_mode=reference.
+    """
+    return image_response(sha256)
+
+
+def busy_response(error: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry later",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def require_models():
+    """
+    Reject conversions with 503 while the models are still loading in the background.
+    """
+    if model_list is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Models are not loaded yet ({model_loader.status})",
+            headers={"Retry-After": "10"},
+        )
+
+
+async def convert_sharded(
+    file: str, filename: str, shards, image_options: ImageOptions, cache_key: str
+):
+    """
+    Convert the shards of one document concurrently on the inference executor and merge them.
+    """
+    entry_time = time.time()
+    logger.info(f"Converting {filename} as {len(shards)} shards")
+    document_group = object()
+    shard_outputs = await asyncio.gather(
+        *(
+            inference_executor.submit(
+                convert_pdf_shard,
+                file,
+                model_list,
+                start_page,
+                max_pages,
+                group=document_group,
+            )
+            for start_page, max_pages in shards
+        )
+    )
+    return await asyncio.to_thread(
+        assemble_sharded_result,
+        filename,
+        shard_outputs,
+        image_options,
+        cache_key,
+        entry_time,
+    )
+
+
+async def package_results(results: List[dict], image_mode: ImageMode, single: bool):
+    """
+    Deliver images inline, as blob references, or as a ZIP bundle with the JSON.
+    """
+    if image_mode == ImageMode.zip:
+        bundle = await asyncio.to_thread(build_zip_bundle, results, single)
+        return Response(content=bundle, media_type="application/zip")
+    if image_mode == ImageMode.reference:
+        results = await asyncio.to_thread(
+            lambda: [externalize_images(result) for result in results]
+        )
+    if single:
+        return ConversionResponse(status="Success", result=results[0])
+    return SimpleBatchConversionResponse(status="Success", results=results)
+
+
 # Endpoint to convert a single PDF to markdown
-@app.post("/convert", response_model=ConversionResponse)
-async def convert_pdf_to_markdown(pdf_file: UploadFile):
+@app.post(
+    "/convert", response_model=ConversionResponse, openapi_extra=multipart_body("pdf_file")
+)
+async def convert_pdf_to_markdown(
+    request: Request,
+    image_options: ImageOptions = Depends(),
+    shard_pages: Optional[int] = None,
+    image_mode: ImageMode = ImageMode.inline,
+):
     """
     Endpoint to convert a single PDF to markdown.
+
+    With `shard_pages` (or MARKER_SHARD_PAGES) set, documents longer than that
+    are split into page ranges that are converted concurrently and merged.
+    `image_mode=reference` returns images as GET /images/{sha256} references
+    and `image_mode=zip` returns a ZIP of result.json plus the image files.
+    The upload (form field `pdf_file`) is spooled to disk as it arrives; files
+    over MARKER_MAX_UPLOAD_BYTES get 413 without being read to the end.
     """
-    logger.debug(f"Received file: {pdf_file.filename}")
-    file = await pdf_file.read()
-    response = process_pdf_file(file, pdf_file.filename, model_list)
-    return ConversionResponse(status="Success", result=response)
+    require_models()
+    upload = await spool_file(request)
+    logger.debug(f"Received file: {upload.filename}")
+    try:
+        response = await convert_spooled(upload, image_options, shard_pages)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting {upload.filename}: {str(e)}")
+        raise busy_response(e)
+    finally:
+        upload.cleanup()
+    return await package_results([response], image_mode, single=True)
+
+
+async def convert_spooled(
+    upload: SpooledUpload, image_options: ImageOptions, shard_pages: Optional[int]
+):
+    """
+    Convert one spooled upload, from the cache, as shards, or as a whole document.
+    """
+    shard_pages = resolve_shard_pages(shard_pages)
+    shards = None
+    # Without sharding the document is not opened here, so a cache hit never touches it
+    if shard_pages:
+        _, shards = await asyncio.to_thread(plan_document, upload.path, shard_pages)
+    cache_key, cached = await asyncio.to_thread(
+        lookup_cached_result,
+        upload.sha256,
+        upload.filename,
+        image_options,
+        shard_pages if shards else 0,
+    )
+    if cached is not None:
+        return cached
+    if shards:
+        return await convert_sharded(
+            upload.path, upload.filename, shards, image_options, cache_key
+        )
+    return await inference_executor.submit(
+        process_pdf_file,
+        upload.path,
+        upload.filename,
+        model_list,
+        cache_key,
+        image_options,
+    )
+
+
+async def schedule_batch(
+    uploads: List[SpooledUpload], image_options: ImageOptions
+) -> List[asyncio.Future]:
+    """
+    Queue every file of a batch on the inference executor as one group.
+
+    Cached documents resolve immediately. Each spooled file is removed as soon
+    as its conversion settles. Raises QueueFullError before anything is queued
+    if the executor cannot admit the batch.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        lookups = await asyncio.to_thread(
+            lambda: [
+                lookup_cached_result(upload.sha256, upload.filename, image_options)
+                for upload in uploads
+            ]
+        )
+    except BaseException:
+        cleanup_uploads(uploads)
+        raise
+
+    batch_group = object()
+    futures = []
+    for upload, (cache_key, cached) in zip(uploads, lookups):
+        if cached is not None:
+            future = loop.create_future()
+            future.set_result(cached)
+        else:
+            future = asyncio.ensure_future(
+                inference_executor.submit(
+                    process_pdf_file,
+                    upload.path,
+                    upload.filename,
+                    model_list,
+                    cache_key,
+                    image_options,
+                    group=batch_group,
+                )
+            )
+        future.add_done_callback(lambda _, upload=upload: upload.cleanup())
+        futures.append(future)
+
+    # Let the submissions reach the executor so an admission failure surfaces here
+    await asyncio.sleep(0)
+    for future in futures:
+        if future.done() and isinstance(future.exception(), QueueFullError):
+            for other in futures:
+                other.cancel()
+            raise future.exception()
+    return futures
 
 
 # Endpoint to convert multiple PDFs to markdown
-@app.post("/batch_convert", response_model=BatchConversionResponse)
-async def convert_pdfs_to_markdown(pdf_files: List[UploadFile] = File(...)):
+@app.post(
+    "/batch_convert",
+    response_model=SimpleBatchConversionResponse,
+    openapi_extra=multipart_body("pdf_files", multiple=True),
+)
+async def convert_pdfs_to_markdown(
+    request: Request,
+    image_options: ImageOptions = Depends(),
+    stream: Optional[StreamFormat] = None,
+    image_mode: ImageMode = ImageMode.inline,
+):
     """
     Endpoint to convert multiple PDFs to markdown.
+
+    Files are scheduled on the shared inference executor as one group, so the
+    batch takes turns with other requests instead of running beside them.
+    Uploads (form field `pdf_files`) are spooled to disk as they arrive, under
+    MARKER_MAX_UPLOAD_BYTES per file and MARKER_MAX_REQUEST_BYTES per request;
+    larger uploads get 413.
+    With `stream=ndjson` or `stream=sse` each document is sent as soon as it
+    finishes, followed by a summary event, instead of one response at the end.
+    `image_mode` works as on /convert; zip cannot be combined with streaming.
     """
-    logger.debug(f"Received {len(pdf_files)} files for batch conversion")
+    require_models()
+    if stream is not None and image_mode == ImageMode.zip:
+        raise HTTPException(
+            status_code=400, detail="image_mode=zip cannot be streamed"
+        )
+    uploads = await spool_request(request, "pdf_files")
+    logger.debug(f"Received {len(uploads)} files for batch conversion")
+    filenames = [upload.filename for upload in uploads]
+    try:
+        futures = await schedule_batch(uploads, image_options)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting batch of {len(uploads)} files: {str(e)}")
+        raise busy_response(e)
+
+    if stream is not None:
+        transform = externalize_images if image_mode == ImageMode.reference else None
+        return StreamingResponse(
+            stream_as_completed(futures, filenames, stream, transform),
+            media_type=STREAM_MEDIA_TYPES[stream],
+        )
+
+    responses = await asyncio.gather(*futures)
+    return await package_results(list(responses), image_mode, single=False)
 
-    async def process_files(files):
-        loop = asyncio.get_event_loop()
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
-            coroutines = [
-                loop.run_in_executor(
-                    pool, process_pdf_file, await file.read(), file.filename, model_list
-                )
-                for file in files
-            ]
-            return await asyncio.gather(*coroutines)
 
-    responses = await process_files(pdf_files)
-    return BatchConversionResponse(results=responses)
+# Mounted last: the demo is served at "/" and must not shadow the API routes
+mount_demo_ui(app)
 
 
 # Main function to run the server
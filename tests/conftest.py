@@ -0,0 +1,17 @@
+import fakeredis
+import pytest
+from celery.backends.redis import RedisBackend
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """
+    An in-memory Redis behind the Celery result backend, for code that uses
+    celery_app.backend.client (single-flight, cancellation, checkpoints, ...).
+    """
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(RedisBackend, "client", property(lambda self: client))
+    from marker_api.celery_worker import celery_app
+
+    monkeypatch.setattr(celery_app.conf, "broker_url", "memory://")
+    return client
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("marker")
+
+from celery.states import SUCCESS
+from marker_api import celery_routes
+from marker_api.celery_routes import batch_page, record_completions, submit_batch
+from marker_api.celery_worker import celery_app
+
+
+def test_batch_page_without_paging_returns_everything():
+    log = [(3, 10.0), (1, 11.0)]
+    assert batch_page(log) == (log, 2)
+
+
+def test_batch_page_cursor_and_limit():
+    log = [(3, 10.0), (1, 11.0), (0, 12.0), (2, 13.0)]
+    page, cursor = batch_page(log, cursor=0, limit=2)
+    assert page == [(3, 10.0), (1, 11.0)]
+    page, cursor = batch_page(log, cursor=cursor, limit=2)
+    assert page == [(0, 12.0), (2, 13.0)]
+    assert batch_page(log, cursor=cursor, limit=2) == ([], 4)
+
+
+def test_batch_page_since_skips_older_completions():
+    log = [(3, 10.0), (1, 11.0), (0, 12.0)]
+    page, cursor = batch_page(log, since=10.5)
+    assert page == [(1, 11.0), (0, 12.0)]
+    assert cursor == 3
+
+
+def test_completion_log_is_append_only(redis_client):
+    done = {"status": SUCCESS}
+    assert [index for index, _ in record_completions("b1", [None, done, None])] == [1]
+    log = record_completions("b1", [done, done, done])
+    # Documents seen finishing later land after the cursors already handed out
+    assert [index for index, _ in log] == [1, 0, 2]
+    assert record_completions("b1", [done, done, done]) == log
+
+
+def test_batch_result_pages_in_completion_order(redis_client):
+    documents = [
+        (f"d{i}.pdf", {"claim_check": "fs", "key": f"k{i}", "size": 1}, None, 1, None)
+        for i in range(3)
+    ]
+    batch = submit_batch(documents, {})
+    task_ids = [child.id for child in batch.results]
+
+    def finish(index):
+        celery_app.backend.store_result(
+            task_ids[index], {"filename": f"d{index}.pdf", "markdown": "m", "status": "ok"}, SUCCESS
+        )
+
+    def fetch(**paging):
+        response = asyncio.run(celery_routes.celery_batch_result(batch.id, **paging))
+        return json.loads(response.body)
+
+    finish(2)
+    first = fetch(cursor=0)
+    assert [result["index"] for result in first["results"]] == [2]
+    assert first["has_more"] is False
+
+    finish(0)
+    second = fetch(cursor=first["next_cursor"])
+    assert [result["index"] for result in second["results"]] == [0]
+    assert second["completed"] == 2
+
+    finish(1)
+    everything = fetch()
+    assert [result["filename"] for result in everything["results"]] == ["d0.pdf", "d1.pdf", "d2.pdf"]
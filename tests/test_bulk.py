@@ -0,0 +1,127 @@
+import time
+import pytest
+from fastapi import HTTPException
+
+pytest.importorskip("marker")
+
+from celery.states import REVOKED, SUCCESS
+from marker_api import bulk
+from marker_api.bulk import DONE, FAILED, PENDING, QUEUED, RUNNING, BulkJobRunner, BulkJobStore
+from marker_api.celery_worker import celery_app
+
+OPTIONS = {"image_options": {}, "priority": None, "max_in_flight": 2, "recursive": True}
+
+
+@pytest.fixture
+def job(tmp_path, redis_client, monkeypatch):
+    source = tmp_path / "src"
+    source.mkdir()
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        (source / name).write_bytes(f"%PDF-{name}".encode())
+    monkeypatch.setattr(bulk, "BULK_ROOT", str(tmp_path))
+    monkeypatch.setattr(bulk, "plan_document", lambda path: (1, None))
+    monkeypatch.setattr(
+        bulk.claim_check_store, "put_file", lambda path: {"claim_check": "fs", "key": path, "size": 1}
+    )
+    store = BulkJobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create_job("job-1", str(source), "directory", str(tmp_path / "out"), OPTIONS)
+    return store
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def finish_queued(store):
+    for row in store.files("job-1", QUEUED):
+        celery_app.backend.store_result(
+            row["task_id"], {"filename": "f", "markdown": "# done", "metadata": {"pages": 1}, "status": "ok"}, SUCCESS
+        )
+
+
+def test_lost_task_is_queued_again_as_a_new_task(job, monkeypatch):
+    runner = BulkJobRunner(job, poll_interval=0.05)
+    runner._fill("job-1", OPTIONS, bulk.enumerate_source(job.get_job("job-1")["source"], "directory"), 0)
+    lost = job.files("job-1", QUEUED)[0]
+
+    monkeypatch.setattr(bulk, "MIN_TIME_LIMIT", 0)
+    monkeypatch.setattr(bulk, "wait_timeout", lambda pages, snapshot: 0)
+    runner._check_lost("job-1", lost)
+    assert celery_app.backend.get_task_meta(lost["task_id"], cache=False)["status"] == REVOKED
+    assert job.files("job-1", PENDING)[0]["path"] == lost["path"]
+
+    runner._fill("job-1", OPTIONS, None, 2)
+    requeued = {row["path"]: row for row in job.files("job-1", QUEUED)}[lost["path"]]
+    # Not attached to the lost task through its single-flight key
+    assert requeued["task_id"] != lost["task_id"]
+    assert requeued["attempts"] == 2
+
+
+def test_stop_releases_leases_and_another_runner_resumes(job):
+    first = BulkJobRunner(job, poll_interval=0.05)
+    first.owner = "old-host:1"
+    assert first.start("job-1")
+    wait_for(lambda: job.count("job-1", QUEUED) == 2)
+
+    second = BulkJobRunner(job, poll_interval=0.05)
+    second.owner = "new-host:2"
+    second.watch(interval=0.05)
+    time.sleep(0.2)
+    # The lease is live, so the new runner waits
+    assert job.get_job("job-1")["owner"] == "old-host:1"
+
+    first.stop()
+    assert not any(thread.is_alive() for thread in first._threads.values())
+    wait_for(lambda: job.get_job("job-1")["owner"] == "new-host:2")
+
+    finish_queued(job)
+    wait_for(lambda: job.count("job-1", QUEUED) == 1 and job.count("job-1", DONE) == 2)
+    finish_queued(job)
+    wait_for(lambda: job.get_job("job-1")["status"] != RUNNING)
+    second.stop()
+
+    assert job.get_job("job-1")["status"] == "completed"
+    assert job.get_job("job-1")["owner"] is None
+    assert job.count("job-1", DONE) == 3
+
+
+def test_paths_need_the_bulk_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_ROOT", None)
+    with pytest.raises(HTTPException) as error:
+        bulk.resolve_path(str(tmp_path))
+    assert error.value.status_code == 403
+
+    monkeypatch.setattr(bulk, "BULK_ROOT", str(tmp_path / "root"))
+    assert bulk.resolve_path(str(tmp_path / "root" / "a")) == str(tmp_path / "root" / "a")
+    with pytest.raises(HTTPException) as error:
+        bulk.resolve_path(str(tmp_path / "root" / ".." / "other"))
+    assert error.value.status_code == 400
+
+
+def test_manifest_entries_outside_the_root_fail(job, tmp_path):
+    outside = tmp_path.parent / "outside.pdf"
+    runner = BulkJobRunner(job, poll_interval=0.05)
+    runner._fill("job-1", OPTIONS, iter([str(outside)]), 0)
+
+    failed = job.files("job-1", FAILED)
+    assert [row["path"] for row in failed] == [str(outside)]
+    assert failed[0]["error"] == "Outside MARKER_BULK_ROOT"
+
+
+def test_failed_submission_releases_the_stored_document(job, monkeypatch):
+    released = []
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(bulk, "submit_conversion", broker_down)
+    monkeypatch.setattr(bulk, "release_payload", released.append)
+    runner = BulkJobRunner(job, poll_interval=0.05)
+    with pytest.raises(ConnectionError):
+        runner._fill("job-1", OPTIONS, bulk.enumerate_source(job.get_job("job-1")["source"], "directory"), 0)
+
+    path = job.files("job-1", PENDING)[0]["path"]
+    assert released == [{"claim_check": "fs", "key": path, "size": 1}]
@@ -0,0 +1,64 @@
+import os
+import time
+from marker_api.cache import ByteLRU, ConversionCache, DiskStore, make_cache_key
+
+
+def test_byte_lru_evicts_least_recently_used():
+    lru = ByteLRU(10)
+    lru.put("a", b"aaaa")
+    lru.put("b", b"bbbb")
+    # Reading "a" makes "b" the oldest entry
+    assert lru.get("a") == b"aaaa"
+    lru.put("c", b"cccc")
+
+    assert lru.get("b") is None
+    assert lru.get("a") == b"aaaa"
+    assert lru.get("c") == b"cccc"
+    assert lru.current_bytes == 8
+    assert lru.evictions == 1
+
+
+def test_byte_lru_replaces_and_rejects_oversized():
+    lru = ByteLRU(10)
+    lru.put("a", b"aaaaaa")
+    lru.put("a", b"aa")
+    assert lru.current_bytes == 2
+    assert len(lru) == 1
+
+    assert lru.put("big", b"x" * 11) is False
+    assert lru.get("big") is None
+    assert lru.get("a") == b"aa"
+
+
+def test_disk_store_evicts_by_access_time(tmp_path):
+    store = DiskStore(str(tmp_path), 10)
+    store.put("aa1", b"1111")
+    store.put("bb2", b"2222")
+    old = time.time() - 60
+    os.utime(store._path("aa1"), (old, old))
+    os.utime(store._path("bb2"), (old - 60, old - 60))
+    # "aa1" was read last, so "bb2" goes first
+    assert store.get("aa1") == b"1111"
+    store.put("cc3", b"3333")
+
+    assert store.get("bb2") is None
+    assert store.get("aa1") == b"1111"
+    assert store.current_bytes == 8
+    assert store.evictions == 1
+
+
+def test_conversion_cache_counts_hits_and_promotes(tmp_path):
+    cache = ConversionCache(1024, str(tmp_path), 1024)
+    key = make_cache_key("abc", {"extract_images": True})
+    assert key != make_cache_key("abc", {"extract_images": False})
+
+    assert cache.get(key) is None
+    cache.put(key, {"markdown": "# Title"})
+    cache.memory = ByteLRU(1024)
+    assert cache.get(key) == {"markdown": "# Title"}
+    assert cache.get(key) == {"markdown": "# Title"}
+
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import pytest
+from celery.states import REVOKED, SUCCESS
+from marker_api.cancellation import TaskCancelled, abort_if_cancelled, cancel_tasks, is_cancelled
+from marker_api.celery_worker import celery_app
+from marker_api.single_flight import claim, find_inflight, single_flight_key
+
+
+def status(task_id):
+    return celery_app.backend.get_task_meta(task_id, cache=False)["status"]
+
+
+def test_cancel_flags_and_revokes_unfinished_tasks(redis_client):
+    celery_app.backend.store_result("done", {"markdown": "m"}, SUCCESS)
+
+    assert cancel_tasks(["running", "done"]) == ["running"]
+    assert status("running") == REVOKED
+    assert status("done") == SUCCESS
+    assert is_cancelled("running")
+    assert not is_cancelled("done", None)
+
+
+def test_abort_checks_the_task_and_its_document(redis_client):
+    cancel_tasks(["document"])
+    abort_if_cancelled("shard", None)
+    with pytest.raises(TaskCancelled):
+        abort_if_cancelled("shard", "document")
+
+
+def test_cancel_frees_the_single_flight_key(redis_client):
+    key = single_flight_key("abc")
+    claim(key, "task-1")
+    cancel_tasks(["task-1"])
+
+    assert find_inflight(key) is None
+    assert claim(key, "task-2") is None
+
+
+def test_timeout_only_cancels_an_unshared_task(redis_client, monkeypatch, tmp_path):
+    pytest.importorskip("marker")
+    from marker_api import celery_routes
+
+    async def never_finishes(task_id, timeout=None):
+        await asyncio.sleep(3600)
+
+    key = single_flight_key("abc")
+    monkeypatch.setattr(celery_routes, "conversion_key", lambda *args: key)
+    monkeypatch.setattr(celery_routes, "plan_document", lambda *args: (1, None))
+    monkeypatch.setattr(celery_routes, "sha256_file", lambda path: "abc")
+    monkeypatch.setattr(celery_routes, "wait_timeout", lambda *args: 0.05)
+    monkeypatch.setattr(celery_routes, "release_payload", lambda ref: None)
+    monkeypatch.setattr(celery_routes.task_waiter, "wait", never_finishes)
+    monkeypatch.setattr(
+        celery_routes.claim_check_store,
+        "put_file",
+        lambda path: {"claim_check": "fs", "key": "k", "size": 1},
+    )
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF")
+
+    def convert():
+        response = asyncio.run(celery_routes.celery_convert_pdf_concurrent_await(str(pdf)))
+        assert response.status_code == 408
+        return json.loads(response.body)["task_id"]
+
+    # Another submission of the same document is still waiting on this task
+    claim(key, "shared", waiting=True)
+    assert convert() == "shared"
+    assert status("shared") != REVOKED
+
+    # Nobody else waits on a fresh submission, so the timeout cancels it
+    redis_client.delete(key)
+    alone = convert()
+    assert alone != "shared"
+    assert status(alone) == REVOKED
+
+
+def test_cancel_endpoint_leaves_a_task_other_requests_await(redis_client):
+    pytest.importorskip("marker")
+    from marker_api import celery_routes
+
+    claim(single_flight_key("abc"), "shared", waiting=True)
+    claim(single_flight_key("def"), "polled")
+
+    response = asyncio.run(celery_routes.cancel_conversion("shared"))
+    assert response["status"] == "Shared"
+    assert status("shared") != REVOKED
+    assert find_inflight(single_flight_key("abc")) == "shared"
+
+    response = asyncio.run(celery_routes.cancel_conversion("polled"))
+    assert response == {"task_id": "polled", "status": "Cancelled", "cancelled": 1, "shared": 0}
+    assert status("polled") == REVOKED
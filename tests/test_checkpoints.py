@@ -0,0 +1,97 @@
+import os
+import pytest
+from marker_api import claim_check
+from marker_api.checkpoints import clear_checkpoints, load_checkpoints, save_checkpoint
+from marker_api.claim_check import FilesystemClaimCheckStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = FilesystemClaimCheckStore(str(tmp_path), ttl=3600)
+    monkeypatch.setattr(claim_check, "claim_check_store", store)
+    return store
+
+
+def test_checkpoints_round_trip_and_clear(redis_client, store, monkeypatch):
+    monkeypatch.setattr(claim_check, "RESULT_THRESHOLD_BYTES", 16)
+    small = {"markdown": "a", "images": {}, "metadata": {}}
+    large = {"markdown": "b" * 100, "images": {}, "metadata": {}}
+    save_checkpoint("task-1", 0, small)
+    save_checkpoint("task-1", 20, large)
+
+    assert load_checkpoints("task-1") == {0: small, 20: large}
+    assert load_checkpoints("task-2") == {}
+    assert redis_client.ttl("marker:checkpoint:task-1") > 0
+
+    clear_checkpoints("task-1")
+    assert load_checkpoints("task-1") == {}
+    # The stored chunk output is deleted with its checkpoint
+    assert [name for _, _, names in os.walk(store.directory) for name in names] == []
+
+
+def test_retry_resumes_from_the_last_checkpoint(redis_client, store, monkeypatch):
+    pytest.importorskip("marker")
+    from marker_api import celery_tasks
+
+    calls = []
+    failures = [6]
+
+    def convert(pdf_file, start_page=0, max_pages=None):
+        calls.append(start_page)
+        if start_page in failures:
+            failures.remove(start_page)
+            raise RuntimeError("worker lost")
+        return f"page {start_page}", {}, {"pages": max_pages}
+
+    monkeypatch.setattr(celery_tasks, "CHECKPOINT_PAGES", 3)
+    monkeypatch.setattr(celery_tasks, "get_page_count", lambda path: 8)
+    monkeypatch.setattr(celery_tasks, "timed_convert", convert)
+
+    with pytest.raises(RuntimeError):
+        celery_tasks.convert_pages("task-1", "/doc.pdf", "doc.pdf")
+    assert calls == [0, 3, 6]
+
+    markdown, _, metadata = celery_tasks.convert_pages("task-1", "/doc.pdf", "doc.pdf")
+    # Only the chunk that failed is converted again
+    assert calls == [0, 3, 6, 6]
+    assert markdown == "page 0\n\npage 3\n\npage 6"
+    assert metadata["pages"] == 8
+
+
+def test_conversions_without_task_id_are_not_checkpointed(redis_client, store, monkeypatch):
+    pytest.importorskip("marker")
+    from marker_api import celery_tasks
+
+    monkeypatch.setattr(celery_tasks, "CHECKPOINT_PAGES", 3)
+    monkeypatch.setattr(celery_tasks, "get_page_count", lambda path: 8)
+    monkeypatch.setattr(
+        celery_tasks,
+        "timed_convert",
+        lambda pdf_file, start_page=0, max_pages=None: (pdf_file, {}, {"pages": 8}),
+    )
+
+    # process_batch calls the task function directly, where request.id is None
+    assert celery_tasks.convert_pages(None, "/a.pdf", "a.pdf")[0] == "/a.pdf"
+    assert celery_tasks.convert_pages(None, "/b.pdf", "b.pdf")[0] == "/b.pdf"
+    assert redis_client.keys("marker:checkpoint:*") == []
+
+
+def test_document_is_released_once_retries_run_out(redis_client, store):
+    pytest.importorskip("marker")
+    from types import SimpleNamespace
+    from marker_api import celery_tasks
+
+    ref = store.put(b"%PDF")
+
+    def task(retries):
+        return SimpleNamespace(
+            request=SimpleNamespace(id="task-1", retries=retries),
+            retry=lambda exc, **kwargs: exc,
+        )
+
+    celery_tasks.retry_or_give_up(task(1), RuntimeError("boom"), ref)
+    assert store.get(ref) == b"%PDF"
+
+    celery_tasks.retry_or_give_up(task(celery_tasks.MAX_RETRIES), RuntimeError("boom"), ref)
+    with pytest.raises(FileNotFoundError):
+        store.get(ref)
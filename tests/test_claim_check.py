@@ -0,0 +1,103 @@
+import json
+import os
+import time
+import fakeredis
+import pytest
+from marker_api import claim_check
+from marker_api.claim_check import (
+    FilesystemClaimCheckStore,
+    RedisClaimCheckStore,
+    load_result,
+    store_result,
+)
+
+
+@pytest.fixture
+def fs_store(tmp_path):
+    return FilesystemClaimCheckStore(str(tmp_path / "claims"), ttl=3600)
+
+
+def sweep(store):
+    store._last_sweep = 0.0
+    store._sweep()
+
+
+def test_filesystem_put_get_delete(fs_store):
+    ref = fs_store.put(b"payload")
+    assert ref == {"claim_check": "fs", "key": ref["key"], "size": 7}
+    assert fs_store.get(ref) == b"payload"
+    with fs_store.local_path(ref) as path:
+        assert open(path, "rb").read() == b"payload"
+
+    fs_store.delete(ref)
+    with pytest.raises(FileNotFoundError):
+        fs_store.get(ref)
+
+
+def test_hard_linked_old_file_survives_sweep(fs_store, tmp_path):
+    # An upload or bulk source file last modified long before it was submitted
+    source = tmp_path / "old.pdf"
+    source.write_bytes(b"%PDF-old")
+    two_days_ago = time.time() - 2 * 86400
+    os.utime(source, (two_days_ago, two_days_ago))
+
+    ref = fs_store.put_file(str(source))
+    sweep(fs_store)
+
+    assert fs_store.get(ref) == b"%PDF-old"
+    # The source file itself is left untouched
+    assert os.path.getmtime(source) == pytest.approx(two_days_ago)
+
+
+def test_sweep_honours_per_payload_ttl(fs_store):
+    kept = fs_store.put(b"default ttl")
+    expired = fs_store.put(b"short ttl", ttl=0)
+    time.sleep(0.01)
+    sweep(fs_store)
+
+    assert fs_store.get(kept) == b"default ttl"
+    with pytest.raises(FileNotFoundError):
+        fs_store.get(expired)
+
+
+def test_redis_store_chunks_and_expires():
+    store = RedisClaimCheckStore.__new__(RedisClaimCheckStore)
+    store.ttl = 3600
+    store.chunk_bytes = 4
+    store.client = fakeredis.FakeRedis()
+
+    ref = store.put(b"0123456789")
+    assert store.get(ref) == b"0123456789"
+    assert store.client.get(store._meta_key(ref["key"])) == b"3"
+    assert 0 < store.client.ttl(store._chunk_key(ref["key"], 0)) <= 3600
+
+    short = store.put(b"abc", ttl=60)
+    assert store.client.ttl(store._meta_key(short["key"])) <= 60
+
+    store.delete(ref)
+    with pytest.raises(KeyError):
+        store.get(ref)
+
+
+def test_store_result_only_stores_large_results(fs_store, monkeypatch):
+    monkeypatch.setattr(claim_check, "claim_check_store", fs_store)
+    small = {"markdown": "short"}
+    assert store_result(small, threshold=1024) is small
+
+    large = {"markdown": "x" * 2048}
+    ref = store_result(large, threshold=1024, ttl=900)
+    assert claim_check.is_claim_check(ref)
+    assert ref["key"].endswith("-900")
+    assert load_result(ref) == json.loads(json.dumps(large))
+    assert load_result(small) is small
+
+
+def test_store_backends_must_implement_every_operation():
+    class Incomplete(claim_check.ClaimCheckStore):
+        backend = "incomplete"
+
+        def put(self, data, ttl=None):
+            return self._reference("k", len(data))
+
+    with pytest.raises(TypeError):
+        Incomplete(ttl=60)
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from aiohttp import web
+from marker_api_client import MarkerAPIClient
+
+
+class StubServer:
+    """
+    A distributed server answering /celery/convert and /celery/result with canned behaviour.
+    """
+
+    def __init__(self, polls_until_done=2):
+        self.polls_until_done = polls_until_done
+        self.submits = {}
+        self.polls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.reject_first = set()
+        self.results = {}
+
+    async def health(self, request):
+        return web.json_response({"message": "ok", "type": "distributed", "workers": 1})
+
+    async def convert(self, request):
+        name = (await request.post())["pdf_file"].filename
+        self.submits[name] = self.submits.get(name, 0) + 1
+        if name in self.reject_first and self.submits[name] == 1:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return web.json_response({"task_id": name, "status": "Processing", "estimated_seconds": 0.01})
+
+    async def result(self, request):
+        task_id = request.match_info["task_id"]
+        self.polls[task_id] = self.polls.get(task_id, 0) + 1
+        if self.polls[task_id] < self.polls_until_done:
+            return web.json_response({"task_id": task_id, "status": "Processing"}, status=202)
+        self.in_flight -= 1
+        if task_id in self.results:
+            return web.json_response(self.results[task_id])
+        result = {"filename": task_id, "markdown": "# done", "metadata": {}, "status": "ok"}
+        return web.json_response({"task_id": task_id, "status": "Success", "result": result})
+
+
+def run_many(stub, tmp_path, names, **kwargs):
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b"%PDF")
+        paths.append(str(path))
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/health", stub.health)
+        app.router.add_post("/celery/convert", stub.convert)
+        app.router.add_get("/celery/result/{task_id}", stub.result)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with MarkerAPIClient(f"http://127.0.0.1:{port}") as client:
+                return {
+                    path.rsplit("/", 1)[-1]: response
+                    async for path, response in client.aconvert_many(
+                        paths, poll_interval=0.01, max_poll_interval=0.02, **kwargs
+                    )
+                }
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def test_concurrency_bounds_files_in_flight(tmp_path):
+    stub = StubServer(polls_until_done=3)
+    names = [f"f{i}.pdf" for i in range(7)]
+    responses = run_many(stub, tmp_path, names, concurrency=2)
+
+    assert sorted(responses) == names
+    assert all(response.status == "Success" for response in responses.values())
+    assert stub.max_in_flight <= 2
+
+
+def test_busy_submission_is_retried(tmp_path):
+    stub = StubServer()
+    stub.reject_first = {"busy.pdf"}
+    responses = run_many(stub, tmp_path, ["busy.pdf"], max_retries=2)
+
+    assert responses["busy.pdf"].status == "Success"
+    assert stub.submits["busy.pdf"] == 2
+
+
+def test_failed_conversion_is_not_retried(tmp_path):
+    stub = StubServer(polls_until_done=1)
+    stub.results["bad.pdf"] = {"task_id": "bad.pdf", "status": "Error", "error": "not a PDF"}
+    responses = run_many(stub, tmp_path, ["bad.pdf", "good.pdf"])
+
+    assert responses["bad.pdf"].status == "Error"
+    assert responses["bad.pdf"].error == "not a PDF"
+    assert stub.polls["bad.pdf"] == 1
+    assert responses["good.pdf"].status == "Success"
+
+
+def test_malformed_response_does_not_stop_the_run(tmp_path):
+    stub = StubServer(polls_until_done=1)
+    stub.results["odd.pdf"] = {"unexpected": True}
+    responses = run_many(stub, tmp_path, ["odd.pdf", "good.pdf"])
+
+    assert responses["odd.pdf"].status == "Error"
+    assert responses["good.pdf"].status == "Success"
+
+
+def test_failed_task_result_is_reported_not_raised(redis_client):
+    pytest.importorskip("marker")
+    from marker_api.celery_routes import celery_result
+    from marker_api.celery_worker import celery_app
+
+    celery_app.backend.mark_as_failure("task-1", ValueError("not a PDF"))
+    response = asyncio.run(celery_result("task-1"))
+    assert response == {"task_id": "task-1", "status": "Error", "error": "not a PDF"}
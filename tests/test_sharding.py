@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("torch")
+
+from marker_api.sharding import merge_shard_outputs, plan_shards
+
+
+def test_plan_shards_splits_into_page_ranges():
+    assert plan_shards(600, 250) == [(0, 250), (250, 250), (500, 100)]
+    assert plan_shards(100, 250) == [(0, 100)]
+    assert plan_shards(100, 0) == [(0, 100)]
+
+
+def test_merge_keeps_marker_image_names_from_later_shards():
+    # marker names images by absolute page (page.pnum), so a shard starting
+    # at page 250 already produces "250_image_0.png"
+    outputs = [
+        (250, "![250_image_0.png](250_image_0.png)\n", {"250_image_0.png": "b"}, {"pages": 250}),
+        (0, "![0_image_0.png](0_image_0.png)\n", {"0_image_0.png": "a"}, {"pages": 250}),
+    ]
+    markdown, images, metadata = merge_shard_outputs(outputs)
+
+    assert images == {"0_image_0.png": "a", "250_image_0.png": "b"}
+    assert markdown == "![0_image_0.png](0_image_0.png)\n\n![250_image_0.png](250_image_0.png)"
+    assert metadata["pages"] == 500
+
+
+def test_merge_renames_only_colliding_images():
+    outputs = [
+        (0, "![figure.png](figure.png)", {"figure.png": "a"}, {}),
+        (10, "![figure.png](figure.png) ![10_image_0.png](10_image_0.png)",
+         {"figure.png": "b", "10_image_0.png": "c"}, {}),
+    ]
+    markdown, images, _ = merge_shard_outputs(outputs)
+
+    assert images == {"figure.png": "a", "10_figure.png": "b", "10_image_0.png": "c"}
+    assert markdown == (
+        "![figure.png](figure.png)\n\n![10_figure.png](10_figure.png) ![10_image_0.png](10_image_0.png)"
+    )
+
+
+def test_failed_shard_clears_the_pending_document(redis_client, monkeypatch):
+    pytest.importorskip("marker")
+    from celery.exceptions import ChordError
+    from celery.result import AsyncResult
+    from marker_api import celery_routes
+    from marker_api.celery_worker import celery_app
+    from marker_api.monitor import PENDING_PAGES_KEY
+    from marker_api.single_flight import find_inflight, single_flight_key
+
+    bodies = []
+
+    def fake_chord(header):
+        list(header)
+
+        def apply(body, task_id):
+            bodies.append(body.set(task_id=task_id))
+            return AsyncResult(task_id, app=celery_app)
+
+        return apply
+
+    monkeypatch.setattr(celery_routes, "chord", fake_chord)
+    key = single_flight_key("abc")
+    ref = {"claim_check": "fs", "key": "k", "size": 100}
+    result = celery_routes.submit_conversion(
+        "a.pdf", ref, {}, shards=[(0, 5), (5, 5)], pages=10, flight_key=key
+    )
+    assert redis_client.hexists(PENDING_PAGES_KEY, result.id)
+
+    # What the result backend does when a shard fails after its retries
+    try:
+        raise ChordError("shard failed")
+    except ChordError as e:
+        celery_app.backend.chord_error_from_stack(bodies[0], e)
+
+    assert not redis_client.hexists(PENDING_PAGES_KEY, result.id)
+    assert find_inflight(key) is None
@@ -0,0 +1,81 @@
+import pytest
+from celery.states import FAILURE, SUCCESS
+from marker_api.celery_worker import celery_app
+from marker_api.single_flight import (
+    claim,
+    detach,
+    find_inflight,
+    release,
+    single_flight_key,
+    single_flight_stats,
+)
+
+
+def test_key_depends_on_content_and_options():
+    assert single_flight_key("abc", {"a": 1}) == single_flight_key("abc", {"a": 1})
+    assert single_flight_key("abc", {"a": 1}) != single_flight_key("abc", {"a": 2})
+    assert single_flight_key("abc") != single_flight_key("abd")
+
+
+def test_duplicate_attaches_to_the_first_submission(redis_client):
+    key = single_flight_key("abc")
+    assert claim(key, "task-1", waiting=True) is None
+    assert claim(key, "task-2", waiting=True) == "task-1"
+    assert find_inflight(key, waiting=True) == "task-1"
+
+    assert single_flight_stats() == {"submitted": 1, "coalesced": 2}
+    # Owner plus two duplicates: the task may only be cancelled once all detached
+    assert detach("task-1") == 2
+    assert detach("task-1") == 1
+    assert detach("task-1") == 0
+
+
+def test_only_waiting_submissions_hold_the_task(redis_client):
+    key = single_flight_key("abc")
+    assert claim(key, "task-1") is None
+    # Polling duplicates never detach, so they must not keep the task alive
+    assert find_inflight(key) == "task-1"
+    assert claim(key, "task-2") == "task-1"
+    assert find_inflight(key, waiting=True) == "task-1"
+
+    assert single_flight_stats() == {"submitted": 1, "coalesced": 3}
+    assert detach("task-1") == 0
+
+
+def test_release_after_success_keeps_the_key_for_the_result(redis_client):
+    key = single_flight_key("abc")
+    claim(key, "task-1")
+    celery_app.backend.store_result("task-1", {"markdown": "x"}, SUCCESS)
+    release("task-1", succeeded=True)
+
+    assert find_inflight(key) == "task-1"
+    assert 0 < redis_client.ttl(key) <= celery_app.conf.result_expires
+
+
+def test_release_after_failure_frees_the_key(redis_client):
+    key = single_flight_key("abc")
+    claim(key, "task-1")
+    release("task-1", succeeded=False)
+
+    assert find_inflight(key) is None
+    assert claim(key, "task-2") is None
+
+
+def test_failed_task_is_taken_over(redis_client):
+    key = single_flight_key("abc")
+    claim(key, "task-1")
+    celery_app.backend.store_result("task-1", None, FAILURE)
+
+    assert find_inflight(key) is None
+    assert claim(key, "task-2") is None
+    assert redis_client.get(key) == b"task-2"
+
+
+def test_default_image_options_share_one_key():
+    pytest.importorskip("marker")
+    from marker_api.celery_routes import conversion_key, image_options_payload
+
+    assert conversion_key("abc", None) == conversion_key("abc", image_options_payload(None))
+    assert conversion_key("abc", None) != conversion_key(
+        "abc", {**image_options_payload(None), "image_quality": 10}
+    )
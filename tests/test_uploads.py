@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import os
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from marker_api import uploads
+from marker_api.uploads import spool_file, spool_request
+
+BOUNDARY = "marker-test-boundary"
+
+
+def multipart(*parts):
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+            "Content-Type: application/pdf\r\n\r\n"
+        ).encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def make_request(body, chunk_size=5, content_length=True):
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+    received = []
+
+    async def receive():
+        chunk = chunks.pop(0) if chunks else b""
+        received.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    return request, received
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_spools_every_file_of_the_field_in_order(upload_dir):
+    first, second = b"%PDF-first" * 50, b"%PDF-second"
+    request, _ = make_request(
+        multipart(("pdf_files", "a.pdf", first), ("note", None, b"skip"), ("pdf_files", "b.pdf", second))
+    )
+    spooled = asyncio.run(spool_request(request, "pdf_files"))
+
+    assert [upload.filename for upload in spooled] == ["a.pdf", "b.pdf"]
+    assert spooled[0].read_bytes() == first
+    assert spooled[0].size == len(first)
+    assert spooled[0].sha256 == hashlib.sha256(first).hexdigest()
+    assert spooled[1].read_bytes() == second
+    uploads.cleanup_uploads(spooled)
+    assert os.listdir(upload_dir) == []
+
+
+def test_oversized_file_is_rejected_while_streaming(upload_dir):
+    body = multipart(("pdf_file", "big.pdf", b"x" * 100), ("pdf_file", "late.pdf", b"y"))
+    request, received = make_request(body)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_request(request, "pdf_file", max_bytes=50))
+
+    assert error.value.status_code == 413
+    assert "big.pdf" in error.value.detail
+    assert len(b"".join(received)) < len(body)
+    assert os.listdir(upload_dir) == []
+
+
+def test_declared_content_length_is_rejected_before_reading(upload_dir):
+    request, received = make_request(multipart(("pdf_file", "a.pdf", b"x" * 100)))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_request(request, "pdf_file", max_request_bytes=100))
+
+    assert error.value.status_code == 413
+    assert received == []
+
+
+def test_request_budget_applies_without_content_length(upload_dir):
+    body = multipart(("pdf_files", "a.pdf", b"x" * 80), ("pdf_files", "b.pdf", b"y" * 80))
+    request, _ = make_request(body, content_length=False)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_request(request, "pdf_files", max_request_bytes=200))
+
+    assert error.value.status_code == 413
+    assert os.listdir(upload_dir) == []
+
+
+def test_missing_or_extra_files_are_rejected(upload_dir):
+    request, _ = make_request(multipart(("other", "a.pdf", b"x")))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_file(request))
+    assert error.value.status_code == 422
+
+    request, _ = make_request(multipart(("pdf_file", "a.pdf", b"x"), ("pdf_file", "b.pdf", b"y")))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_file(request))
+    assert error.value.status_code == 422
+    assert os.listdir(upload_dir) == []
+
+
+def test_truncated_body_is_rejected(upload_dir):
+    body = multipart(("pdf_file", "a.pdf", b"x" * 20))
+    request, _ = make_request(body[:-30])
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(spool_file(request))
+
+    assert error.value.status_code == 400
+    assert os.listdir(upload_dir) == []